@@ -0,0 +1,128 @@
+import pandas as pd
+from supabase_api import SupabaseError, call_rpc, fetch_dataframe_from_supabase
+
+
+# Tablas de resumen mensual (sql/resumenes.sql) según la fecha que define el mes
+ROLLUP_TABLES = {"creacion": "resumen_mensual", "pedido": "resumen_demanda_mensual"}
+
+
+def fetch_category_counts(categorias=None, subcategorias=None):
+    """
+    Número de compras por categoría y subcategoría, agregado en Postgres
+    (vista `vista_conteo_categorias`).
+    :param categorias: Lista de categorías a incluir (None = todas).
+    :param subcategorias: Lista de subcategorías a incluir (None = todas).
+    :return: DataFrame con las columnas `categoria`, `subcategoria` y `conteo`.
+    """
+    filtros = []
+    if categorias:
+        filtros.append(("categoria", "in", list(categorias)))
+    if subcategorias:
+        filtros.append(("subcategoria", "in", list(subcategorias)))
+    df = fetch_dataframe_from_supabase(
+        "vista_conteo_categorias", select=["categoria", "subcategoria", "conteo"], filters=filtros
+    )
+    df["conteo"] = pd.to_numeric(df["conteo"]).astype("int64")
+    return df
+
+def _month_start(fecha):
+    return fecha is None or pd.Timestamp(fecha) == pd.Timestamp(fecha).to_period("M").start_time
+
+def _month_filters(fecha_desde=None, fecha_hasta=None):
+    # Filtros sobre la columna `mes` de los resúmenes (el mes de `fecha_desde` se incluye)
+    filtros = []
+    if fecha_desde is not None:
+        filtros.append(("mes", "gte", pd.Timestamp(fecha_desde).to_period("M").start_time.date().isoformat()))
+    if fecha_hasta is not None:
+        filtros.append(("mes", "lt", pd.Timestamp(fecha_hasta).date().isoformat()))
+    return filtros
+
+def fetch_monthly_rollup(date_column="creacion", fecha_desde=None, fecha_hasta=None, categorias=None):
+    """
+    Resumen mensual de órdenes por estado, tipo de compra y categoría, mantenido por triggers
+    al escribir en `ordencompra` (sql/resumenes.sql). Su tamaño depende del número de meses y
+    combinaciones, no del número de órdenes.
+    :param date_column: "creacion" (mes de `fecha_creacion_compra`, tabla `resumen_mensual`) o
+                        "pedido" (mes de `fecha_pedido_compra`, tabla `resumen_demanda_mensual`).
+    :param fecha_desde: Primer mes incluido (date/datetime o None).
+    :param fecha_hasta: Fecha final excluida (date/datetime o None).
+    :param categorias: Lista de categorías a incluir (None = todas).
+    :return: DataFrame con las columnas `mes`, `estado`, `tipo_compra`, `categoria`, `conteo`,
+             `cantidad_total` e `impuestos_total`.
+    """
+    columnas = ["mes", "estado", "tipo_compra", "categoria", "conteo", "cantidad_total", "impuestos_total"]
+    filtros = _month_filters(fecha_desde, fecha_hasta)
+    if categorias:
+        filtros.append(("categoria", "in", list(categorias)))
+    df = fetch_dataframe_from_supabase(ROLLUP_TABLES[date_column], select=columnas, filters=filtros)
+    if df.empty:
+        return pd.DataFrame(columns=columnas)
+    df["mes"] = pd.to_datetime(df["mes"])
+    df["conteo"] = pd.to_numeric(df["conteo"]).astype("int64")
+    df[["cantidad_total", "impuestos_total"]] = df[["cantidad_total", "impuestos_total"]].apply(pd.to_numeric)
+    return df
+
+def fetch_order_summary(fecha_desde=None, fecha_hasta=None):
+    """
+    Número de órdenes por mes, estado y tipo de compra.
+    Sin rango de fechas o con un rango de meses completos se lee la tabla de resumen
+    `resumen_mensual`; con otros rangos (o si el resumen aún no existe) se agrega en Postgres
+    con la función `resumen_ordenes`.
+    :param fecha_desde: Fecha inicial incluida (date/datetime o None).
+    :param fecha_hasta: Fecha final excluida (date/datetime o None).
+    :return: DataFrame con las columnas `mes`, `estado`, `tipo_compra` y `conteo`.
+    """
+    if _month_start(fecha_desde) and _month_start(fecha_hasta):
+        try:
+            df = fetch_dataframe_from_supabase(
+                "vista_resumen_ordenes", select=["mes", "estado", "tipo_compra", "conteo"],
+                filters=_month_filters(fecha_desde, fecha_hasta),
+            )
+            if df.empty:
+                return pd.DataFrame(columns=["mes", "estado", "tipo_compra", "conteo"])
+            df["mes"] = pd.to_datetime(df["mes"])
+            df["conteo"] = pd.to_numeric(df["conteo"]).astype("int64")
+            return df
+        except SupabaseError as e:
+            # Solo si el resumen aún no se ha creado en esta base (sql/resumenes.sql) se agrega en
+            # Postgres; cualquier otro error (tiempo de espera, permisos, 5xx) se propaga
+            if not e.missing_relation():
+                raise
+
+    params = {
+        "fecha_desde": None if fecha_desde is None else pd.Timestamp(fecha_desde).isoformat(),
+        "fecha_hasta": None if fecha_hasta is None else pd.Timestamp(fecha_hasta).isoformat(),
+    }
+    df = call_rpc("resumen_ordenes", params)
+    if df.empty:
+        return pd.DataFrame(columns=["mes", "estado", "tipo_compra", "conteo"])
+    df["mes"] = pd.to_datetime(df["mes"])
+    df["conteo"] = pd.to_numeric(df["conteo"]).astype("int64")
+    return df
+
+def fetch_monthly_demand(categorias=None):
+    """
+    Cantidad pedida por mes (mes de `fecha_pedido_compra`), leída de la vista
+    `vista_demanda_mensual` sobre el resumen `resumen_demanda_mensual`.
+    :param categorias: Lista de categorías a incluir (None = todas).
+    :return: DataFrame con las columnas `mes`, `cantidad` y `conteo`, ordenado por mes.
+    """
+    filtros = [("categoria", "in", list(categorias))] if categorias else []
+    df = fetch_dataframe_from_supabase(
+        "vista_demanda_mensual", select=["mes", "categoria", "cantidad", "conteo"], filters=filtros
+    )
+    if df.empty:
+        return pd.DataFrame(columns=["mes", "cantidad", "conteo"])
+    df["mes"] = pd.to_datetime(df["mes"])
+    df[["cantidad", "conteo"]] = df[["cantidad", "conteo"]].apply(pd.to_numeric)
+    return df.groupby("mes", as_index=False)[["cantidad", "conteo"]].sum().sort_values("mes", ignore_index=True)
+
+def sum_counts(df, columns, count_column="conteo"):
+    """
+    Suma los conteos de un agregado por las columnas indicadas.
+    :return: DataFrame con las columnas indicadas y `count_column`, ordenado de mayor a menor.
+    """
+    return (
+        df.groupby(columns, as_index=False, observed=True)[count_column].sum()
+        .sort_values(count_column, ascending=False, ignore_index=True)
+    )
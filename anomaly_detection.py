@@ -0,0 +1,325 @@
+import glob
+import os
+import threading
+import time
+import joblib
+import numpy as np
+import pandas as pd
+
+
+# Directorio donde se guardan las estadísticas por grupo y las puntuaciones de cada orden
+ANOMALY_DIR = os.getenv("ANOMALY_DIR", os.path.join("data", "anomalies"))
+# Columnas cuyos valores forman los grupos de comparación
+GROUP_COLUMNS = ("categoria", "nombre_proveedor")
+# Medidas que se comparan dentro de cada grupo
+MEASURES = ("precio_total", "precio_unitario")
+# Puntuación robusta (|z| con mediana y MAD) a partir de la cual una orden es atípica
+THRESHOLD = 3.5
+# Grupos con menos órdenes se comparan con las estadísticas de todas las órdenes
+MIN_GROUP_SIZE = 30
+# Histograma de log(1 + valor) con el que se actualizan la mediana y la MAD sin guardar las órdenes
+BINS = np.linspace(0.0, np.log1p(1e10), 513)
+_CENTERS = (BINS[:-1] + BINS[1:]) / 2
+_BIN_WIDTH = BINS[1] - BINS[0]
+# Archivos de puntuaciones a partir de los cuales se juntan en uno solo
+MAX_SCORE_PARTS = 64
+# Versión del formato de las estadísticas guardadas (con otra versión se reconstruyen)
+STATE_VERSION = 2
+
+
+def measures(df):
+    """
+    Medidas de cada orden en escala log(1 + valor): la escala logarítmica hace comparables las
+    compras pequeñas y grandes. Los valores negativos o no numéricos quedan como NaN.
+    :return: Array de forma (filas, len(MEASURES)).
+    """
+    precio = pd.to_numeric(df["precio_total"], errors="coerce").to_numpy(dtype="float64")
+    cantidad = pd.to_numeric(df["cantidad"], errors="coerce").to_numpy(dtype="float64")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        unitario = np.where(cantidad > 0, precio / cantidad, np.nan)
+    valores = np.column_stack([precio, unitario])
+    valores[~(valores >= 0)] = np.nan
+    return np.log1p(valores)
+
+def row_keys(df, key_column="id"):
+    """
+    Identificador de cada orden: la columna `key_column` si existe, o un hash de la fila.
+    """
+    if key_column in df.columns:
+        return df[key_column].astype(str).to_numpy()
+    return pd.util.hash_pandas_object(df, index=False).astype(str).to_numpy()
+
+def histogram_cells(codes, medidas):
+    """
+    Conteos por grupo, medida e intervalo de un lote de medidas, en forma dispersa (sin bucles).
+    :param codes: Código de grupo de cada fila.
+    :return: Tupla (posiciones planas ordenadas `(grupo * medidas + medida) * intervalos + intervalo`,
+             conteos) de los intervalos con algún valor.
+    """
+    filas, columnas = np.nonzero(~np.isnan(medidas))
+    intervalos = np.clip(np.searchsorted(BINS, medidas[filas, columnas], side="right") - 1, 0, len(_CENTERS) - 1)
+    plano = (codes[filas].astype(np.int64) * len(MEASURES) + columnas) * len(_CENTERS) + intervalos
+    return np.unique(plano, return_counts=True)
+
+def histogram(codes, medidas, n_groups):
+    """
+    Conteos por grupo, medida e intervalo de un lote de medidas.
+    :param codes: Código de grupo de cada fila (entre 0 y `n_groups` - 1).
+    :return: Array de forma (n_groups, len(MEASURES), intervalos).
+    """
+    celdas, conteos = histogram_cells(codes, medidas)
+    denso = np.zeros(n_groups * len(MEASURES) * len(_CENTERS), dtype=np.int64)
+    denso[celdas] = conteos
+    return denso.reshape(n_groups, len(MEASURES), len(_CENTERS))
+
+def _median_mad(counts):
+    # Mediana y MAD de cada fila de histogramas (última dimensión = intervalos), sin bucles
+    total = counts.sum(axis=-1)
+    acumulado = counts.cumsum(axis=-1)
+    mediana = _CENTERS[np.argmax(acumulado >= (total / 2)[..., None], axis=-1)]
+    distancia = np.abs(_CENTERS - mediana[..., None])
+    orden = np.argsort(distancia, axis=-1, kind="stable")
+    acumulado = np.take_along_axis(counts, orden, axis=-1).cumsum(axis=-1)
+    posicion = np.argmax(acumulado >= (total / 2)[..., None], axis=-1)
+    mad = np.take_along_axis(distancia, np.take_along_axis(orden, posicion[..., None], axis=-1), axis=-1)[..., 0]
+    # Un grupo con casi todos los valores iguales tendría MAD 0: se usa como mínimo el ancho de un intervalo
+    return mediana, np.maximum(mad, _BIN_WIDTH), total
+
+
+class GroupStatistics:
+    """
+    Histogramas de las medidas por valor de una columna de grupo. Añadir órdenes solo suma
+    conteos, por lo que las estadísticas se actualizan por lotes sin volver a leer la historia.
+    Los histogramas se guardan de forma dispersa (solo los intervalos con algún valor), así que
+    la memoria depende de los valores distintos de cada grupo y no de grupos × intervalos.
+    """
+
+    def __init__(self, column):
+        self.column = column
+        self.groups = pd.Index([], dtype=object)
+        # Posiciones planas ordenadas (ver `histogram_cells`) y conteo de cada una
+        self.cells = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=np.int64)
+
+    def codes(self, values, add=False):
+        """
+        Código de cada valor de grupo (-1 si no se conoce); con `add` se registran los nuevos.
+        """
+        # Se trabaja con los valores distintos y no con cada fila
+        posiciones, distintos = pd.factorize(values)
+        # Los nulos (posición -1) toman el último valor, "(sin valor)"
+        distintos = pd.Index(np.append(np.asarray(distintos).astype(str), "(sin valor)"), dtype=object)
+        if add:
+            nuevos = distintos.unique().difference(self.groups)
+            if len(nuevos):
+                self.groups = self.groups.append(nuevos)
+        return self.groups.get_indexer(distintos)[posiciones]
+
+    def update(self, values, medidas):
+        codigos = self.codes(values, add=True)
+        celdas, conteos = histogram_cells(codigos, medidas)
+        self.cells, inverso = np.unique(np.concatenate([self.cells, celdas]), return_inverse=True)
+        self.values = np.bincount(inverso, weights=np.concatenate([self.values, conteos])).astype(np.int64)
+
+    def histograms(self, codes):
+        """
+        Histogramas completos de algunos grupos.
+        :param codes: Códigos de grupo ordenados y sin repetir.
+        :return: Array de forma (len(codes), len(MEASURES), intervalos).
+        """
+        por_grupo = len(MEASURES) * len(_CENTERS)
+        denso = np.zeros((len(codes), por_grupo), dtype=np.int64)
+        if len(codes):
+            grupos = self.cells // por_grupo
+            filas = np.minimum(np.searchsorted(codes, grupos), len(codes) - 1)
+            usar = codes[filas] == grupos
+            denso[filas[usar], self.cells[usar] % por_grupo] = self.values[usar]
+        return denso.reshape(len(codes), len(MEASURES), len(_CENTERS))
+
+    def statistics(self, codes=None):
+        """
+        :param codes: Códigos de grupo ordenados y sin repetir (None = todos los grupos).
+        :return: Tupla (mediana, MAD, número de valores), cada una de forma (grupos, medidas).
+        """
+        codes = np.arange(len(self.groups)) if codes is None else np.asarray(codes)
+        return _median_mad(self.histograms(codes))
+
+
+class AnomalyDetector:
+    """
+    Detección de compras atípicas con estadísticas robustas por grupo.
+    Cada orden se compara con la mediana y la MAD de su categoría y de su proveedor (en escala
+    logarítmica, para precio total y unitario); su puntuación es el mayor |z| robusto,
+    0.6745 * (x - mediana) / MAD, y es atípica si supera `THRESHOLD`.
+    Las órdenes se puntúan una sola vez, al llegar: las estadísticas y las puntuaciones se
+    guardan en disco y las páginas solo consultan las marcas. Cada lote añade un archivo de
+    puntuaciones (se juntan al llegar a `MAX_SCORE_PARTS`) en lugar de reescribirlas todas.
+    Una orden modificada o borrada después de puntuarla no se resta de las estadísticas ni se
+    vuelve a puntuar (su clave ya tiene puntuación): tras corregir datos, `reset` reconstruye
+    las estadísticas y las puntuaciones con las órdenes actuales.
+    """
+
+    def __init__(self, directory=ANOMALY_DIR, group_columns=GROUP_COLUMNS, threshold=THRESHOLD):
+        self.directory = directory
+        self.group_columns = tuple(group_columns)
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._state = None
+        self._scores = None
+
+    def _paths(self):
+        return os.path.join(self.directory, "estadisticas.joblib"), os.path.join(self.directory, "puntuaciones")
+
+    def _part_path(self, numero):
+        return os.path.join(self._paths()[1], f"parte-{numero:06d}.parquet")
+
+    def _load(self):
+        if self._state is not None:
+            return
+        estado_path, _ = self._paths()
+        if os.path.exists(estado_path):
+            self._state = joblib.load(estado_path)
+        if (self._state is None or self._state.get("version") != STATE_VERSION
+                or self._state["group_columns"] != self.group_columns):
+            self._state = {
+                "version": STATE_VERSION,
+                "group_columns": self.group_columns,
+                "groups": {col: GroupStatistics(col) for col in self.group_columns},
+                "overall": np.zeros((len(MEASURES), len(_CENTERS)), dtype=np.int64),
+                "updated_at": None,
+                # Archivos de puntuaciones válidos: del primero al último (los demás son restos de una
+                # escritura interrumpida o de una unión anterior)
+                "score_parts": (1, 0),
+            }
+        primero, ultimo = self._state["score_parts"]
+        partes = [pd.read_parquet(self._part_path(n)) for n in range(primero, ultimo + 1)]
+        self._scores = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame({
+            "clave": pd.Series(dtype=str), "puntuacion": pd.Series(dtype="float64"),
+            "motivo": pd.Series(dtype=str), "puntuada_en": pd.Series(dtype="float64"),
+        })
+
+    def _save(self, nuevas):
+        """
+        Guarda las puntuaciones `nuevas` en un archivo más y después las estadísticas, que son
+        las que indican qué archivos son válidos.
+        """
+        estado_path, puntuaciones_dir = self._paths()
+        os.makedirs(puntuaciones_dir, exist_ok=True)
+        primero, ultimo = self._state["score_parts"]
+        if ultimo - primero + 1 >= MAX_SCORE_PARTS:
+            # Se juntan todas las puntuaciones en un solo archivo
+            nuevas, primero = self._scores, ultimo + 1
+        ruta = self._part_path(ultimo + 1)
+        nuevas.to_parquet(f"{ruta}.tmp", index=False)
+        os.replace(f"{ruta}.tmp", ruta)
+        self._state["score_parts"] = (primero, ultimo + 1)
+        joblib.dump(self._state, f"{estado_path}.tmp")
+        os.replace(f"{estado_path}.tmp", estado_path)
+        for antigua in glob.glob(os.path.join(puntuaciones_dir, "parte-*.parquet")):
+            numero = int(os.path.basename(antigua)[len("parte-"):-len(".parquet")])
+            if not primero <= numero <= ultimo + 1:
+                os.remove(antigua)
+
+    def update(self, df):
+        """
+        Suma un lote de órdenes a las estadísticas de todos los grupos.
+        """
+        self._load()
+        medidas = measures(df)
+        for col in self.group_columns:
+            self._state["groups"][col].update(df[col].to_numpy() if col in df.columns else np.full(len(df), None), medidas)
+        self._state["overall"] += histogram(np.zeros(len(df), dtype=np.int64), medidas, 1)[0]
+        self._state["updated_at"] = time.time()
+
+    def score(self, df):
+        """
+        Puntúa un lote de órdenes con las estadísticas actuales, sin modificarlas.
+        :return: Tupla (puntuación de cada orden, motivo: grupo y medida con la mayor desviación).
+        """
+        self._load()
+        medidas = measures(df)
+        mediana, mad, _ = _median_mad(self._state["overall"])
+        general = 0.6745 * (medidas - mediana) / mad
+        zs, motivos = [], []
+        for col in self.group_columns:
+            grupo = self._state["groups"][col]
+            codigos = grupo.codes(df[col].to_numpy() if col in df.columns else np.full(len(df), None))
+            validos = codigos >= 0
+            # Solo se calculan las estadísticas de los grupos presentes en el lote
+            presentes, posiciones = np.unique(codigos[validos], return_inverse=True)
+            mediana_g, mad_g, total_g = grupo.statistics(presentes)
+            indice = np.full(len(df), -1)
+            indice[validos] = posiciones
+            # Los grupos desconocidos o con pocas órdenes se comparan con todas las órdenes
+            pequeno = np.ones((len(df), len(MEASURES)), dtype=bool)
+            pequeno[validos] = total_g[posiciones] < MIN_GROUP_SIZE
+            z = general.copy()
+            filas = validos & ~pequeno.all(axis=1)
+            z[filas] = 0.6745 * (medidas[filas] - mediana_g[indice[filas]]) / mad_g[indice[filas]]
+            zs.append(np.where(pequeno, general, z))
+            motivos.append(pequeno)
+        todas = np.abs(np.concatenate(zs, axis=1))
+        mayor = np.where(np.isnan(todas), -np.inf, todas).argmax(axis=1)
+        filas = np.arange(len(df))
+        # Motivo de cada columna de `todas`: su grupo, o "general" si se usaron todas las órdenes
+        nombres = np.array(
+            [f"{col}/{m}" for col in self.group_columns for m in MEASURES] + [f"general/{m}" for m in MEASURES] * len(self.group_columns),
+            dtype=object,
+        )
+        general_usado = np.concatenate(motivos, axis=1)[filas, mayor]
+        return todas[filas, mayor], nombres[mayor + general_usado * len(self.group_columns) * len(MEASURES)]
+
+    def process(self, df, key_column="id"):
+        """
+        Incorpora las órdenes que aún no se han puntuado: actualiza las estadísticas con ellas, las
+        puntúa y guarda las puntuaciones. Las órdenes ya puntuadas no se vuelven a procesar,
+        aunque hayan cambiado (ver `reset`).
+        :return: Número de órdenes nuevas puntuadas.
+        """
+        with self._lock:
+            self._load()
+            claves = row_keys(df, key_column)
+            nuevas = ~pd.Index(claves).isin(self._scores["clave"])
+            if not nuevas.any():
+                return 0
+            lote = df[nuevas]
+            self.update(lote)
+            puntuacion, motivo = self.score(lote)
+            puntuadas = pd.DataFrame({
+                "clave": claves[nuevas], "puntuacion": puntuacion, "motivo": motivo, "puntuada_en": time.time(),
+            })
+            self._scores = pd.concat([self._scores, puntuadas], ignore_index=True)
+            self._save(puntuadas)
+            return int(nuevas.sum())
+
+    def lookup(self, df, key_column="id"):
+        """
+        Puntuaciones guardadas de las órdenes de `df` (NaN si aún no se han puntuado).
+        :return: DataFrame alineado con `df` con `puntuacion`, `motivo` y `atipica`.
+        """
+        with self._lock:
+            self._load()
+            puntuaciones = self._scores.drop_duplicates("clave", keep="last").set_index("clave")
+        encontradas = puntuaciones.reindex(row_keys(df, key_column))
+        return pd.DataFrame({
+            "puntuacion": encontradas["puntuacion"].to_numpy(),
+            "motivo": encontradas["motivo"].to_numpy(),
+            "atipica": (encontradas["puntuacion"] > self.threshold).to_numpy(),
+        }, index=df.index)
+
+    def reset(self):
+        """
+        Descarta las estadísticas y puntuaciones guardadas (por ejemplo, tras corregir datos); el
+        siguiente `process` las reconstruye con las órdenes que reciba.
+        """
+        with self._lock:
+            estado_path, puntuaciones_dir = self._paths()
+            for path in [estado_path, *glob.glob(os.path.join(puntuaciones_dir, "parte-*.parquet"))]:
+                if os.path.exists(path):
+                    os.remove(path)
+            self._state = None
+            self._scores = None
+
+
+# Detector compartido por todas las sesiones
+detector = AnomalyDetector()
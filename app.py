@@ -1,19 +1,39 @@
+import time
+
+_inicio = time.perf_counter()
+
+import importlib
+import logging
+import logging.handlers
+import sys
 import streamlit as st
-from supabase_api import supabase  # Importar supabase desde su archivo centralizado
-from sections.data_upload import subir_y_mapear_datos
-from sections.data_upload import preparar_datos
-from sections.stats_visuals import stats_visuals_section
-from sections.train_model import train_model_section
-from sections.predictions import predictions_section
-from sections.dashboard import dashboard_section
-from sections.configuration import (
-    configuration_section,
-    usuarios_section,
-    mantenimiento_proveedores_section,
-    mantenimiento_centros_section,
-    mantenimiento_productos_section,
-    mantenimiento_estados_section,
-)
+
+# Registro de tiempos de arranque en startup.log (rota al llegar a 1 MB, guarda 3 copias)
+logger = logging.getLogger("startup")
+primer_arranque = not logger.handlers
+if primer_arranque:
+    _handler = logging.handlers.RotatingFileHandler("startup.log", maxBytes=1_000_000, backupCount=3, encoding="utf-8")
+    _handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+def cargar_seccion(modulo, funcion):
+    """
+    Importa el módulo de una sección la primera vez que se abre su entrada del menú, de modo
+    que las librerías pesadas (scikit-learn, plotly) y la conexión con Supabase no se cargan
+    al arrancar la aplicación.
+    :param modulo: Módulo de la sección (por ejemplo "sections.dashboard").
+    :param funcion: Función de la sección dentro del módulo.
+    :return: La función de la sección.
+    """
+    if modulo not in sys.modules:
+        inicio = time.perf_counter()
+        importlib.import_module(modulo)
+        logger.info(f"Sección {modulo} importada en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+    return getattr(sys.modules[modulo], funcion)
+
+def mostrar_seccion(modulo, funcion):
+    cargar_seccion(modulo, funcion)()
 
 st.set_page_config(page_title="Gestión de OrdenCompra", layout="wide")
 
@@ -30,18 +50,22 @@ menu = st.sidebar.radio(
     ]
 )
 
+# Tiempo hasta que el menú está listo (en el primer arranque del proceso incluye las importaciones de app.py)
+if primer_arranque:
+    logger.info(f"Arranque: menú listo en {(time.perf_counter() - _inicio) * 1000:.0f} ms")
+
 # Navegación entre secciones según el menú
 if menu == "Subida y Actualizacion de Datos":
-    subir_y_mapear_datos()
-    preparar_datos()
+    mostrar_seccion("sections.data_upload", "subir_y_mapear_datos")
+    mostrar_seccion("sections.data_upload", "preparar_datos")
 elif menu == "Estadísticas y Visualización":
-    stats_visuals_section()
+    mostrar_seccion("sections.stats_visuals", "stats_visuals_section")
 elif menu == "Entrenamiento de Modelos":
-    train_model_section()
+    mostrar_seccion("sections.train_model", "train_model_section")
 elif menu == "Predicciones":
-    predictions_section()
+    mostrar_seccion("sections.predictions", "predictions_section")
 elif menu == "Dashboard":
-    dashboard_section()
+    mostrar_seccion("sections.dashboard", "dashboard_section")
 elif menu == "Configuración":
     st.header("Configuración")
     sub_menu = st.radio(
@@ -50,9 +74,9 @@ elif menu == "Configuración":
     )
 
     if sub_menu == "Opciones Generales":
-        configuration_section()
+        mostrar_seccion("sections.configuration", "configuration_section")
     elif sub_menu == "Usuarios":
-        usuarios_section()
+        mostrar_seccion("sections.configuration", "usuarios_section")
     elif sub_menu == "Mantenimiento":
         mantenimiento_sub_menu = st.radio(
             "Seleccione un área de mantenimiento:",
@@ -60,18 +84,16 @@ elif menu == "Configuración":
         )
 
         if mantenimiento_sub_menu == "Proveedores":
-            mantenimiento_proveedores_section()  
+            mostrar_seccion("sections.configuration", "mantenimiento_proveedores_section")
         elif mantenimiento_sub_menu == "Centro de coste":
-            mantenimiento_centros_section()
+            mostrar_seccion("sections.configuration", "mantenimiento_centros_section")
         elif mantenimiento_sub_menu == "Productos":
-            mantenimiento_productos_section()
+            mostrar_seccion("sections.configuration", "mantenimiento_productos_section")
         elif mantenimiento_sub_menu == "Estados":
-            mantenimiento_estados_section()
-
-
-
-
-
-
-
+            mostrar_seccion("sections.configuration", "mantenimiento_estados_section")
 
+# Solo se registra la primera vez que cada sesión genera una página, no en cada interacción
+paginas_registradas = st.session_state.setdefault("paginas_registradas", set())
+if menu not in paginas_registradas:
+    paginas_registradas.add(menu)
+    logger.info(f"Página '{menu}' generada en {(time.perf_counter() - _inicio) * 1000:.0f} ms")
@@ -0,0 +1,183 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+import httpx
+import pandas as pd
+from http_session import RETRY_STATUS
+from query_cache import QueryCache
+from supabase_api import PAGE_SIZE, SupabaseError, page_requests, query_cache, session
+
+
+# Peticiones simultáneas máximas contra Supabase
+MAX_CONCURRENCY = int(os.getenv("SUPABASE_MAX_CONCURRENCY", "8"))
+
+# Cliente de cada bucle de eventos: (configuración de la sesión con la que se creó, cliente)
+_clients = weakref.WeakKeyDictionary()
+# Bucle de eventos en un hilo propio en el que `fetch_many` ejecuta las consultas
+_loop = None
+_loop_lock = threading.Lock()
+
+
+async def _request(client, limite, method, path, **kwargs):
+    # Mismos reintentos y métricas que la sesión síncrona; el semáforo limita las peticiones en curso
+    for intento in range(session.max_retries + 1):
+        async with limite:
+            inicio = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+            except httpx.TransportError:
+                session.record(time.perf_counter() - inicio, error=True)
+                if intento == session.max_retries:
+                    raise
+                response = None
+            else:
+                session.record(time.perf_counter() - inicio, error=response.status_code >= 400)
+                if response.status_code not in RETRY_STATUS or intento == session.max_retries:
+                    return response
+        await asyncio.sleep(session.retry_delay(intento, response))
+
+async def fetch_pages_async(client, limite, table, select=None, filters=None, order=None, page_size=PAGE_SIZE, key_column=None):
+    """
+    Variante asíncrona de `supabase_api.fetch_pages_from_supabase` (mismas páginas, ver
+    `supabase_api.page_requests`).
+    :param client: `httpx.AsyncClient` del bucle (`shared_client`).
+    :param limite: `asyncio.Semaphore` que limita las peticiones simultáneas.
+    :return: Lista de páginas (listas de diccionarios).
+    """
+    paginas = []
+    plan = page_requests(table, select, filters, order, page_size, key_column)
+    params = next(plan)
+    while True:
+        response = await _request(client, limite, "GET", f"/rest/v1/{table}", params=params)
+        if response.status_code != 200:
+            raise SupabaseError.from_response(response)
+
+        page = response.json()
+        if page:
+            paginas.append(page)
+        try:
+            params = plan.send(page)
+        except StopIteration:
+            return paginas
+
+async def fetch_dataframe_async(client, limite, table, select=None, filters=None, order=None, page_size=PAGE_SIZE,
+                                key_column=None, use_cache=True):
+    """
+    Variante asíncrona de `supabase_api.fetch_dataframe_from_supabase` (comparte la misma caché).
+    """
+    key = QueryCache.make_key(table, select=select, filters=filters, order=order)
+    if use_cache:
+        cached = query_cache.get(key)
+        if cached is not None:
+            return cached.copy()
+
+    paginas = await fetch_pages_async(client, limite, table, select, filters, order, page_size, key_column)
+    df = pd.concat([pd.DataFrame(p) for p in paginas], ignore_index=True) if paginas else pd.DataFrame(columns=select or [])
+
+    if use_cache:
+        query_cache.set(key, df, size=int(df.memory_usage(index=True, deep=True).sum()))
+        return df.copy()
+    return df
+
+async def call_rpc_async(client, limite, function, params=None, use_cache=True, order=None, page_size=PAGE_SIZE):
+    """
+    Variante asíncrona de `supabase_api.call_rpc` (comparte la misma caché y la misma paginación).
+    """
+    key = QueryCache.make_key(f"rpc/{function}", params=params)
+    if use_cache:
+        cached = query_cache.get(key)
+        if cached is not None:
+            return cached.copy()
+
+    frames = []
+    plan = page_requests(f"rpc/{function}", order=order, page_size=page_size)
+    consulta = next(plan)
+    while True:
+        response = await _request(client, limite, "POST", f"/rest/v1/rpc/{function}", params=consulta, json=params or {})
+        if response.status_code != 200:
+            raise SupabaseError.from_response(response, f"Error al ejecutar la función {function} en Supabase")
+        page = response.json()
+        if page:
+            frames.append(pd.DataFrame(page))
+        try:
+            consulta = plan.send(page)
+        except StopIteration:
+            break
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    if use_cache:
+        query_cache.set(key, df, size=int(df.memory_usage(index=True, deep=True).sum()))
+        return df.copy()
+    return df
+
+def open_client(max_concurrency=MAX_CONCURRENCY):
+    """
+    Cliente HTTP asíncrono nuevo con las mismas cabeceras y tiempos máximos que la sesión
+    compartida. Las consultas de la aplicación usan `shared_client`.
+    """
+    connect, read = session.timeout
+    return httpx.AsyncClient(
+        base_url=session.base_url,
+        # Como `requests`, se omiten las cabeceras sin valor (por ejemplo sin SUPABASE_KEY)
+        headers={**{k: v for k, v in session.headers.items() if v is not None}, "Accept-Encoding": "gzip, deflate"},
+        timeout=httpx.Timeout(read, connect=connect),
+        limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+    )
+
+async def shared_client():
+    """
+    Cliente HTTP asíncrono del bucle de eventos actual, reutilizado entre consultas (conexiones
+    abiertas). Se vuelve a crear si cambia la configuración de la sesión (`use_backend`).
+    """
+    loop = asyncio.get_running_loop()
+    configuracion = (session.base_url, tuple(sorted(session.headers.items())), session.timeout)
+    actual = _clients.get(loop)
+    if actual is not None and actual[0] == configuracion and not actual[1].is_closed:
+        return actual[1]
+    if actual is not None:
+        await actual[1].aclose()
+    client = open_client()
+    _clients[loop] = (configuracion, client)
+    return client
+
+async def gather_queries(queries, max_concurrency=MAX_CONCURRENCY):
+    """
+    Ejecuta varias consultas a la vez, con como máximo `max_concurrency` peticiones en curso
+    (y `MAX_CONCURRENCY` conexiones, las del cliente compartido).
+    :param queries: Diccionario nombre -> argumentos de la consulta. Con la clave `rpc` se llama a
+                    esa función (`params` opcional); si no, se pasan a `fetch_dataframe_async`
+                    (`table`, `select`, `filters`, `order`, `key_column`, `use_cache`...).
+    :return: Diccionario nombre -> DataFrame.
+    """
+    limite = asyncio.Semaphore(max(1, max_concurrency))
+    client = await shared_client()
+    tareas = []
+    for consulta in queries.values():
+        consulta = dict(consulta)
+        if "rpc" in consulta:
+            tareas.append(call_rpc_async(client, limite, consulta.pop("rpc"), **consulta))
+        else:
+            tareas.append(fetch_dataframe_async(client, limite, **consulta))
+    resultados = await asyncio.gather(*tareas)
+    return dict(zip(queries, resultados))
+
+def _background_loop():
+    # Bucle de eventos de larga duración: su cliente (y sus conexiones) sirve a todas las llamadas
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="supabase-async", daemon=True).start()
+    return _loop
+
+def fetch_many(queries, max_concurrency=MAX_CONCURRENCY):
+    """
+    Versión síncrona de `gather_queries` para las secciones de Streamlit: el tiempo total es
+    el de la consulta más lenta y no la suma de todas. Las consultas se ejecutan en un bucle de
+    eventos propio, en otro hilo, así que funciona también si el hilo actual ya tiene uno.
+    :param queries: Ver `gather_queries`.
+    :return: Diccionario nombre -> DataFrame.
+    """
+    return asyncio.run_coroutine_threadsafe(gather_queries(queries, max_concurrency), _background_loop()).result()
@@ -0,0 +1,345 @@
+"""
+Pruebas de rendimiento de los caminos críticos (carga, mapeo de claves, codificación,
+entrenamiento, agregados, upsert por lotes, tablas paginadas y gráficos) con datos sintéticos servidos por el
+backend local (local_backend.LocalPostgREST).
+
+    python -m benchmarks.run --size 10k
+    python -m benchmarks.run --size 1m --cases ingesta_csv,paginacion
+    python -m benchmarks.run --size 10k --update-baseline
+    python -m benchmarks.run --size 10k --latency 0.02 --jitter 0.01 --error-rate 0.01
+
+Cada caso se ejecuta en un proceso nuevo (`--repeat` veces, se conserva la mejor ejecución) para
+medir su memoria máxima (RSS) por separado.
+Los resultados se comparan con benchmarks/baseline.json y se marcan como regresión los casos
+que superan la línea base en más de `--tolerance`; en ese caso el proceso termina con código 1.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from benchmarks import synthetic
+from local_backend import LocalPostgREST
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+# Filas máximas con las que se entrena el RandomForest (el resto de casos usa el tamaño completo)
+FIT_ROWS = 200_000
+# Filas máximas del caso upsert_lotes
+UPSERT_ROWS = 200_000
+# Diferencias por debajo de estos mínimos se consideran ruido
+MIN_SECONDS = 0.1
+MIN_RSS_MB = 20
+
+
+# --- Casos (se ejecutan en el proceso hijo) ---
+
+def case_ingesta_csv(data_dir, rows):
+    from ingestion import ingest_file
+
+    with open(os.path.join(data_dir, "carga.csv"), "rb") as f:
+        resultado = ingest_file(f, "carga.csv", table="ordencompra_carga")
+    return {"filas_insertadas": resultado["insertadas"], "filas_invalidas": resultado["filas_invalidas"]}
+
+def case_mapeo_claves(data_dir, rows):
+    from dimension_cache import resolve_foreign_keys
+
+    df = pd.read_parquet(os.path.join(data_dir, "claves.parquet"))
+    inicio = time.perf_counter()
+    _, no_mapeados = resolve_foreign_keys(df)
+    return {"no_mapeados": len(no_mapeados), "_segundos": time.perf_counter() - inicio}
+
+def case_codificacion(data_dir, rows):
+    from sections.predictions import encode_categorical_columns
+    from sections.train_model import preprocess_data
+
+    df = pd.read_parquet(os.path.join(data_dir, "vista.parquet"))
+    inicio = time.perf_counter()
+    columnas = ["categoria", "subcategoria", "tipo_compra", "nombre_proveedor", "producto_tipo"]
+    encode_categorical_columns(df, columnas)
+    preprocess_data(df, columnas + ["cantidad", "precio_total"])
+    return {"_segundos": time.perf_counter() - inicio}
+
+def case_random_forest(data_dir, rows):
+    from sklearn.ensemble import RandomForestRegressor
+    from sections.train_model import preprocess_data
+
+    df = pd.read_parquet(os.path.join(data_dir, "vista.parquet")).head(FIT_ROWS)
+    inicio = time.perf_counter()
+    features = ["categoria", "tipo_compra", "cantidad", "precio_total"]
+    X, _ = preprocess_data(df, features)
+    RandomForestRegressor(n_estimators=50, random_state=42, n_jobs=-1).fit(X, df["tiempo_entrega"])
+    return {"filas_entrenamiento": len(df), "_segundos": time.perf_counter() - inicio}
+
+def case_agregados(data_dir, rows):
+    from aggregations import fetch_category_counts, fetch_monthly_demand, fetch_order_summary, sum_counts
+
+    categorias = sum_counts(fetch_category_counts(), ["categoria"])
+    resumen = fetch_order_summary()
+    sum_counts(resumen, ["estado"])
+    sum_counts(resumen, ["mes"])
+    sum_counts(resumen, ["tipo_compra"])
+    demanda = fetch_monthly_demand()
+    return {"categorias": len(categorias), "filas_resumen": len(resumen), "meses_demanda": len(demanda)}
+
+def case_paginacion(data_dir, rows):
+    from supabase_api import fetch_dataframe_from_supabase
+
+    df = fetch_dataframe_from_supabase("ordencompra", key_column="id", use_cache=False)
+    return {"filas": len(df)}
+
+def case_upsert_lotes(data_dir, rows):
+    from supabase_api import upsert_dataframe_into_supabase
+
+    df = pd.read_parquet(os.path.join(data_dir, "ordenes.parquet")).drop(columns=["id"])
+    # La segunda pasada actualiza las filas existentes (rama on conflict)
+    for _ in range(2):
+        resultado = upsert_dataframe_into_supabase("ordencompra_upsert", df, on_conflict="codigo_de_compra")
+    return {"filas": resultado["filas"], "lotes_fallidos": len(resultado["errores"])}
+
+def case_tabla_paginada(data_dir, rows):
+    from table_paging import PageView
+
+    df = pd.read_parquet(os.path.join(data_dir, "vista.parquet"))
+    inicio = time.perf_counter()
+    vista = PageView()
+    # Primera página, orden por número y por texto, filtro por texto y por mes; cada consulta se repite (reejecución)
+    for opciones in [{}, {"sort": "cantidad", "ascending": False}, {"sort": "nombre_proveedor"},
+                     {"filter_column": "categoria", "filter_text": "equi"},
+                     {"sort": "precio_total", "filter_column": "fecha_pedido_compra", "filter_text": "2022-03"}]:
+        for pagina in (1, 2):
+            vista.page(df, pagina, 100, version=1, **opciones)
+    return {"_segundos": time.perf_counter() - inicio}
+
+def case_graficos(data_dir, rows):
+    from chart_prep import category_counts, downsample_series
+
+    df = pd.read_parquet(os.path.join(data_dir, "vista.parquet"), columns=["fecha_pedido_compra", "cantidad", "categoria"])
+    inicio = time.perf_counter()
+    serie = df.groupby("fecha_pedido_compra", as_index=False)["cantidad"].sum()
+    downsample_series(serie, "fecha_pedido_compra", "cantidad")
+    downsample_series(serie, "fecha_pedido_compra", "cantidad", method="minmax")
+    category_counts(df["categoria"], "categoria")
+    return {"puntos": len(serie), "_segundos": time.perf_counter() - inicio}
+
+CASES = {
+    "ingesta_csv": case_ingesta_csv,
+    "mapeo_claves": case_mapeo_claves,
+    "codificacion": case_codificacion,
+    "random_forest": case_random_forest,
+    "agregados": case_agregados,
+    "paginacion": case_paginacion,
+    "upsert_lotes": case_upsert_lotes,
+    "tabla_paginada": case_tabla_paginada,
+    "graficos": case_graficos,
+}
+
+
+def run_child(case, data_dir, rows):
+    """
+    Ejecuta un caso en el proceso actual y devuelve sus métricas. Si el caso mide su propio
+    tiempo (`_segundos`, sin contar la lectura de los datos de entrada) se usa ese valor.
+    """
+    from supabase_api import session
+
+    inicio = time.perf_counter()
+    extra = CASES[case](data_dir, rows)
+    segundos = extra.pop("_segundos", time.perf_counter() - inicio)
+    return {
+        "segundos": round(segundos, 4),
+        "rss_max_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peticiones": session.stats()["peticiones"],
+        "latencia_p95_ms": round(session.stats()["latencia_p95_ms"], 2),
+        **extra,
+    }
+
+
+# --- Preparación de datos y comparación (proceso principal) ---
+
+class _ParquetChunks:
+    """
+    Escribe un archivo Parquet bloque a bloque (el esquema es el del primer bloque).
+    """
+    def __init__(self, path):
+        self.path = path
+        self._writer = None
+
+    def write(self, df):
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, tabla.schema)
+        self._writer.write_table(tabla)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+def _ordencompra_chunks(data_dir, rows, dimensiones, seed):
+    """
+    Genera `ordencompra` por bloques y, a medida que pasan, escribe claves.parquet (claves de negocio
+    de cada fila) y ordenes.parquet (las primeras UPSERT_ROWS filas).
+    """
+    claves = _ParquetChunks(os.path.join(data_dir, "claves.parquet"))
+    ordenes = _ParquetChunks(os.path.join(data_dir, "ordenes.parquet"))
+    pendientes = UPSERT_ROWS
+    try:
+        for bloque in synthetic.iter_generated(synthetic.generate_ordencompra, rows, seed):
+            carga = synthetic.upload_frame(bloque, dimensiones, invalid_fraction=0)
+            claves.write(carga[["codigo_producto", "ruc_proveedor", "centro_de_coste"]])
+            if pendientes > 0:
+                ordenes.write(bloque.head(pendientes))
+                pendientes -= min(pendientes, len(bloque))
+            yield bloque
+    finally:
+        claves.close()
+        ordenes.close()
+
+def _vista_chunks(data_dir, rows, seed):
+    """
+    Genera `vista_analisis_compras4` por bloques y los escribe en vista.parquet a medida que pasan.
+    """
+    vista = _ParquetChunks(os.path.join(data_dir, "vista.parquet"))
+    try:
+        for bloque in synthetic.iter_generated(synthetic.generate_vista_analisis, rows, seed):
+            vista.write(bloque)
+            yield bloque
+    finally:
+        vista.close()
+
+def prepare_data(data_dir, backend, rows, seed=0):
+    """
+    Genera los datos sintéticos en `data_dir` y los carga en el backend local. Los datos se generan,
+    escriben y cargan por bloques (synthetic.CHUNK_ROWS filas), de modo que nunca está el conjunto
+    completo en memoria.
+    """
+    dimensiones = synthetic.generate_dimensions(seed)
+    synthetic.write_upload_csv(os.path.join(data_dir, "carga.csv"), rows, dimensiones, seed)
+
+    backend.load_table("producto", dimensiones["producto"], unique=[["codigo_producto"]])
+    backend.load_table("proveedor", dimensiones["proveedor"], unique=[["ruc_proveedor"]])
+    backend.load_table("centrodecoste", dimensiones["centrodecoste"], unique=[["centro_de_coste"]])
+    backend.load_table("ordencompra", _ordencompra_chunks(data_dir, rows, dimensiones, seed), unique=[["codigo_de_compra"]])
+    vacia = synthetic.generate_ordencompra(1, seed).head(0)
+    backend.load_table("ordencompra_carga", vacia, unique=[["codigo_de_compra"]])
+    backend.load_table("ordencompra_upsert", vacia, unique=[["codigo_de_compra"]])
+    backend.load_table("vista_analisis_compras4", _vista_chunks(data_dir, rows, seed))
+    # Segunda pasada sobre la misma secuencia (determinista por semilla) en lugar de guardar la vista
+    backend.load_table("vista_categorias_compras", (
+        bloque[["categoria", "subcategoria"]]
+        for bloque in synthetic.iter_generated(synthetic.generate_vista_analisis, rows, seed)
+    ))
+
+def compare(resultados, baseline, tolerance):
+    """
+    Compara los resultados con la línea base.
+    :return: Lista de regresiones (texto) encontradas.
+    """
+    regresiones = []
+    for clave, actual in resultados.items():
+        base = baseline.get(clave)
+        if base is None:
+            continue
+        if actual["segundos"] > base["segundos"] * (1 + tolerance) and actual["segundos"] - base["segundos"] > MIN_SECONDS:
+            regresiones.append(f"{clave}: tiempo {actual['segundos']:.3f} s (línea base {base['segundos']:.3f} s)")
+        if actual["rss_max_mb"] > base["rss_max_mb"] * (1 + tolerance) and actual["rss_max_mb"] - base["rss_max_mb"] > MIN_RSS_MB:
+            regresiones.append(f"{clave}: memoria {actual['rss_max_mb']:.0f} MB (línea base {base['rss_max_mb']:.0f} MB)")
+        if actual["peticiones"] > base["peticiones"]:
+            regresiones.append(f"{clave}: {actual['peticiones']} peticiones (línea base {base['peticiones']})")
+    return regresiones
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pruebas de rendimiento con datos sintéticos.")
+    parser.add_argument("--size", choices=list(synthetic.SIZES), default="10k")
+    parser.add_argument("--cases", default=",".join(CASES), help="Casos separados por coma.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Guardar los resultados como nueva línea base.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Aumento relativo permitido (0.25 = 25 %%).")
+    parser.add_argument("--repeat", type=int, default=3, help="Ejecuciones por caso; se conserva la mejor.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia fija por petición, en segundos.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Media de la latencia adicional (exponencial), en segundos.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proporción de peticiones que responden 503.")
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados.")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--data-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    rows = synthetic.SIZES[args.size]
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.data_dir, rows)))
+        return 0
+
+    casos = [c for c in args.cases.split(",") if c]
+    desconocidos = set(casos) - set(CASES)
+    if desconocidos:
+        parser.error(f"Casos desconocidos: {', '.join(sorted(desconocidos))}")
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        print(f"Generando {rows} filas sintéticas...", flush=True)
+        backend = LocalPostgREST(
+            os.path.join(data_dir, "backend.db"), latency=args.latency, jitter=args.jitter,
+            error_rate=args.error_rate, seed=0, max_rows=1000,
+        )
+        prepare_data(data_dir, backend, rows)
+        url = backend.start()
+        env = {
+            **os.environ, "SUPABASE_URL": url, "SUPABASE_KEY": "benchmark",
+            # Cada caso empieza con las cachés vacías y sin copias locales previas
+            "SNAPSHOT_DIR": os.path.join(data_dir, "snapshots"), "MODELS_DIR": os.path.join(data_dir, "models"),
+        }
+        try:
+            for caso in casos:
+                ejecuciones = []
+                for _ in range(max(1, args.repeat)):
+                    salida = subprocess.run(
+                        [sys.executable, "-m", "benchmarks.run", "--size", args.size, "--child", caso, "--data-dir", data_dir],
+                        env=env, capture_output=True, text=True,
+                    )
+                    if salida.returncode != 0:
+                        print(f"{caso}: error\n{salida.stderr}", file=sys.stderr)
+                        break
+                    ejecuciones.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+                if not ejecuciones:
+                    continue
+                # La mejor ejecución reduce el ruido de la máquina
+                r = min(ejecuciones, key=lambda e: e["segundos"])
+                r["rss_max_mb"] = min(e["rss_max_mb"] for e in ejecuciones)
+                resultados[f"{caso}@{args.size}"] = r
+                print(
+                f"{caso:<15} {r['segundos']:>9.3f} s {r['rss_max_mb']:>9.0f} MB {r['peticiones']:>7} peticiones"
+                f" {r['latencia_p95_ms']:>9.1f} ms p95", flush=True,
+            )
+        finally:
+            backend.stop()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    if args.update_baseline:
+        baseline.update(resultados)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Línea base actualizada en {args.baseline}")
+        return 0
+
+    regresiones = compare(resultados, baseline, args.tolerance)
+    for regresion in regresiones:
+        print(f"REGRESIÓN {regresion}")
+    if not regresiones:
+        print("Sin regresiones respecto a la línea base.")
+    return 1 if regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
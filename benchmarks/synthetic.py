@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+
+# Tamaños de las pruebas de rendimiento
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+# Filas generadas de una vez; los tamaños grandes se generan y escriben por bloques
+CHUNK_ROWS = 500_000
+
+N_PRODUCTOS = 2_000
+N_PROVEEDORES = 300
+N_CENTROS = 50
+TIPOS_COMPRA = np.array(["Bienes", "Servicios", "Urgente", "Regular", "Contrato marco"])
+CATEGORIAS = np.array(["Materiales", "Equipos", "Repuestos", "Oficina", "Limpieza", "Tecnología", "Seguridad"])
+PRODUCTO_TIPOS = np.array(["Consumible", "Activo", "Servicio", "Insumo"])
+INICIO = np.datetime64("2021-01-01T00:00:00")
+
+
+def generate_dimensions(seed=0):
+    """
+    Tablas `producto`, `proveedor` y `centrodecoste` sintéticas.
+    :return: Diccionario tabla -> DataFrame.
+    """
+    rng = np.random.default_rng(seed)
+    return {
+        "producto": pd.DataFrame({
+            "id": np.arange(1, N_PRODUCTOS + 1),
+            "codigo_producto": [f"P{i:06d}" for i in range(1, N_PRODUCTOS + 1)],
+            "categoria": rng.choice(CATEGORIAS, N_PRODUCTOS),
+        }),
+        "proveedor": pd.DataFrame({
+            "id": np.arange(1, N_PROVEEDORES + 1),
+            "ruc_proveedor": [str(20100000000 + i) for i in range(1, N_PROVEEDORES + 1)],
+            "nombre_proveedor": [f"Proveedor {i}" for i in range(1, N_PROVEEDORES + 1)],
+        }),
+        "centrodecoste": pd.DataFrame({
+            "id": np.arange(1, N_CENTROS + 1),
+            "centro_de_coste": [f"CC{i:03d}" for i in range(1, N_CENTROS + 1)],
+        }),
+    }
+
+def _fechas(rng, n):
+    pedido = INICIO + rng.integers(0, 4 * 365 * 24 * 3600, n).astype("timedelta64[s]")
+    creacion = pedido + rng.integers(0, 2 * 24 * 3600, n).astype("timedelta64[s]")
+    aprobacion = creacion + rng.integers(3600, 10 * 24 * 3600, n).astype("timedelta64[s]")
+    recepcion = aprobacion + (rng.gamma(2.0, 5.0, n) * 24 * 3600).astype("timedelta64[s]")
+    return pedido, creacion, aprobacion, recepcion
+
+def generate_ordencompra(n, seed=0, start_id=1):
+    """
+    Tabla `ordencompra` sintética con claves foráneas válidas.
+    :param n: Número de filas.
+    :param start_id: Primer `id` (para generar bloques consecutivos).
+    """
+    rng = np.random.default_rng(seed)
+    pedido, creacion, aprobacion, recepcion = _fechas(rng, n)
+    ids = np.arange(start_id, start_id + n)
+    return pd.DataFrame({
+        "id": ids,
+        "codigo_de_compra": np.char.add("OC", ids.astype(str)),
+        "usuario_comprador": np.char.add("usuario", rng.integers(1, 200, n).astype(str)),
+        "tipo_compra": rng.choice(TIPOS_COMPRA, n),
+        "cantidad": np.round(rng.lognormal(3, 1, n), 2),
+        "impuestos": np.round(rng.uniform(0, 500, n), 2),
+        "estado": rng.integers(1, 6, n),
+        "fecha_pedido_compra": pedido.astype("datetime64[ns]"),
+        "fecha_creacion_compra": creacion.astype("datetime64[ns]"),
+        "fecha_aprobacion_compra": aprobacion.astype("datetime64[ns]"),
+        "fecha_recepcion": recepcion.astype("datetime64[ns]"),
+        "producto_id": rng.integers(1, N_PRODUCTOS + 1, n),
+        "proveedor_id": rng.integers(1, N_PROVEEDORES + 1, n),
+        "centrodecoste_id": rng.integers(1, N_CENTROS + 1, n),
+    })
+
+def generate_vista_analisis(n, seed=0, start_id=1):
+    """
+    Vista `vista_analisis_compras4` sintética (columnas que usan el entrenamiento y las predicciones).
+    """
+    rng = np.random.default_rng(seed)
+    pedido, _, aprobacion, recepcion = _fechas(rng, n)
+    cantidad = np.round(rng.lognormal(3, 1, n), 2)
+    precio = np.round(cantidad * rng.uniform(5, 200, n), 2)
+    categoria = rng.choice(CATEGORIAS, n)
+    return pd.DataFrame({
+        "id": np.arange(start_id, start_id + n),
+        "categoria": categoria,
+        "subcategoria": np.char.add(categoria.astype(str), rng.integers(1, 6, n).astype(str)),
+        "tipo_compra": rng.choice(TIPOS_COMPRA, n),
+        "nombre_proveedor": np.char.add("Proveedor ", rng.integers(1, N_PROVEEDORES + 1, n).astype(str)),
+        "producto_tipo": rng.choice(PRODUCTO_TIPOS, n),
+        "cantidad": cantidad,
+        "precio_total": precio,
+        "tiempo_entrega": ((recepcion - aprobacion) / np.timedelta64(1, "D")).round(1),
+        "estado": rng.integers(1, 6, n),
+        "fecha_pedido_compra": pedido.astype("datetime64[ns]"),
+    })
+
+def iter_generated(generator, n, seed=0, chunk_size=CHUNK_ROWS):
+    """
+    Genera `n` filas por bloques (ids consecutivos), para tamaños que no caben de una vez.
+    :param generator: `generate_ordencompra` o `generate_vista_analisis`.
+    :return: Generador de DataFrames.
+    """
+    for i, inicio in enumerate(range(0, n, chunk_size)):
+        yield generator(min(chunk_size, n - inicio), seed=seed + i, start_id=inicio + 1)
+
+def upload_frame(df, dimensions, invalid_fraction=0.001, seed=0):
+    """
+    Convierte un bloque de `ordencompra` en una plantilla de carga: fechas en texto
+    'DD/MM/YYYY HH:MM:SS', claves de negocio en lugar de ids y una fracción de celdas inválidas.
+    """
+    rng = np.random.default_rng(seed)
+    out = df.drop(columns=["id", "producto_id", "proveedor_id", "centrodecoste_id"])
+    for col in ["fecha_pedido_compra", "fecha_creacion_compra", "fecha_aprobacion_compra", "fecha_recepcion"]:
+        out[col] = out[col].dt.strftime("%d/%m/%Y %H:%M:%S")
+    for col, tabla, clave in [("producto_id", "producto", "codigo_producto"),
+                              ("proveedor_id", "proveedor", "ruc_proveedor"),
+                              ("centrodecoste_id", "centrodecoste", "centro_de_coste")]:
+        out[clave] = dimensions[tabla][clave].to_numpy()[df[col].to_numpy() - 1]
+    invalidas = rng.random(len(out)) < invalid_fraction
+    out["cantidad"] = out["cantidad"].astype(object)
+    out.loc[invalidas, "cantidad"] = "n/a"
+    return out
+
+def write_upload_csv(path, n, dimensions, seed=0, chunk_size=CHUNK_ROWS):
+    """
+    Escribe por bloques una plantilla de carga CSV de `n` filas.
+    """
+    for i, bloque in enumerate(iter_generated(generate_ordencompra, n, seed, chunk_size)):
+        upload_frame(bloque, dimensions, seed=seed + i).to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
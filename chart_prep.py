@@ -0,0 +1,112 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+
+
+# Máximo de puntos por serie que se envían al navegador
+MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "2000"))
+# Bytes aproximados de un punto (x, y y su separador) en el JSON de la figura, para estimar
+# cuánto se deja de enviar sin volver a serializar el gráfico
+BYTES_PER_POINT = 40
+
+
+def _numeric(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+def lttb_indices(x, y, n_out):
+    """
+    Índices de los puntos elegidos por Largest-Triangle-Three-Buckets, que conserva la forma
+    visual de la serie (picos incluidos) con `n_out` puntos.
+    :param x: Valores del eje x ordenados (numéricos o fechas).
+    :param y: Valores del eje y.
+    :param n_out: Número de puntos a conservar.
+    :return: Array de índices en orden creciente.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = _numeric(x)
+    y = np.asarray(y, dtype=np.float64)
+    every = (n - 2) / (n_out - 2)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        inicio_sig = int(np.floor((i + 1) * every)) + 1
+        fin_sig = min(int(np.floor((i + 2) * every)) + 1, n)
+        avg_x = x[inicio_sig:fin_sig].mean()
+        avg_y = y[inicio_sig:fin_sig].mean()
+        inicio = int(np.floor(i * every)) + 1
+        fin = int(np.floor((i + 1) * every)) + 1
+        areas = np.abs((x[a] - avg_x) * (y[inicio:fin] - y[a]) - (x[a] - x[inicio:fin]) * (avg_y - y[a]))
+        a = inicio + int(np.argmax(areas))
+        indices[i + 1] = a
+    indices[-1] = n - 1
+    return indices
+
+def minmax_indices(y, n_out):
+    """
+    Índices del mínimo y el máximo de cada tramo (n_out / 2 tramos), calculados de forma vectorizada.
+    Es más rápido que LTTB y conserva todos los extremos locales.
+    :return: Array de índices en orden creciente.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    tramos = n_out // 2
+    tramo = np.arange(n) * tramos // n
+    orden = np.lexsort((y, tramo))
+    limites = np.searchsorted(tramo[orden], np.arange(tramos + 1))
+    minimos = orden[limites[:-1]]
+    maximos = orden[limites[1:] - 1]
+    return np.unique(np.concatenate([minimos, maximos]))
+
+def downsample_series(df, x, y, max_points=MAX_POINTS, method="lttb"):
+    """
+    Reduce una serie (línea) a como máximo `max_points` puntos.
+    :param df: DataFrame con la serie ordenada por `x`.
+    :param method: "lttb" o "minmax".
+    :return: Tupla (DataFrame reducido, estadísticas de la reducción).
+    """
+    inicio = time.perf_counter()
+    if method == "lttb":
+        idx = lttb_indices(df[x].to_numpy(), df[y].to_numpy(), max_points)
+    elif method == "minmax":
+        idx = minmax_indices(df[y].to_numpy(), max_points)
+    else:
+        raise ValueError(f"Método de reducción no soportado: {method}")
+    reducido = df.iloc[idx]
+    return reducido, _stats(len(df), len(reducido), inicio)
+
+def sample_points(df, max_points=MAX_POINTS, random_state=42):
+    """
+    Muestra aleatoria de puntos para gráficos de dispersión.
+    :return: Tupla (DataFrame reducido, estadísticas de la reducción).
+    """
+    inicio = time.perf_counter()
+    reducido = df if len(df) <= max_points else df.sample(max_points, random_state=random_state)
+    return reducido, _stats(len(df), len(reducido), inicio)
+
+def category_counts(values, name, count_name="conteo"):
+    """
+    Conteo por categoría para gráficos de barras y circulares (una fila por categoría).
+    :param values: Serie o array con una categoría por registro.
+    :return: Tupla (DataFrame con `name` y `count_name`, estadísticas de la reducción).
+    """
+    inicio = time.perf_counter()
+    serie = pd.Series(values, name=name)
+    conteos = serie.value_counts(sort=True).rename_axis(name).reset_index(name=count_name)
+    return conteos, _stats(len(serie), len(conteos), inicio)
+
+def _stats(originales, enviados, inicio):
+    return {
+        "puntos_originales": int(originales),
+        "puntos_enviados": int(enviados),
+        "bytes_evitados": max(0, int(originales) - int(enviados)) * BYTES_PER_POINT,
+        "ms_preparacion": (time.perf_counter() - inicio) * 1000,
+    }
@@ -0,0 +1,149 @@
+import threading
+import time
+import pandas as pd
+from dimension_cache import DIMENSIONS, dimension_cache
+from ingestion import NOT_NULL, ORDENCOMPRA_SCHEMA, UNIQUE_COLUMN, convert_column
+from snapshot_sync import load_snapshot, snapshot_version, sync_table
+from supabase_api import add_invalidation_listener
+
+
+# Filas de ejemplo que se guardan por cada tipo de problema
+SAMPLE_ROWS = 5
+# Filas por bloque al analizar tablas grandes
+CHUNK_ROWS = 200_000
+# Rangos válidos (mínimo, máximo) de las columnas numéricas; None = sin límite
+RANGES = {"cantidad": (0, None), "impuestos": (0, None)}
+# Clave foránea -> (tabla de dimensión, columna clave)
+FOREIGN_KEYS = {destino: (tabla, clave) for tabla, clave, destino in DIMENSIONS.values()}
+# Comprobaciones que se cuentan por columna
+CHECKS = ["nulos", "nulos_requeridos", "no_conformes", "fuera_de_rango", "huerfanos", "duplicados"]
+
+_reports = {}
+_reports_lock = threading.Lock()
+
+
+def _range_mask(col, valores):
+    if col in RANGES:
+        minimo, maximo = RANGES[col]
+        mascara = pd.Series(False, index=valores.index)
+        if minimo is not None:
+            mascara |= valores < minimo
+        if maximo is not None:
+            mascara |= valores > maximo
+        return mascara.fillna(False).to_numpy(dtype=bool)
+    if pd.api.types.is_datetime64_any_dtype(valores):
+        # Fechas en el futuro: casi siempre día y mes invertidos o un error de carga
+        return (valores > pd.Timestamp.now() + pd.Timedelta(days=1)).to_numpy(dtype=bool)
+    return None
+
+def _chunk_checks(df, schema, ids, vistos):
+    # Devuelve {(comprobación, columna): máscara booleana de filas con el problema}
+    columnas = [col for col in schema if col in df.columns]
+    nulos = df[columnas].isna()
+    mascaras = {}
+    for col in columnas:
+        tipo = schema[col]
+        valores = df[col]
+        mascaras[("nulos", col)] = nulos[col].to_numpy()
+        if col in NOT_NULL:
+            mascaras[("nulos_requeridos", col)] = mascaras[("nulos", col)]
+        if tipo != "texto":
+            valores = convert_column(valores, tipo)
+            mascaras[("no_conformes", col)] = (valores.isna() & ~nulos[col]).to_numpy()
+        fuera = _range_mask(col, valores)
+        if fuera is not None:
+            mascaras[("fuera_de_rango", col)] = fuera
+        if col in ids:
+            mascaras[("huerfanos", col)] = (valores.notna() & ~valores.isin(ids[col])).to_numpy(dtype=bool)
+
+    if UNIQUE_COLUMN in df.columns:
+        # Repetido dentro del bloque o ya visto en un bloque anterior (la primera aparición no cuenta)
+        codigos = df[UNIQUE_COLUMN]
+        repetidos = codigos.notna() & (codigos.duplicated(keep="first") | codigos.isin(vistos))
+        mascaras[("duplicados", UNIQUE_COLUMN)] = repetidos.to_numpy()
+        vistos.update(codigos.dropna().unique())
+    return mascaras
+
+def profile_chunks(chunks, schema=ORDENCOMPRA_SCHEMA, sample_rows=SAMPLE_ROWS):
+    """
+    Calcula la calidad de los datos bloque a bloque: nulos, valores que no cumplen el tipo
+    esperado, valores fuera de rango, códigos de compra repetidos y claves foráneas sin registro
+    en su tabla de dimensión. Cada comprobación es vectorizada sobre el bloque completo.
+    :param chunks: Iterable de DataFrames con las columnas de `ordencompra`.
+    :param schema: Diccionario columna -> tipo esperado (ver `ingestion.ORDENCOMPRA_SCHEMA`).
+    :param sample_rows: Filas de ejemplo que se guardan por tipo de problema.
+    :return: Diccionario con `filas`, `columnas` (conteo de cada comprobación por columna),
+             `totales` (comprobación -> filas afectadas), `muestras` (comprobación -> DataFrame
+             con filas de ejemplo y la columna afectada), `problemas` y `segundos`.
+    """
+    inicio = time.perf_counter()
+    dimension_cache.preload([FOREIGN_KEYS[col] for col in FOREIGN_KEYS if col in schema])
+    ids = {col: dimension_cache.lookup(tabla, clave)[1] for col, (tabla, clave) in FOREIGN_KEYS.items() if col in schema}
+    conteos = pd.DataFrame(0, index=pd.Index(list(schema), name="columna"), columns=CHECKS)
+    muestras = {}
+    vistos = set()
+    filas = 0
+    for chunk in chunks:
+        filas += len(chunk)
+        for (comprobacion, col), mascara in _chunk_checks(chunk, schema, ids, vistos).items():
+            total = int(mascara.sum())
+            if not total:
+                continue
+            conteos.loc[col, comprobacion] += total
+            guardadas = muestras.setdefault(comprobacion, [])
+            if comprobacion != "nulos" and sum(len(m) for m in guardadas) < sample_rows:
+                guardadas.append(chunk[mascara].head(sample_rows).assign(columna=col))
+
+    conteos.insert(0, "tipo_esperado", pd.Series(schema))
+    totales = conteos[CHECKS].sum().astype(int).to_dict()
+    return {
+        "filas": filas,
+        "columnas": conteos,
+        "totales": totales,
+        "muestras": {c: pd.concat(m).head(sample_rows) for c, m in muestras.items() if m},
+        "problemas": any(v for c, v in totales.items() if c != "nulos"),
+        "segundos": time.perf_counter() - inicio,
+    }
+
+def profile_dataframe(df, schema=ORDENCOMPRA_SCHEMA, chunk_size=CHUNK_ROWS, sample_rows=SAMPLE_ROWS):
+    """
+    Perfil de calidad de un DataFrame en memoria, analizado por bloques de `chunk_size` filas.
+    """
+    chunks = (df.iloc[i:i + chunk_size] for i in range(0, max(len(df), 1), chunk_size))
+    return profile_chunks(chunks, schema, sample_rows)
+
+def profile_snapshot(table="ordencompra", schema=ORDENCOMPRA_SCHEMA, use_cache=True):
+    """
+    Perfil de calidad de la copia local de una tabla. El resultado se guarda por versión de la
+    copia, de modo que volver a abrir la página sin datos nuevos no repite el análisis ni lee
+    la copia.
+    :return: Tupla (reporte de `profile_chunks`, indicador de si salió de la caché).
+    """
+    sync_table(table)
+    version = snapshot_version(table)
+    with _reports_lock:
+        cached = _reports.get(table)
+    if use_cache and cached is not None and cached[0] == version:
+        return cached[1], True
+    reporte = profile_dataframe(load_snapshot(table, sync=False), schema)
+    # Tablas de dimensión de las que depende el conteo de huérfanos de este reporte
+    referencias = {tabla for col, (tabla, _) in FOREIGN_KEYS.items() if col in schema}
+    with _reports_lock:
+        _reports[table] = (version, reporte, referencias)
+    return reporte, False
+
+def invalidate_reports(table=None):
+    """
+    Descarta los reportes guardados de `table`. Una escritura en una tabla de dimensión cambia
+    los huérfanos, así que también descarta los reportes de las tablas que la referencian.
+    :param table: Tabla escrita; con None se descartan todos los reportes.
+    """
+    with _reports_lock:
+        if table is None:
+            _reports.clear()
+            return
+        for clave in [t for t, (_, _, referencias) in _reports.items() if t == table or table in referencias]:
+            del _reports[clave]
+
+
+add_invalidation_listener(invalidate_reports)
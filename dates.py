@@ -0,0 +1,122 @@
+import re
+import numpy as np
+import pandas as pd
+
+
+# Formatos que se prueban al detectar el formato de una columna, en orden de preferencia
+# (día antes que mes: es el formato de las plantillas de carga)
+CANDIDATE_FORMATS = [
+    "ISO8601",
+    "%d/%m/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M",
+    "%d/%m/%Y",
+    "%d-%m-%Y %H:%M:%S",
+    "%d-%m-%Y",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y/%m/%d",
+]
+# Valores que se usan para detectar el formato
+SAMPLE_SIZE = 200
+# Formatos distintos que se aceptan dentro de una misma columna
+MAX_FORMATS = 5
+
+_DIGITS = re.compile(r"\d")
+
+
+def _shape(valor):
+    # "01/02/2024 10:00:00" -> "99/99/9999 99:99:99": valores con la misma forma comparten formato
+    return _DIGITS.sub("9", valor)
+
+def _parse(texto, fmt):
+    fechas = pd.to_datetime(texto, format=fmt, errors="coerce", utc=True)
+    return fechas.dt.tz_convert(None) if isinstance(fechas, pd.Series) else fechas.tz_convert(None)
+
+def detect_format(values, formats=None):
+    """
+    Detecta el formato de las fechas en texto que tienen la misma forma (posición de los dígitos)
+    que el primer valor, probando `CANDIDATE_FORMATS` sobre una muestra. Si varios formatos
+    reconocen la muestra por igual (por ejemplo "05/03/2024" con día o mes primero) se elige el
+    primero de `CANDIDATE_FORMATS`.
+    :param values: Array o serie de textos (sin nulos).
+    :param formats: Diccionario forma -> formato que el llamador conserva entre los bloques de una
+                    misma columna. Solo se guardan formatos sin empate, y uno guardado se usa
+                    únicamente si reconoce toda la muestra actual.
+    :return: Formato detectado o None si ninguno reconoce la muestra.
+    """
+    if not len(values):
+        return None
+    forma = _shape(values[0])
+    muestra = pd.Series(pd.unique(np.asarray(values[:SAMPLE_SIZE * 10], dtype=object)))
+    muestra = muestra[muestra.str.replace(_DIGITS, "9", regex=True) == forma][:SAMPLE_SIZE]
+    guardado = formats.get(forma) if formats is not None else None
+    if guardado is not None and _parse(muestra, guardado).notna().all():
+        return guardado
+
+    mejor, aciertos, empates = None, 0, 0
+    for fmt in CANDIDATE_FORMATS:
+        validos = int(_parse(muestra, fmt).notna().sum())
+        if validos > aciertos:
+            mejor, aciertos, empates = fmt, validos, 0
+        elif validos and validos == aciertos:
+            empates += 1
+    if mejor is not None and not empates and formats is not None:
+        formats[forma] = mejor
+    return mejor
+
+def parse_dates(serie, date_format=None, formats=None):
+    """
+    Convierte una columna a datetime64 sin zona horaria. Sin `date_format`, el formato se
+    detecta en cada llamada con `detect_format`; si una parte de la columna usa otro formato se
+    detecta de nuevo sobre esas filas, hasta `MAX_FORMATS` formatos.
+    Los valores que no se reconocen quedan como NaT.
+    :param serie: Serie con textos, fechas de Excel o ya de tipo fecha.
+    :param date_format: Formato explícito (de `strftime` o "ISO8601").
+    :param formats: Formatos detectados en los bloques anteriores de la misma columna, ver
+                    `detect_format` (None = sin reutilizar).
+    :return: Serie datetime64[ns] con el mismo índice.
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.dt.tz_convert(None) if serie.dt.tz is not None else serie
+    texto = serie.where(serie.isna(), serie.astype(str)).str.strip()
+    if date_format:
+        return _parse(texto, date_format)
+
+    # Cada valor distinto se convierte una sola vez (las fechas suelen repetirse)
+    codigos, unicos = pd.factorize(texto.to_numpy(dtype=object))
+    if len(unicos) < len(texto):
+        fechas = parse_dates(pd.Series(unicos, dtype=object), formats=formats).to_numpy(dtype="datetime64[ns]")
+        # Posición extra para los nulos (código -1), también cuando la columna está vacía
+        fechas = np.append(fechas, np.datetime64("NaT"))
+        return pd.Series(fechas[codigos], index=serie.index, name=serie.name)
+
+    valores = texto.to_numpy(dtype=object)
+    resultado = np.full(len(texto), np.datetime64("NaT"), dtype="datetime64[ns]")
+    pendientes = np.flatnonzero(texto.notna().to_numpy() & (texto != "").to_numpy())
+    for _ in range(MAX_FORMATS):
+        if not len(pendientes):
+            break
+        fmt = detect_format(valores[pendientes], formats)
+        if fmt is None:
+            break
+        fechas = _parse(valores[pendientes], fmt).to_numpy(dtype="datetime64[ns]")
+        validas = ~np.isnat(fechas)
+        if not validas.any():
+            break
+        resultado[pendientes[validas]] = fechas[validas]
+        pendientes = pendientes[~validas]
+    return pd.Series(resultado, index=serie.index, name=serie.name)
+
+def normalize_dates(df, columns=None, date_format=None):
+    """
+    Convierte las columnas de fecha de un DataFrame a datetime64 con `parse_dates`.
+    :param columns: Columnas a convertir (None = las que empiezan por `fecha`).
+    :return: Nuevo DataFrame (las demás columnas no se copian).
+    """
+    columns = [c for c in df.columns if str(c).startswith("fecha")] if columns is None else columns
+    out = df.copy(deep=False)
+    for col in columns:
+        if col in out.columns:
+            out[col] = parse_dates(out[col], date_format)
+    return out
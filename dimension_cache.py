@@ -0,0 +1,141 @@
+import threading
+import time
+import numpy as np
+import pandas as pd
+from async_api import fetch_many
+from supabase_api import add_invalidation_listener, fetch_dataframe_from_supabase
+
+
+# Tablas de dimensiones: columna del archivo -> (tabla, columna clave, columna destino en `ordencompra`)
+DIMENSIONS = {
+    "codigo_producto": ("producto", "codigo_producto", "producto_id"),
+    "ruc_proveedor": ("proveedor", "ruc_proveedor", "proveedor_id"),
+    "centro_de_coste": ("centrodecoste", "centro_de_coste", "centrodecoste_id"),
+}
+
+
+class DimensionCache:
+    """
+    Caché de las tablas de dimensiones (`producto`, `proveedor`, `centrodecoste`) usadas para
+    resolver claves foráneas. Cada tabla se descarga completa (son pequeñas) y se vuelve a
+    descargar pasado `ttl`, de modo que también se recogen las claves de negocio cambiadas en
+    registros existentes; una escritura de la aplicación en la tabla obliga a recargarla antes.
+    Las descargas se hacen fuera del bloqueo: mientras una sesión recarga una tabla, las demás
+    siguen usando la versión anterior.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._tables = {}
+        # Aumenta con cada invalidación: una descarga empezada antes no se guarda
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def invalidate(self, table=None):
+        """
+        Descarta una tabla (o todas) para que se recargue completa en el próximo uso.
+        """
+        with self._lock:
+            self._generation += 1
+            if table is None:
+                self._tables.clear()
+            else:
+                self._tables.pop(table, None)
+
+    def preload(self, tables):
+        """
+        Descarga a la vez las tablas que aún no están en caché.
+        :param tables: Lista de tuplas (tabla, columna clave).
+        """
+        with self._lock:
+            faltantes = {tabla: clave for tabla, clave in tables if tabla not in self._tables}
+            generacion = self._generation
+        if not faltantes:
+            return
+        resultados = fetch_many({
+            tabla: {"table": tabla, "select": ["id", clave], "key_column": "id", "use_cache": False}
+            for tabla, clave in faltantes.items()
+        })
+        with self._lock:
+            if self._generation != generacion:
+                return
+            for tabla, df in resultados.items():
+                self._tables.setdefault(tabla, self._build(df, faltantes[tabla]))
+
+    def lookup(self, table, key_column):
+        """
+        Devuelve el índice clave -> id de una tabla de dimensión, actualizado si corresponde.
+        :return: Tupla (pd.Index con las claves, array con los ids en el mismo orden).
+        """
+        with self._lock:
+            entrada = self._tables.get(table)
+            if entrada is not None:
+                if time.monotonic() - entrada["checked"] <= self.ttl:
+                    return entrada["keys"], entrada["ids"]
+                # Esta sesión recarga la tabla; las que lleguen mientras tanto usan la versión actual
+                entrada["checked"] = time.monotonic()
+            generacion = self._generation
+
+        df = fetch_dataframe_from_supabase(table, select=["id", key_column], key_column="id", use_cache=False)
+        nueva = self._build(df, key_column)
+        with self._lock:
+            # Si la tabla se invalidó durante la descarga no se guarda: puede ser anterior a la escritura
+            if self._generation == generacion:
+                self._tables[table] = nueva
+        return nueva["keys"], nueva["ids"]
+
+    @staticmethod
+    def _build(df, key_column):
+        # Si una clave aparece repetida se usa el registro más reciente
+        df = df.drop_duplicates(subset=key_column, keep="last").reset_index(drop=True)
+        return {
+            "keys": pd.Index(df[key_column]),
+            "ids": df["id"].to_numpy(),
+            "checked": time.monotonic(),
+        }
+
+
+def _align(valores, claves):
+    # Un RUC o código leído como número debe coincidir con el mismo valor guardado como texto
+    if claves.dtype == object and valores.dtype != object:
+        return valores.astype(str)
+    if claves.dtype != object and valores.dtype == object:
+        return pd.to_numeric(valores, errors="coerce")
+    return valores
+
+def resolve_foreign_keys(df, cache=None):
+    """
+    Resuelve de forma vectorizada las columnas `codigo_producto`, `ruc_proveedor` y
+    `centro_de_coste` a sus ids (`producto_id`, `proveedor_id`, `centrodecoste_id`).
+    :param df: DataFrame con las columnas de negocio.
+    :param cache: Caché de dimensiones (por defecto la compartida).
+    :return: Tupla (DataFrame con las columnas de id añadidas, DataFrame de claves no encontradas
+             con las columnas `fila`, `columna` y `valor`).
+    """
+    cache = cache or dimension_cache
+    cache.preload([(tabla, clave) for columna, (tabla, clave, _) in DIMENSIONS.items() if columna in df.columns])
+    df = df.copy(deep=False)
+    no_mapeados = []
+    for columna, (tabla, clave, destino) in DIMENSIONS.items():
+        if columna not in df.columns:
+            continue
+        claves, ids = cache.lookup(tabla, clave)
+        posiciones = claves.get_indexer(_align(df[columna], claves))
+        encontrados = posiciones >= 0
+        valores = ids[posiciones].astype(np.int64) if len(ids) else np.zeros(len(df), dtype=np.int64)
+        df[destino] = pd.arrays.IntegerArray(np.where(encontrados, valores, 0), ~encontrados)
+        filas = np.flatnonzero(~encontrados)
+        if len(filas):
+            no_mapeados.append(pd.DataFrame({
+                "fila": filas,
+                "columna": columna,
+                "valor": df[columna].to_numpy()[filas],
+            }))
+    if no_mapeados:
+        return df, pd.concat(no_mapeados, ignore_index=True)
+    return df, pd.DataFrame(columns=["fila", "columna", "valor"])
+
+
+# Caché compartida; se invalida cuando la aplicación escribe en una tabla de dimensión
+dimension_cache = DimensionCache()
+add_invalidation_listener(dimension_cache.invalidate)
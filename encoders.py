@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+
+# Código asignado a valores nulos o que no estaban en el vocabulario al ajustar
+UNKNOWN = -1
+
+
+def _vocabulary(serie):
+    valores = pd.unique(serie.dropna())
+    try:
+        valores = np.sort(valores)
+    except TypeError:
+        # Columnas con tipos mezclados: se conserva el orden de aparición
+        pass
+    return pd.Index(valores)
+
+def _codes_dtype(n):
+    return np.int16 if n < np.iinfo(np.int16).max else np.int32
+
+
+class CategoricalEncoder:
+    """
+    Codificador de columnas categóricas reutilizable entre entrenamiento y predicción.
+    Ajusta una vez el vocabulario de cada columna y transforma el DataFrame completo de forma
+    vectorizada con tipos categóricos, sin convertir las columnas a texto. Los valores que no
+    estaban en el vocabulario (y los nulos) se codifican como `UNKNOWN`.
+    """
+
+    def __init__(self):
+        self.vocabularies = {}
+
+    @staticmethod
+    def detect_columns(df):
+        """
+        Devuelve las columnas de texto o categóricas de un DataFrame.
+        """
+        return df.select_dtypes(include=["object", "string", "category"]).columns.tolist()
+
+    def fit(self, df, columns=None):
+        """
+        Ajusta el vocabulario de las columnas indicadas (o de todas las categóricas).
+        :param df: DataFrame de entrenamiento.
+        :param columns: Lista de columnas a codificar.
+        :return: El propio codificador.
+        """
+        columns = self.detect_columns(df) if columns is None else columns
+        self.vocabularies = {col: _vocabulary(df[col]) for col in columns if col in df.columns}
+        return self
+
+    def partial_fit(self, df, columns=None):
+        """
+        Amplía el vocabulario con los valores nuevos de un bloque de datos, para ajustar el
+        codificador por bloques. Los valores nuevos se añaden al final, de modo que los códigos
+        ya asignados no cambian.
+        :param df: Bloque de datos.
+        :param columns: Columnas a codificar (solo se usa en el primer bloque).
+        :return: El propio codificador.
+        """
+        if not self.vocabularies:
+            return self.fit(df, columns)
+        for col, vocabulario in self.vocabularies.items():
+            if col in df.columns:
+                nuevos = _vocabulary(df[col]).difference(vocabulario, sort=False)
+                if len(nuevos):
+                    self.vocabularies[col] = vocabulario.append(nuevos)
+        return self
+
+    def transform(self, df):
+        """
+        Sustituye cada columna ajustada por sus códigos enteros.
+        El resto de columnas se comparten con el DataFrame original (no se copian).
+        :param df: DataFrame a transformar.
+        :return: Nuevo DataFrame con las columnas codificadas.
+        """
+        out = df.copy(deep=False)
+        for col, vocabulario in self.vocabularies.items():
+            if col in out.columns:
+                codes = pd.Categorical(out[col], categories=vocabulario).codes
+                out[col] = codes.astype(_codes_dtype(len(vocabulario)), copy=False)
+        return out
+
+    def fit_transform(self, df, columns=None):
+        return self.fit(df, columns).transform(df)
+
+    def inverse_transform_column(self, col, codes):
+        """
+        Convierte códigos de una columna a sus valores originales (UNKNOWN -> nulo).
+        """
+        return pd.Categorical.from_codes(np.asarray(codes, dtype=np.int64), categories=self.vocabularies[col])
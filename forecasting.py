@@ -0,0 +1,370 @@
+import functools
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import Ridge
+from dates import parse_dates
+from model_registry import MODELS_DIR
+from training_jobs import scheduler
+
+
+# Directorio donde se guardan los pronósticos de cada serie
+FORECAST_DIR = os.getenv("FORECAST_DIR", os.path.join(MODELS_DIR, "forecasts"))
+# Procesos con los que se entrenan las series pendientes
+FORECAST_WORKERS = int(os.getenv("FORECAST_WORKERS", str(os.cpu_count() or 1)))
+# Frecuencias admitidas y periodos por año (para la estacionalidad)
+FREQUENCIES = {"M": 12, "W": 52}
+# Retardos y ventanas de las medias móviles usados como características
+LAGS = (1, 2, 3, 4)
+WINDOWS = (3, 6, 12)
+# Filas de entrenamiento mínimas para ajustar un modelo; con menos se usa la media móvil
+MIN_TRAIN_ROWS = 8
+# Con menos series pendientes se entrena en el mismo proceso (arrancar el pool cuesta ~1 s)
+MIN_PARALLEL_SERIES = 8
+
+
+def build_series(df, level, freq="M", date_column="fecha_pedido_compra", value_column="cantidad", end=None):
+    """
+    Agrupa las órdenes en una serie temporal por valor de `level` (categoría, tipo de producto...).
+    Cada serie va desde su primer periodo con órdenes hasta el último periodo del conjunto (o
+    `end`), y los periodos sin órdenes valen 0: una serie que dejó de recibir pedidos termina en
+    ceros y su pronóstico parte del mismo periodo que el de las demás.
+    :param df: DataFrame con las órdenes.
+    :param level: Columna que identifica la serie.
+    :param freq: "M" (mensual) o "W" (semanal).
+    :param end: Último periodo de todas las series (fecha); None = el último con órdenes.
+    :return: DataFrame largo con las columnas `serie`, `periodo` (ordinal del periodo de pandas)
+             y `cantidad`, ordenado por serie y periodo.
+    """
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Frecuencia no soportada: {freq}")
+    fechas = parse_dates(df[date_column])
+    validas = (fechas.notna() & df[level].notna() & df[value_column].notna()).to_numpy()
+    periodos = fechas[validas].dt.to_period(freq).array.asi8
+    agregado = (
+        pd.Series(df[value_column].to_numpy(dtype="float64")[validas])
+        .groupby([df[level].to_numpy()[validas].astype(str), periodos]).sum()
+    )
+    if agregado.empty:
+        return pd.DataFrame({"serie": pd.Series(dtype=str), "periodo": pd.Series(dtype="int64"), "cantidad": pd.Series(dtype="float64")})
+
+    # Rango completo de cada serie construido sin bucles: inicio de la serie + posición dentro de ella
+    series = agregado.index.get_level_values(0)
+    ordinales = agregado.index.get_level_values(1).to_numpy()
+    limites = pd.DataFrame({"serie": series, "periodo": ordinales}).groupby("serie", sort=True)["periodo"].min()
+    ultimo = ordinales.max() if end is None else max(ordinales.max(), pd.Period(end, freq=freq).ordinal)
+    largos = (ultimo - limites + 1).to_numpy()
+    comienzos = np.repeat(np.cumsum(largos) - largos, largos)
+    completo = pd.MultiIndex.from_arrays([
+        np.repeat(limites.index.to_numpy(), largos),
+        np.repeat(limites.to_numpy(), largos) + (np.arange(largos.sum()) - comienzos),
+    ])
+    cantidad = agregado.reindex(completo, fill_value=0.0)
+    return pd.DataFrame({
+        "serie": completo.get_level_values(0),
+        "periodo": completo.get_level_values(1).astype("int64"),
+        "cantidad": cantidad.to_numpy(),
+    })
+
+def series_fingerprint(periodos, valores):
+    """
+    Huella de una serie (periodos y cantidades): cambia cuando la serie recibe órdenes o cuando el
+    conjunto avanza a un periodo nuevo, y en ese caso hay que reentrenar para mover el pronóstico.
+    """
+    h = hashlib.sha1(np.ascontiguousarray(periodos, dtype="int64").tobytes())
+    h.update(np.ascontiguousarray(valores, dtype="float64").tobytes())
+    return h.hexdigest()
+
+def _season(periodos, freq):
+    fase = 2 * np.pi * (np.asarray(periodos) % FREQUENCIES[freq]) / FREQUENCIES[freq]
+    return np.sin(fase), np.cos(fase)
+
+def feature_names():
+    return [f"retardo_{k}" for k in LAGS] + [f"media_{w}" for w in WINDOWS] + ["estacion_sin", "estacion_cos"]
+
+def lag_features(panel, freq="M"):
+    """
+    Características de todas las series a la vez: retardos, medias móviles de los periodos
+    anteriores y la posición del periodo en el año. Se calculan con `groupby().shift()` y
+    `rolling()` sobre el panel completo, sin recorrer las series una a una.
+    :param panel: DataFrame de `build_series`.
+    :return: DataFrame con `serie`, `periodo`, las características y el objetivo `cantidad`;
+             se descartan las primeras filas de cada serie, que no tienen historia suficiente.
+    """
+    grupos = panel.groupby("serie", sort=False)["cantidad"]
+    anterior = grupos.shift(1)
+    datos = {"serie": panel["serie"], "periodo": panel["periodo"]}
+    for k in LAGS:
+        datos[f"retardo_{k}"] = grupos.shift(k)
+    for w in WINDOWS:
+        datos[f"media_{w}"] = anterior.groupby(panel["serie"], sort=False).rolling(w, min_periods=w).mean().reset_index(level=0, drop=True)
+    datos["estacion_sin"], datos["estacion_cos"] = _season(panel["periodo"], freq)
+    datos["cantidad"] = panel["cantidad"]
+    return pd.DataFrame(datos).dropna()
+
+def _next_features(historia, periodo, freq):
+    # Misma definición que `lag_features` para el periodo siguiente a `historia`
+    seno, coseno = _season(periodo, freq)
+    return np.array(
+        [historia[-k] for k in LAGS] + [historia[-w:].mean() for w in WINDOWS] + [seno, coseno]
+    )
+
+def _recursive_forecast(model, historia, ultimo, horizon, freq):
+    # Cada predicción se añade a la historia para calcular las características del periodo siguiente
+    historia = list(historia)
+    predicciones = []
+    for paso in range(1, horizon + 1):
+        fila = _next_features(np.asarray(historia), ultimo + paso, freq)
+        valor = max(0.0, float(model.predict(fila.reshape(1, -1))[0]))
+        predicciones.append(valor)
+        historia.append(valor)
+    return np.array(predicciones)
+
+def _moving_average(historia, horizon):
+    return np.full(horizon, float(np.mean(historia[-WINDOWS[-1]:])) if len(historia) else 0.0)
+
+def fit_series(serie, periodos, valores, X, y, freq, horizon):
+    """
+    Ajusta el modelo de una serie y pronostica `horizon` periodos posteriores al último.
+    Se reservan los últimos `horizon` periodos para medir el error fuera de muestra (MAE) frente
+    a la media móvil; si el modelo no la mejora, o la serie es demasiado corta, el pronóstico es
+    la media móvil. Después se reentrena con toda la serie.
+    :param periodos: Ordinales de los periodos de la serie.
+    :param valores: Cantidades de la serie.
+    :param X: Características de la serie (`lag_features`) como array.
+    :param y: Objetivo correspondiente a `X`.
+    :return: Diccionario con el pronóstico y sus metadatos.
+    """
+    inicio = time.perf_counter()
+    ultimo = int(periodos[-1])
+    metodo, model, mae, mae_media = "media_movil", None, None, None
+    n = len(valores)
+    if len(y) - horizon >= MIN_TRAIN_ROWS:
+        # Las filas de X corresponden a los últimos len(y) periodos de la serie
+        entrenamiento = len(y) - horizon
+        prueba = Ridge(alpha=1.0).fit(X[:entrenamiento], y[:entrenamiento])
+        reales = valores[n - horizon:]
+        mae = float(np.abs(_recursive_forecast(prueba, valores[:n - horizon], ultimo - horizon, horizon, freq) - reales).mean())
+        mae_media = float(np.abs(_moving_average(valores[:n - horizon], horizon) - reales).mean())
+        if mae <= mae_media:
+            metodo, model = "ridge", Ridge(alpha=1.0).fit(X, y)
+    if model is not None:
+        pronostico = _recursive_forecast(model, valores, ultimo, horizon, freq)
+    else:
+        pronostico = _moving_average(valores, horizon)
+    return {
+        "serie": serie,
+        "method": metodo,
+        "model": model,
+        "mae": mae if metodo == "ridge" else mae_media,
+        "observations": n,
+        "last_period": ultimo,
+        "periods": np.arange(ultimo + 1, ultimo + horizon + 1),
+        "forecast": pronostico,
+        "trained_at": time.time(),
+        "fit_seconds": time.perf_counter() - inicio,
+    }
+
+def _fit_batch(tareas, freq, horizon):
+    return [fit_series(*tarea, freq, horizon) for tarea in tareas]
+
+def split_batches(tareas, workers):
+    """
+    Reparte las tareas en lotes de varias series (cuatro por proceso) para repartir el coste de
+    enviar los datos a cada proceso sin dejar procesos ociosos al final.
+    :return: Lista de lotes no vacíos.
+    """
+    partes = max(1, workers) * 4
+    return [lote for lote in (tareas[i::partes] for i in range(partes)) if lote]
+
+
+class DemandForecaster:
+    """
+    Pronósticos de demanda por serie persistidos con joblib.
+    Cada serie se guarda por separado junto con la huella de sus datos: al pedir pronósticos solo
+    se reentrenan las series cuya huella cambió (recibieron órdenes o el conjunto llegó a un
+    periodo nuevo), repartidas entre varios procesos; las demás se leen del disco.
+    """
+
+    def __init__(self, directory=FORECAST_DIR, max_loaded=512):
+        self.directory = directory
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def config_key(level, freq, horizon):
+        descripcion = {"level": level, "freq": freq, "horizon": horizon, "lags": LAGS, "windows": WINDOWS, "model": "ridge"}
+        return hashlib.sha1(json.dumps(descripcion, sort_keys=True).encode()).hexdigest()[:12]
+
+    def _path(self, config, serie):
+        nombre = hashlib.sha1(serie.encode()).hexdigest()[:16]
+        return os.path.join(self.directory, f"{config}-{nombre}.joblib")
+
+    def cached(self, config, serie, fingerprint):
+        """
+        Devuelve el pronóstico guardado de una serie si sus datos no cambiaron, o None.
+        """
+        path = self._path(config, serie)
+        with self._lock:
+            entry = self._loaded.get(path)
+            if entry is not None:
+                self._loaded.move_to_end(path)
+        # Otro proceso (el del planificador) puede haber guardado una versión más reciente
+        if (entry is None or entry["fingerprint"] != fingerprint) and os.path.exists(path):
+            entry = joblib.load(path)
+            self._remember(path, entry)
+        if entry is not None and entry["fingerprint"] == fingerprint:
+            return entry
+        return None
+
+    def save(self, config, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(config, entry["serie"])
+        joblib.dump(entry, f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        self._remember(path, entry)
+
+    def _remember(self, path, entry):
+        with self._lock:
+            self._loaded[path] = entry
+            self._loaded.move_to_end(path)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+
+    def forecast(self, panel, level, freq="M", horizon=6, max_workers=FORECAST_WORKERS, report=None):
+        """
+        Pronostica todas las series del panel, reentrenando solo las que cambiaron.
+        :param panel: DataFrame de `build_series`.
+        :param level: Columna con la que se construyó el panel (forma parte de la clave de caché).
+        :param horizon: Periodos a pronosticar después del último de cada serie.
+        :param max_workers: Procesos para entrenar las series pendientes.
+        :param report: Función `report(progreso, mensaje)` opcional.
+        :return: Diccionario con `forecast` (serie, periodo, cantidad) y `summary` (una fila por
+                 serie con el método, el MAE fuera de muestra y si se reentrenó en esta llamada).
+        """
+        report = report or (lambda progreso, mensaje: None)
+        config = self.config_key(level, freq, horizon)
+        entradas, tareas, huellas = self._prepare(panel, config, freq)
+        if tareas:
+            report(0.0, f"Entrenando {len(tareas)} de {len(huellas)} series...")
+        for i, entry in enumerate(self._fit(tareas, freq, horizon, max_workers), start=1):
+            entry["fingerprint"] = huellas[entry["serie"]]
+            self.save(config, entry)
+            entradas[entry["serie"]] = (entry, True)
+            report(i / len(tareas), f"{i} de {len(tareas)} series entrenadas")
+
+        pronosticos = [
+            pd.DataFrame({"serie": serie, "periodo": entry["periods"], "cantidad": entry["forecast"]})
+            for serie, (entry, _) in entradas.items()
+        ]
+        resumen = pd.DataFrame([
+            {
+                "serie": serie, "metodo": entry["method"], "mae": entry["mae"],
+                "observaciones": entry["observations"], "ultimo_periodo": entry["last_period"], "reentrenada": nueva,
+            }
+            for serie, (entry, nueva) in entradas.items()
+        ])
+        return {
+            "forecast": pd.concat(pronosticos, ignore_index=True) if pronosticos else pd.DataFrame(columns=["serie", "periodo", "cantidad"]),
+            "summary": resumen,
+        }
+
+    def _prepare(self, panel, config, freq):
+        # Separa las series con pronóstico guardado de las que hay que entrenar (tareas de `fit_series`)
+        caracteristicas = lag_features(panel, freq)
+        columnas = feature_names()
+        entradas, tareas, huellas = {}, [], {}
+        filas = caracteristicas.groupby("serie", sort=False).indices
+        for serie, posiciones in panel.groupby("serie", sort=False).indices.items():
+            grupo = panel.iloc[posiciones]
+            periodos, valores = grupo["periodo"].to_numpy(), grupo["cantidad"].to_numpy()
+            huellas[serie] = series_fingerprint(periodos, valores)
+            entry = self.cached(config, serie, huellas[serie])
+            if entry is not None:
+                entradas[serie] = (entry, False)
+                continue
+            datos = caracteristicas.iloc[filas.get(serie, [])]
+            tareas.append((serie, periodos, valores, datos[columnas].to_numpy(), datos["cantidad"].to_numpy()))
+        return entradas, tareas, huellas
+
+    def pending(self, panel, level, freq, horizon):
+        """
+        Tareas de entrenamiento de las series del panel sin pronóstico guardado para sus datos
+        actuales, listas para `fit_series`.
+        :return: Lista de tuplas (serie, periodos, valores, X, y).
+        """
+        return self._prepare(panel, self.config_key(level, freq, horizon), freq)[1]
+
+    def _fit(self, tareas, freq, horizon, max_workers):
+        # Genera las entradas a medida que se entrenan (en el mismo proceso o en un pool)
+        if max_workers <= 1 or len(tareas) < MIN_PARALLEL_SERIES:
+            for tarea in tareas:
+                yield fit_series(*tarea, freq, horizon)
+            return
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+            futuros = [pool.submit(_fit_batch, lote, freq, horizon) for lote in split_batches(tareas, max_workers)]
+            for futuro in as_completed(futuros):
+                yield from futuro.result()
+
+
+def to_timestamps(periodos, freq):
+    """
+    Convierte ordinales de periodo en la fecha de inicio de cada periodo.
+    """
+    return pd.PeriodIndex.from_ordinals(np.asarray(periodos, dtype="int64"), freq=freq).start_time
+
+def _run_forecast_batch(key, lote, config, freq, horizon):
+    # Cada lote es una tarea del pool del planificador: los lotes de un pronóstico se reparten
+    # entre todos sus procesos y cada serie entrenada queda guardada en el disco
+    entrenadas = []
+    for tarea in lote:
+        entry = fit_series(*tarea, freq, horizon)
+        entry["fingerprint"] = series_fingerprint(tarea[1], tarea[2])
+        entry["worker"] = os.getpid()
+        forecaster.save(config, entry)
+        entrenadas.append(entry["serie"])
+    return entrenadas
+
+def _collect_forecast(panel, level, freq, horizon, resultados):
+    # Todas las series están ya en el disco: se leen y se marcan las que entrenaron los lotes
+    resultado = forecaster.forecast(panel, level, freq, horizon)
+    entrenadas = {serie for lote in resultados for serie in lote}
+    resultado["summary"]["reentrenada"] = resultado["summary"]["serie"].isin(entrenadas)
+    return resultado
+
+def submit_forecast(df, level, freq="M", horizon=6, description="Pronóstico de demanda"):
+    """
+    Envía el pronóstico de todas las series al planificador de trabajos en segundo plano.
+    Las series pendientes se reparten en lotes que el planificador ejecuta en paralelo en sus
+    procesos; si ninguna serie cambió el trabajo se devuelve completado sin enviar nada al pool.
+    :param df: DataFrame con las órdenes (`fecha_pedido_compra`, `cantidad` y `level`).
+    :return: Tupla (panel de `build_series`, objeto `Job` con el resultado de `DemandForecaster.forecast`).
+    """
+    panel = build_series(df, level, freq)
+    config = DemandForecaster.config_key(level, freq, horizon)
+    huella = hashlib.sha1(pd.util.hash_pandas_object(panel, index=False).values.tobytes()).hexdigest()[:16]
+    key = f"forecast-{config}-{huella}"
+    job = scheduler.get(key)
+    if job is not None:
+        return panel, job
+    tareas = forecaster.pending(panel, level, freq, horizon)
+    if not tareas:
+        return panel, scheduler.completed(key, forecaster.forecast(panel, level, freq, horizon), description)
+    return panel, scheduler.submit_batches(
+        key, _run_forecast_batch, split_batches(tareas, scheduler.max_workers), config, freq, horizon,
+        finish=functools.partial(_collect_forecast, panel, level, freq, horizon), description=description,
+    )
+
+
+# Pronosticador compartido por todas las sesiones
+forecaster = DemandForecaster()
@@ -0,0 +1,177 @@
+import random
+import threading
+import time
+from collections import deque
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+
+# Códigos de respuesta que indican un error transitorio y se reintentan
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Los que indican que el servidor no procesó la petición: los únicos que se reintentan en las
+# escrituras que no son idempotentes (un 500 o 504 puede llegar después de guardar los datos)
+RETRY_STATUS_NOT_PROCESSED = {429, 503}
+# Métodos que se pueden repetir sin efectos adicionales
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+def _not_sent(error):
+    # La conexión no llegó a establecerse, así que el servidor no recibió la petición
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    razon = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(razon, NewConnectionError)
+
+
+class PooledSession:
+    """
+    Sesión HTTP compartida para todas las llamadas a la API REST de Supabase.
+    Reutiliza las conexiones (keep-alive, un pool por host), pide las respuestas comprimidas,
+    aplica tiempos máximos de conexión y lectura, y reintenta con espera exponencial los
+    errores transitorios (429/5xx y fallos de conexión; en las escrituras no idempotentes solo los
+    que garantizan que no se guardó nada). Registra la latencia y los reintentos.
+    La sesión de `requests` se crea con la primera petición, no al importar el módulo.
+    """
+
+    def __init__(self, base_url, headers, timeout=(5, 60), max_retries=4, backoff=0.5, pool_size=16, latency_window=1000):
+        """
+        :param base_url: URL base (por ejemplo `SUPABASE_URL`).
+        :param headers: Cabeceras que se envían en todas las peticiones.
+        :param timeout: Tupla (segundos de conexión, segundos de lectura).
+        :param max_retries: Reintentos máximos por petición.
+        :param backoff: Espera base en segundos; el reintento n espera `backoff * 2**n` (con variación aleatoria).
+        :param pool_size: Conexiones que se mantienen abiertas por host.
+        :param latency_window: Número de latencias recientes con las que se calculan los percentiles.
+        """
+        self.base_url = (base_url or "").rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.headers = dict(headers)
+        self.pool_size = pool_size
+        self._session = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self._requests = 0
+        self._retries = 0
+        self._errors = 0
+        self._seconds = 0.0
+
+    @property
+    def session(self):
+        """
+        Sesión de `requests` compartida, creada en el primer uso.
+        """
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    session.headers.update(self.headers)
+                    session.headers["Accept-Encoding"] = "gzip, deflate"
+                    adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=0)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def configure(self, base_url=None, headers=None):
+        """
+        Cambia la URL base o las cabeceras; la sesión de `requests` se vuelve a crear en la
+        siguiente petición.
+        """
+        with self._lock:
+            if base_url is not None:
+                self.base_url = base_url.rstrip("/")
+            if headers is not None:
+                self.headers = dict(headers)
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def retry_delay(self, intento, response=None):
+        """
+        Segundos a esperar antes del reintento `intento` (0, 1, ...) y lo registra en las métricas.
+        :param response: Respuesta recibida; en 429 el servidor puede indicar cuánto esperar.
+        """
+        espera = self.backoff * 2 ** intento * (0.5 + random.random())
+        if response is not None and str(response.headers.get("Retry-After", "")).isdigit():
+            espera = max(espera, int(response.headers["Retry-After"]))
+        with self._lock:
+            self._retries += 1
+        return espera
+
+    def request(self, method, path, retry=True, idempotent=None, **kwargs):
+        """
+        Envía una petición y reintenta los errores transitorios.
+        Una petición no idempotente (un POST que inserta filas sin `on_conflict`) solo se reintenta
+        si no llegó al servidor (fallo al conectar) o si este la rechazó sin procesarla (429/503);
+        tras un tiempo de lectura agotado o un 500/502/504 los datos pueden estar ya guardados.
+        :param method: Método HTTP.
+        :param path: Ruta relativa a `base_url` (por ejemplo "/rest/v1/ordencompra") o URL completa.
+        :param retry: Si es False no se reintenta nunca.
+        :param idempotent: Si la petición se puede repetir sin efectos adicionales (por ejemplo un
+                           upsert con `on_conflict` o una función de solo lectura); None = según el método.
+        :param kwargs: Argumentos de `requests.Session.request` (`params`, `json`, `data`, `headers`...).
+        :return: Respuesta (`requests.Response`); los códigos de error no reintentables se devuelven tal cual.
+        """
+        url = path if path.startswith("http") else f"{self.base_url}{path}"
+        kwargs.setdefault("timeout", self.timeout)
+        intentos = self.max_retries if retry else 0
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        reintentables = RETRY_STATUS if idempotent else RETRY_STATUS_NOT_PROCESSED
+        for intento in range(intentos + 1):
+            inicio = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.record(time.perf_counter() - inicio, error=True)
+                if intento == intentos or not (idempotent or _not_sent(e)):
+                    raise
+                time.sleep(self.retry_delay(intento))
+                continue
+            self.record(time.perf_counter() - inicio, error=response.status_code >= 400)
+            if response.status_code not in reintentables or intento == intentos:
+                return response
+            time.sleep(self.retry_delay(intento, response))
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def record(self, segundos, error=False):
+        """
+        Registra una petición en las métricas (también las hechas por el cliente asíncrono).
+        """
+        with self._lock:
+            self._requests += 1
+            self._errors += int(error)
+            self._seconds += segundos
+            self._latencies.append(segundos)
+
+    def stats(self):
+        """
+        Métricas de uso: peticiones, reintentos, errores y latencia (media y percentiles de las
+        últimas peticiones, en milisegundos).
+        """
+        with self._lock:
+            latencias = np.array(self._latencies) * 1000
+            peticiones, reintentos, errores, segundos = self._requests, self._retries, self._errors, self._seconds
+        return {
+            "peticiones": peticiones,
+            "reintentos": reintentos,
+            "errores": errores,
+            "latencia_media_ms": segundos * 1000 / peticiones if peticiones else 0.0,
+            "latencia_p50_ms": float(np.percentile(latencias, 50)) if len(latencias) else 0.0,
+            "latencia_p95_ms": float(np.percentile(latencias, 95)) if len(latencias) else 0.0,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._latencies.clear()
+            self._requests = self._retries = self._errors = 0
+            self._seconds = 0.0
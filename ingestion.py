@@ -0,0 +1,291 @@
+import csv
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import csv as pa_csv
+from dates import parse_dates
+from dimension_cache import DIMENSIONS, resolve_foreign_keys
+from supabase_api import upsert_dataframe_into_supabase
+
+
+# Filas que se leen, validan e insertan juntas
+CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "50000"))
+# Máximo de errores por fila que se conservan para mostrarlos (el total se cuenta siempre)
+MAX_ERRORS = 10_000
+
+# Columnas de `ordencompra` y el tipo con el que se validan
+ORDENCOMPRA_SCHEMA = {
+    "codigo_de_compra": "texto",
+    "usuario_comprador": "texto",
+    "tipo_compra": "texto",
+    "cantidad": "decimal",
+    "impuestos": "decimal",
+    "estado": "entero",
+    "fecha_pedido_compra": "fecha",
+    "fecha_creacion_compra": "fecha",
+    "fecha_aprobacion_compra": "fecha",
+    "fecha_recepcion": "fecha",
+    "producto_id": "entero",
+    "proveedor_id": "entero",
+    "centrodecoste_id": "entero",
+}
+# Columna que identifica una orden: las cargas la usan como `on_conflict`, de modo que reenviar un
+# archivo o los lotes fallidos actualiza las órdenes ya guardadas en lugar de duplicarlas
+UNIQUE_COLUMN = "codigo_de_compra"
+# Separadores de CSV que se detectan en la cabecera (Excel en español exporta con ";")
+DELIMITERS = ",;\t|"
+# Número de fila en el archivo de la primera fila de datos (la cabecera es la fila 1)
+FIRST_DATA_ROW = 2
+# Columnas que no pueden quedar vacías
+NOT_NULL = {"codigo_de_compra", "producto_id", "proveedor_id", "centrodecoste_id"}
+# Columna de negocio que puede reemplazar a cada clave foránea
+_FK_ALTERNATIVES = {destino: columna for columna, (_, _, destino) in DIMENSIONS.items()}
+
+
+def missing_columns(columns, schema=ORDENCOMPRA_SCHEMA):
+    """
+    Columnas requeridas que faltan en el archivo. Una clave foránea (`producto_id`, ...) puede
+    venir como su columna de negocio (`codigo_producto`, ...) y se resuelve al validar.
+    :param columns: Columnas del archivo.
+    :return: Lista de columnas faltantes.
+    """
+    columns = set(columns)
+    return [
+        col for col in schema
+        if col not in columns and _FK_ALTERNATIVES.get(col) not in columns
+    ]
+
+def detect_delimiter(linea):
+    """
+    Separador de un CSV deducido de su cabecera con `csv.Sniffer` (uno de `DELIMITERS`);
+    si no se puede deducir se usa ",".
+    """
+    try:
+        return csv.Sniffer().sniff(linea, delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        return ","
+
+def _iter_csv(file, chunk_size, delimiter):
+    # La cabecera se lee primero para declarar todas las columnas como texto: la conversión
+    # se hace al validar, así un valor inválido no detiene la lectura del archivo
+    linea = file.readline().decode("utf-8-sig")
+    delimiter = delimiter or detect_delimiter(linea)
+    cabecera = next(csv.reader([linea], delimiter=delimiter))
+    file.seek(0)
+    reader = pa_csv.open_csv(
+        file,
+        read_options=pa_csv.ReadOptions(block_size=8 << 20, encoding="utf-8"),
+        parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={col: pa.string() for col in cabecera},
+            # Solo las celdas vacías son nulas: "n/a", "NA" o "null" llegan como texto y se
+            # validan como cualquier otro valor (pyarrow los trataría como nulos por defecto)
+            null_values=[""],
+            strings_can_be_null=True,
+        ),
+    )
+    pendientes, filas = [], 0
+    for batch in reader:
+        pendientes.append(batch)
+        filas += batch.num_rows
+        while filas >= chunk_size:
+            tabla = pa.Table.from_batches(pendientes)
+            yield tabla.slice(0, chunk_size).to_pandas()
+            resto = tabla.slice(chunk_size)
+            pendientes, filas = resto.to_batches(), resto.num_rows
+    if filas:
+        yield pa.Table.from_batches(pendientes).to_pandas()
+
+def _iter_excel(file, chunk_size):
+    from openpyxl import load_workbook
+
+    libro = load_workbook(file, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        cabecera = [str(c) if c is not None else "" for c in next(filas, ())]
+        # El índice es el número de fila de la hoja, que no coincide con la posición si hay filas vacías
+        bloque, numeros = [], []
+        for numero, fila in enumerate(filas, start=FIRST_DATA_ROW):
+            if all(valor is None for valor in fila):
+                continue
+            bloque.append(fila[:len(cabecera)])
+            numeros.append(numero)
+            if len(bloque) >= chunk_size:
+                yield pd.DataFrame(bloque, columns=cabecera, index=numeros, dtype=object)
+                bloque, numeros = [], []
+        if bloque:
+            yield pd.DataFrame(bloque, columns=cabecera, index=numeros, dtype=object)
+    finally:
+        libro.close()
+
+def iter_file_chunks(file, filename, chunk_size=CHUNK_ROWS, delimiter=None):
+    """
+    Lee un archivo CSV (lector de pyarrow) o Excel (openpyxl en modo solo lectura) por bloques,
+    sin cargarlo completo en memoria. Los valores se devuelven sin convertir.
+    :param file: Archivo binario (por ejemplo el de `st.file_uploader`).
+    :param filename: Nombre del archivo, para elegir el lector por su extensión.
+    :param chunk_size: Filas por bloque.
+    :param delimiter: Separador del CSV (None = se detecta en la cabecera, ver `detect_delimiter`).
+    :return: Generador de DataFrames con el índice igual al número de fila en el archivo (la
+             cabecera es la fila 1), el que el usuario ve en su editor.
+    """
+    file.seek(0)
+    if filename.lower().endswith(".csv"):
+        inicio = FIRST_DATA_ROW
+        for bloque in _iter_csv(file, chunk_size, delimiter):
+            bloque.index = pd.RangeIndex(inicio, inicio + len(bloque))
+            inicio += len(bloque)
+            yield bloque
+    elif filename.lower().endswith((".xlsx", ".xlsm")):
+        yield from _iter_excel(file, chunk_size)
+    else:
+        raise ValueError(f"Formato de archivo no soportado: {filename}")
+
+def preview_file(file, filename, rows=5, delimiter=None):
+    """
+    Primeras filas de un archivo, leyendo solo el primer bloque.
+    """
+    vista = next(iter_file_chunks(file, filename, chunk_size=rows, delimiter=delimiter), pd.DataFrame())
+    file.seek(0)
+    return vista.head(rows)
+
+def convert_column(serie, tipo, date_format=None, formats=None):
+    """
+    Convierte una columna al tipo del esquema; los valores que no cumplen el tipo quedan nulos.
+    :param tipo: "texto", "decimal", "entero" o "fecha".
+    :param formats: Formatos de fecha detectados en los bloques anteriores de la columna (ver `parse_dates`).
+    """
+    if tipo == "decimal":
+        return pd.to_numeric(serie, errors="coerce").astype("float64")
+    if tipo == "entero":
+        numeros = pd.to_numeric(serie, errors="coerce")
+        # Un decimal con parte fraccionaria no es un entero válido
+        numeros = numeros.where(numeros.isna() | (numeros % 1 == 0))
+        return numeros.astype("Int64")
+    if tipo == "fecha":
+        return parse_dates(serie, date_format, formats)
+    return serie.where(serie.isna(), serie.astype(str)).astype("string")
+
+def validate_chunk(df, schema=ORDENCOMPRA_SCHEMA, date_format=None, formats=None):
+    """
+    Convierte y valida un bloque de forma vectorizada, sin detenerse en el primer error.
+    Las claves foráneas que faltan se resuelven desde sus columnas de negocio.
+    :param df: Bloque leído con `iter_file_chunks` (valores sin convertir).
+    :param schema: Diccionario columna -> tipo ("texto", "decimal", "entero" o "fecha").
+    :param date_format: Formato explícito de las fechas (None = se detecta con `parse_dates`).
+    :param formats: Diccionario columna -> formatos de fecha detectados, que se conserva entre los
+                    bloques de un archivo para que todos se lean igual (None = sin reutilizar).
+    :return: Tupla (DataFrame con las filas válidas y las columnas del esquema ya convertidas,
+             DataFrame de errores con las columnas `fila`, `columna`, `valor` y `error`).
+    """
+    errores = []
+    out = pd.DataFrame(index=df.index)
+    faltantes = [col for col in schema if col not in df.columns and _FK_ALTERNATIVES.get(col) in df.columns]
+    if faltantes:
+        resueltas, no_mapeados = resolve_foreign_keys(df[[_FK_ALTERNATIVES[col] for col in faltantes]])
+        for col in faltantes:
+            out[col] = resueltas[col]
+        if not no_mapeados.empty:
+            no_mapeados["fila"] = df.index[no_mapeados["fila"].to_numpy()]
+            no_mapeados["error"] = "No existe en la tabla relacionada"
+            errores.append(no_mapeados)
+
+    invalidas = np.zeros(len(df), dtype=bool)
+    for col, tipo in schema.items():
+        if col not in df.columns:
+            continue
+        crudo = df[col]
+        convertido = convert_column(crudo, tipo, date_format, None if formats is None else formats.setdefault(col, {}))
+        vacio = crudo.isna().to_numpy()
+        if crudo.dtype == object:
+            vacio |= (crudo.astype(str).str.strip() == "").to_numpy()
+        nulo = convertido.isna().to_numpy()
+        malos = (nulo & ~vacio) | (vacio & (col in NOT_NULL))
+        if malos.any():
+            filas = np.flatnonzero(malos)
+            errores.append(pd.DataFrame({
+                "fila": df.index[filas],
+                "columna": col,
+                "valor": crudo.to_numpy()[filas],
+                "error": np.where(vacio[filas], "Valor requerido", f"No es un valor de tipo {tipo}"),
+            }))
+            invalidas |= malos
+        out[col] = convertido
+
+    out = out[[col for col in schema if col in out.columns]]
+    if errores:
+        errores = pd.concat(errores, ignore_index=True)
+        invalidas |= df.index.isin(errores["fila"])
+    else:
+        errores = pd.DataFrame(columns=["fila", "columna", "valor", "error"])
+    return out[~invalidas], errores
+
+def row_ranges(filas):
+    """
+    Resume números de fila en rangos legibles, por ejemplo [3, 4, 5, 9] -> "3-5, 9".
+    """
+    filas = np.asarray(filas)
+    if not len(filas):
+        return ""
+    cortes = np.flatnonzero(np.diff(filas) != 1) + 1
+    return ", ".join(
+        str(tramo[0]) if len(tramo) == 1 else f"{tramo[0]}-{tramo[-1]}"
+        for tramo in np.split(filas, cortes)
+    )
+
+def ingest_file(file, filename, table="ordencompra", schema=ORDENCOMPRA_SCHEMA, chunk_size=CHUNK_ROWS,
+                date_format=None, insert=True, report=None, delimiter=None, on_conflict=UNIQUE_COLUMN):
+    """
+    Lee, valida e inserta un archivo bloque a bloque: cada bloque válido se envía con
+    `upsert_dataframe_into_supabase` antes de leer el siguiente, por lo que la memoria depende
+    de `chunk_size` y no del tamaño del archivo. Las filas inválidas se omiten y se informan.
+    :param file: Archivo binario CSV o Excel.
+    :param filename: Nombre del archivo.
+    :param insert: Si es False solo se valida.
+    :param report: Función `report(filas_procesadas, mensaje)`.
+    :param delimiter: Separador del CSV (None = se detecta en la cabecera).
+    :param on_conflict: Columna que identifica un registro existente: volver a cargar el archivo
+                        o reenviar los lotes fallidos actualiza esas filas en lugar de duplicarlas.
+                        Dentro de un bloque se envía solo la última fila de cada valor.
+    :return: Diccionario con el total de filas, las válidas, las insertadas, los errores por fila
+             (como máximo `MAX_ERRORS`, en `errores`; el total en `filas_invalidas`) y los lotes
+             rechazados por Supabase (`lotes_fallidos`, con las filas del archivo de cada lote en
+             `filas` y su número en `n_filas`; las filas inválidas intercaladas no se incluyen).
+             Los números de fila son los del archivo (la cabecera es la fila 1).
+    """
+    report = report or (lambda filas, mensaje: None)
+    resumen = {"filas": 0, "validas": 0, "insertadas": 0, "filas_invalidas": 0, "lotes_fallidos": []}
+    errores = []
+    guardados = 0
+    formatos = {}
+    for bloque in iter_file_chunks(file, filename, chunk_size, delimiter):
+        faltantes = missing_columns(bloque.columns, schema)
+        if faltantes:
+            raise ValueError(f"El archivo no contiene las columnas necesarias: {', '.join(faltantes)}")
+        validas, errores_bloque = validate_chunk(bloque, schema, date_format, formatos)
+        resumen["filas"] += len(bloque)
+        resumen["validas"] += len(validas)
+        resumen["filas_invalidas"] += len(bloque) - len(validas)
+        if guardados < MAX_ERRORS and not errores_bloque.empty:
+            errores.append(errores_bloque.head(MAX_ERRORS - guardados))
+            guardados += len(errores[-1])
+
+        if insert and len(validas):
+            # Un mismo código dos veces en una petición con merge-duplicates es un error de Postgres
+            enviadas = validas.drop_duplicates(on_conflict.split(","), keep="last") if on_conflict else validas
+            resultado = upsert_dataframe_into_supabase(table, enviadas, on_conflict=on_conflict)
+            fallidas = 0
+            for lote in resultado["errores"]:
+                filas = enviadas.index[lote["inicio"]:lote["fin"]]
+                resumen["lotes_fallidos"].append({"filas": row_ranges(filas), "n_filas": len(filas), "error": lote["error"]})
+                fallidas += len(filas)
+            resumen["insertadas"] += len(validas) - fallidas
+        del bloque, validas
+        report(resumen["filas"], f"{resumen['filas']} filas procesadas, {resumen['filas_invalidas']} con errores")
+
+    resumen["errores"] = (
+        pd.concat(errores, ignore_index=True) if errores
+        else pd.DataFrame(columns=["fila", "columna", "valor", "error"])
+    )
+    return resumen
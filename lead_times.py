@@ -0,0 +1,207 @@
+import hashlib
+import os
+import threading
+import time
+import joblib
+import numpy as np
+import pandas as pd
+from dates import parse_dates
+
+
+# Directorio donde se guarda el índice de tiempos de entrega
+LEAD_TIME_DIR = os.getenv("LEAD_TIME_DIR", os.path.join("data", "lead_times"))
+# Columnas que identifican al proveedor y al producto
+SUPPLIER_COLUMN = "nombre_proveedor"
+PRODUCT_COLUMN = "producto_tipo"
+# Órdenes más recientes con las que se calcula la media móvil de cada grupo
+ROLLING_ORDERS = 50
+# Órdenes mínimas de un grupo para usar sus estadísticas; con menos se pasa al nivel siguiente
+MIN_ORDERS = 5
+# Niveles del índice, del más específico al más general
+LEVELS = ("proveedor_producto", "proveedor", "producto", "general")
+
+
+def delivery_days(df):
+    """
+    Días entre la aprobación y la recepción de cada orden, en una sola operación sobre las columnas.
+    Si no están las fechas se usa la columna `tiempo_entrega` ya calculada por la vista.
+    Los valores negativos (fechas inconsistentes) quedan como NaN.
+    :return: Serie de float alineada con `df`.
+    """
+    if "fecha_aprobacion_compra" in df.columns and "fecha_recepcion" in df.columns:
+        dias = (parse_dates(df["fecha_recepcion"]) - parse_dates(df["fecha_aprobacion_compra"])).dt.total_seconds() / 86400
+    else:
+        dias = pd.to_numeric(df["tiempo_entrega"], errors="coerce")
+    return dias.where(dias >= 0)
+
+def _order_dates(df):
+    for col in ("fecha_aprobacion_compra", "fecha_pedido_compra"):
+        if col in df.columns:
+            return parse_dates(df[col])
+    return pd.Series(pd.NaT, index=df.index)
+
+def _aggregate(datos, keys):
+    # Estadísticas de cada grupo: órdenes, media de las ROLLING_ORDERS más recientes, mediana y p90
+    grupos = datos.groupby(keys, sort=False, observed=True)["dias"] if keys else datos.groupby(np.zeros(len(datos)))["dias"]
+    recientes = datos[grupos.cumcount(ascending=False) < ROLLING_ORDERS]
+    grupos_recientes = recientes.groupby(keys, sort=False, observed=True)["dias"] if keys else recientes.groupby(np.zeros(len(recientes)))["dias"]
+    return pd.DataFrame({
+        "ordenes": grupos.size(),
+        "media_movil": grupos_recientes.mean(),
+        "mediana": grupos.median(),
+        "p90": grupos.quantile(0.9),
+    })
+
+
+class LeadTimeIndex:
+    """
+    Índice precalculado de tiempos de entrega por proveedor y producto.
+    Se construye en una pasada agrupada sobre todas las órdenes y se guarda junto con la huella
+    de los datos; mientras los datos no cambian las predicciones solo consultan el índice.
+    Cada orden nueva toma las estadísticas del grupo más específico con al menos `MIN_ORDERS`
+    órdenes: proveedor y producto, proveedor, producto o todas las órdenes.
+    """
+
+    def __init__(self, directory=LEAD_TIME_DIR, supplier_column=SUPPLIER_COLUMN, product_column=PRODUCT_COLUMN):
+        self.directory = directory
+        self.supplier_column = supplier_column
+        self.product_column = product_column
+        self.tables = None
+        self.fingerprint = None
+        self.built_at = None
+        self.evaluation = None
+        self._lock = threading.Lock()
+
+    def _keys(self, level):
+        return {
+            "proveedor_producto": [self.supplier_column, self.product_column],
+            "proveedor": [self.supplier_column],
+            "producto": [self.product_column],
+            "general": [],
+        }[level]
+
+    def _fingerprint(self, df):
+        columnas = [c for c in (self.supplier_column, self.product_column, "fecha_aprobacion_compra",
+                                "fecha_recepcion", "fecha_pedido_compra", "tiempo_entrega") if c in df.columns]
+        h = hashlib.sha1(repr(columnas).encode())
+        h.update(pd.util.hash_pandas_object(df[columnas], index=False).values.tobytes())
+        return h.hexdigest()
+
+    def _path(self):
+        return os.path.join(self.directory, f"indice-{self.supplier_column}-{self.product_column}.joblib")
+
+    def build(self, df):
+        """
+        Calcula el índice a partir de las órdenes (con tiempo de entrega conocido).
+        :return: El propio índice.
+        """
+        datos = pd.DataFrame({
+            self.supplier_column: df[self.supplier_column].astype("category"),
+            self.product_column: df[self.product_column].astype("category"),
+            "fecha": _order_dates(df),
+            "dias": delivery_days(df),
+        })
+        datos = datos[datos["dias"].notna()].sort_values("fecha", kind="stable")
+        self.tables = {level: _aggregate(datos, self._keys(level)) for level in LEVELS}
+        self.built_at = time.time()
+        return self
+
+    def refresh(self, df):
+        """
+        Devuelve el índice para estos datos: de memoria o del disco si los datos no cambiaron,
+        o reconstruido y guardado si cambiaron. Al reconstruirlo también se recalcula su error
+        fuera de muestra (`evaluate`), que se guarda en `evaluation`.
+        :return: Tupla (índice, reconstruido).
+        """
+        huella = self._fingerprint(df)
+        with self._lock:
+            if self.fingerprint == huella:
+                return self, False
+            path = self._path()
+            if os.path.exists(path):
+                guardado = joblib.load(path)
+                if guardado["fingerprint"] == huella:
+                    self.tables, self.evaluation, self.built_at = guardado["tables"], guardado["evaluation"], guardado["built_at"]
+                    self.fingerprint = huella
+                    return self, False
+            self.build(df)
+            try:
+                self.evaluation = self.evaluate(df)
+            except ValueError:
+                self.evaluation = None
+            self.fingerprint = huella
+            os.makedirs(self.directory, exist_ok=True)
+            joblib.dump({
+                "fingerprint": huella, "tables": self.tables, "evaluation": self.evaluation, "built_at": self.built_at,
+            }, f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+            return self, True
+
+    def predict(self, df):
+        """
+        Predice el tiempo de entrega de un lote de órdenes consultando el índice (sin entrenar).
+        :param df: DataFrame con las columnas de proveedor y producto.
+        :return: DataFrame alineado con `df` con `prediccion` (media móvil de días), `p90`,
+                 `ordenes` del grupo usado y `nivel`.
+        """
+        if self.tables is None:
+            raise ValueError("El índice de tiempos de entrega no se ha construido.")
+        n = len(df)
+        resultado = {col: np.full(n, np.nan) for col in ("prediccion", "p90", "ordenes")}
+        nivel = np.full(n, None, dtype=object)
+        pendientes = np.ones(n, dtype=bool)
+        for level in LEVELS:
+            tabla = self.tables[level]
+            if not len(tabla):
+                continue
+            keys = self._keys(level)
+            if keys:
+                claves = pd.MultiIndex.from_frame(df[keys].astype(object)) if len(keys) > 1 else pd.Index(df[keys[0]].astype(object))
+                posiciones = tabla.index.get_indexer(claves)
+            else:
+                posiciones = np.zeros(n, dtype=np.intp)
+            ordenes = np.where(posiciones >= 0, tabla["ordenes"].to_numpy()[posiciones], 0)
+            usar = pendientes & (ordenes >= (MIN_ORDERS if level != "general" else 1))
+            resultado["prediccion"][usar] = tabla["media_movil"].to_numpy()[posiciones[usar]]
+            resultado["p90"][usar] = tabla["p90"].to_numpy()[posiciones[usar]]
+            resultado["ordenes"][usar] = ordenes[usar]
+            nivel[usar] = level
+            pendientes &= ~usar
+        return pd.DataFrame({**resultado, "nivel": nivel}, index=df.index)
+
+    def evaluate(self, df, holdout=0.2):
+        """
+        Error fuera de muestra: construye un índice con las órdenes más antiguas y predice el
+        `holdout` más reciente, comparando con la mediana general como referencia.
+        :return: Diccionario con `mae`, `mae_referencia`, `ordenes_prueba` y el DataFrame `detalle`
+                 (real y predicción de cada orden de prueba).
+        """
+        dias = delivery_days(df)
+        fechas = _order_dates(df)
+        validas = dias.notna().to_numpy()
+        orden = np.argsort(fechas.to_numpy()[validas], kind="stable")
+        posiciones = np.flatnonzero(validas)[orden]
+        corte = int(len(posiciones) * (1 - holdout))
+        entrenamiento, prueba = df.iloc[posiciones[:corte]], df.iloc[posiciones[corte:]]
+        if not len(entrenamiento) or not len(prueba):
+            raise ValueError("No hay suficientes órdenes con tiempo de entrega para evaluar.")
+        indice = LeadTimeIndex(self.directory, self.supplier_column, self.product_column).build(entrenamiento)
+        reales = dias.iloc[posiciones[corte:]].to_numpy()
+        predicciones = indice.predict(prueba)["prediccion"].to_numpy()
+        referencia = float(np.nanmedian(dias.iloc[posiciones[:corte]]))
+        return {
+            "mae": float(np.nanmean(np.abs(predicciones - reales))),
+            "mae_referencia": float(np.nanmean(np.abs(referencia - reales))),
+            "ordenes_prueba": len(prueba),
+            "detalle": pd.DataFrame({"real": reales, "prediccion": predicciones}),
+        }
+
+    def table(self, level="proveedor_producto"):
+        """
+        Estadísticas precalculadas de un nivel del índice, como DataFrame plano.
+        """
+        return self.tables[level].reset_index()
+
+
+# Índice compartido por todas las sesiones
+lead_time_index = LeadTimeIndex()
@@ -0,0 +1,495 @@
+import csv
+import itertools
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+import pandas as pd
+
+
+# Vistas y funciones RPC de sql/agregados.sql y sql/resumenes.sql traducidas a SQLite. Las fechas se guardan como
+# texto ISO ('YYYY-MM-DDTHH:MM:SS'), por lo que se comparan como texto.
+VIEWS = {
+    "vista_conteo_categorias": """
+        select categoria, subcategoria, count(*) as conteo
+        from vista_categorias_compras
+        group by categoria, subcategoria
+    """,
+    "vista_resumen_ordenes": """
+        select mes, estado, tipo_compra, sum(conteo) as conteo
+        from resumen_mensual
+        group by mes, estado, tipo_compra
+    """,
+    "vista_demanda_mensual": """
+        select mes, categoria, sum(cantidad_total) as cantidad, sum(conteo) as conteo
+        from resumen_demanda_mensual
+        group by mes, categoria
+    """,
+}
+RPCS = {
+    "resumen_ordenes": """
+        select substr(fecha_creacion_compra, 1, 7) || '-01' as mes,
+               cast(estado as integer) as estado,
+               tipo_compra,
+               count(*) as conteo
+        from ordencompra
+        where (:fecha_desde is null or fecha_creacion_compra >= :fecha_desde)
+          and (:fecha_hasta is null or fecha_creacion_compra < :fecha_hasta)
+        group by 1, 2, 3
+    """,
+}
+
+# Tablas de resumen de sql/resumenes.sql (tabla -> columna de fecha), mantenidas con triggers por fila
+ROLLUPS = {"resumen_mensual": "fecha_creacion_compra", "resumen_demanda_mensual": "fecha_pedido_compra"}
+# SQLite considera distintos los nulos de un índice único: la clave se define con ifnull
+_ROLLUP_KEY = "mes, ifnull(estado, -1), ifnull(tipo_compra, ''), ifnull(categoria, '')"
+
+OPERATORS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class PostgRESTError(Exception):
+    """
+    Error con el código HTTP y el cuerpo que devolvería PostgREST.
+    """
+
+    def __init__(self, status, message, code=None):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+    def body(self):
+        return json.dumps({"code": self.code, "message": str(self), "details": None, "hint": None})
+
+
+def _sql_type(serie):
+    if pd.api.types.is_bool_dtype(serie) or pd.api.types.is_integer_dtype(serie):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(serie):
+        return "REAL"
+    return "TEXT"
+
+def _quote(nombre):
+    if not _IDENTIFIER.match(nombre):
+        raise PostgRESTError(400, f"Identificador no válido: {nombre}", "PGRST100")
+    return f'"{nombre}"'
+
+def _parse_list(texto):
+    # in.(a,"b c",3) -> ["a", "b c", "3"]
+    return next(csv.reader([texto.strip("()")], skipinitialspace=True)) if texto.strip("()") else []
+
+
+class LocalPostgREST:
+    """
+    Sustituto local de la API REST de Supabase para pruebas de carga sin conexión.
+    Sirve por HTTP los endpoints de PostgREST que usa la aplicación sobre una base SQLite
+    (en memoria o en un archivo): `select`, filtros (`eq`, `neq`, `gt`, `gte`, `lt`, `lte`,
+    `in`, `is`, `like`, `ilike`), `order`, `limit`/`offset` y cabecera `Range`, total con
+    `Prefer: count=exact`, inserción y upsert por POST (`Prefer: resolution=...`, `on_conflict`,
+    `return=representation`), las vistas y funciones RPC de sql/agregados.sql y las tablas de
+    resumen de sql/resumenes.sql. Puede añadir latencia y errores transitorios configurables.
+    """
+
+    def __init__(self, database=":memory:", latency=0.0, jitter=0.0, error_rate=0.0, error_status=503, seed=None, max_rows=None):
+        """
+        :param database: Ruta del archivo SQLite o ":memory:".
+        :param latency: Segundos de espera fijos añadidos a cada respuesta.
+        :param jitter: Media en segundos de una espera adicional con distribución exponencial
+                       (genera la cola de latencias que se ve en una red real).
+        :param error_rate: Proporción de peticiones (0 a 1) que responden con `error_status`.
+        :param error_status: Código de los errores inyectados (503 o 429 se reintentan en el cliente).
+        :param seed: Semilla para la latencia y los errores (resultados reproducibles).
+        :param max_rows: Filas máximas por respuesta, como `max-rows` de PostgREST (1000 en Supabase).
+        """
+        self.database = database
+        self.max_rows = max_rows
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self.injected_errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(database, check_same_thread=False)
+        if database != ":memory:":
+            self._conn.execute("pragma journal_mode=wal")
+        self._columns = {}
+        self._server = None
+        for tabla in ROLLUPS:
+            self._conn.execute(
+                f"create table if not exists {tabla} (mes text not null, estado integer, tipo_compra text, categoria text, "
+                "conteo integer not null default 0, cantidad_total real not null default 0, impuestos_total real not null default 0)"
+            )
+            self._conn.execute(f"create unique index if not exists {tabla}_clave on {tabla} ({_ROLLUP_KEY})")
+        self._conn.commit()
+
+    # --- Esquema ---
+
+    def load_table(self, table, df, unique=None, chunk_size=100_000):
+        """
+        Crea (o reemplaza) una tabla a partir de un DataFrame. La columna `id` entera es la clave
+        primaria, como en Supabase; las fechas se guardan como texto ISO.
+        :param table: Nombre de la tabla.
+        :param df: Datos iniciales (un DataFrame vacío crea solo la tabla) o un iterable de DataFrames
+                   con las mismas columnas, que se insertan bloque a bloque sin reunirlos en memoria.
+                   Los tipos de las columnas se toman del primer bloque.
+        :param unique: Lista de restricciones únicas (listas de columnas), necesarias para
+                       `on_conflict` igual que en Postgres.
+        """
+        bloques = iter([df] if isinstance(df, pd.DataFrame) else df)
+        primero = next(bloques)
+        columnas = []
+        for col in primero.columns:
+            tipo = _sql_type(primero[col])
+            clave = " primary key" if col == "id" and tipo == "INTEGER" else ""
+            columnas.append(f"{_quote(col)} {tipo}{clave}")
+        with self._lock:
+            self._conn.execute(f"drop table if exists {_quote(table)}")
+            self._conn.execute(f"create table {_quote(table)} ({', '.join(columnas)})")
+            for i, cols in enumerate(unique or []):
+                self._conn.execute(
+                    f"create unique index {_quote(f'{table}_unico_{i}')} on {_quote(table)} ({', '.join(map(_quote, cols))})"
+                )
+            marcadores = ", ".join("?" * len(primero.columns))
+            for bloque in itertools.chain([primero], bloques):
+                for inicio in range(0, len(bloque), chunk_size):
+                    lote = bloque.iloc[inicio:inicio + chunk_size].copy()
+                    for col in lote.columns:
+                        if pd.api.types.is_datetime64_any_dtype(lote[col]):
+                            lote[col] = lote[col].dt.strftime("%Y-%m-%dT%H:%M:%S")
+                    lote = lote.astype(object).where(lote.notna(), None)
+                    self._conn.executemany(f"insert into {_quote(table)} values ({marcadores})", lote.itertuples(index=False))
+            self._conn.commit()
+            self._columns.pop(table, None)
+            if table in ("ordencompra", "producto") and self._exists("ordencompra"):
+                self._install_rollups()
+
+    def _exists(self, table):
+        return self._conn.execute("select 1 from sqlite_master where name = ?", (table,)).fetchone() is not None
+
+    def _install_rollups(self):
+        """
+        Recalcula las tablas de resumen y crea los triggers que las mantienen al escribir en
+        `ordencompra` (equivalente a sql/resumenes.sql). Se llama con el candado tomado.
+        """
+        categoria = "(select categoria from producto where id = {fila}.producto_id)" if self._exists("producto") else "null"
+        for evento in ("insert", "update", "delete"):
+            self._conn.execute(f"drop trigger if exists resumenes_{evento}")
+
+        for tabla, fecha in ROLLUPS.items():
+            self._conn.execute(f"delete from {tabla}")
+            self._conn.execute(
+                f"insert into {tabla} select substr(o.{fecha}, 1, 7) || '-01', cast(o.estado as integer), o.tipo_compra, "
+                f"{categoria.format(fila='o')}, count(*), ifnull(sum(o.cantidad), 0), ifnull(sum(o.impuestos), 0) "
+                f"from ordencompra o where o.{fecha} is not null group by 1, 2, 3, 4"
+            )
+
+        def sumar(fila, signo):
+            return "".join(
+                f"insert into {tabla} select substr({fila}.{fecha}, 1, 7) || '-01', cast({fila}.estado as integer), "
+                f"{fila}.tipo_compra, {categoria.format(fila=fila)}, {signo}, {signo} * ifnull({fila}.cantidad, 0), "
+                f"{signo} * ifnull({fila}.impuestos, 0) where {fila}.{fecha} is not null "
+                f"on conflict ({_ROLLUP_KEY}) do update set conteo = conteo + excluded.conteo, "
+                "cantidad_total = cantidad_total + excluded.cantidad_total, "
+                "impuestos_total = impuestos_total + excluded.impuestos_total; "
+                for tabla, fecha in ROLLUPS.items()
+            )
+        limpiar = "".join(f"delete from {tabla} where conteo = 0; " for tabla in ROLLUPS)
+        cuerpos = {"insert": sumar("new", 1), "update": sumar("old", -1) + sumar("new", 1) + limpiar, "delete": sumar("old", -1) + limpiar}
+        for evento, cuerpo in cuerpos.items():
+            self._conn.execute(f"create trigger resumenes_{evento} after {evento} on ordencompra begin {cuerpo} end")
+        self._conn.commit()
+
+    def _table_columns(self, table):
+        # Columnas de una tabla o vista (las vistas se crean la primera vez que se consultan)
+        if table not in self._columns:
+            if table in VIEWS:
+                self._conn.execute(f"create view if not exists {_quote(table)} as {VIEWS[table]}")
+            filas = self._conn.execute(f"pragma table_info({_quote(table)})").fetchall()
+            if not filas:
+                raise PostgRESTError(404, f"No existe la relación public.{table}", "42P01")
+            self._columns[table] = {fila[1]: fila[5] > 0 for fila in filas}
+        return self._columns[table]
+
+    def _check_columns(self, table, columnas):
+        existentes = self._table_columns(table)
+        for col in columnas:
+            if col not in existentes:
+                raise PostgRESTError(400, f"No existe la columna {table}.{col}", "42703")
+
+    # --- Semántica de PostgREST ---
+
+    def select(self, table, params, range_header=None, count=False):
+        """
+        :param params: Lista de tuplas (parámetro, valor) de la URL.
+        :param range_header: Cabecera `Range` ("0-999"), alternativa a `limit`/`offset`.
+        :param count: Contar también las filas que cumplen los filtros (`Prefer: count=exact`).
+        :return: Tupla (filas en JSON, primera fila, número de filas, total o None).
+        """
+        with self._lock:
+            self._table_columns(table)
+            columnas, where, valores, orden, limit, offset = ["*"], [], [], [], None, 0
+            for clave, valor in params:
+                if clave == "select":
+                    columnas = [c.strip() for c in valor.split(",") if c.strip()]
+                    if columnas != ["*"]:
+                        self._check_columns(table, columnas)
+                elif clave == "order":
+                    for parte in valor.split(","):
+                        col, *modificadores = parte.split(".")
+                        self._check_columns(table, [col])
+                        direccion = "desc" if "desc" in modificadores else "asc"
+                        nulos = " nulls first" if "nullsfirst" in modificadores else " nulls last" if "nullslast" in modificadores else ""
+                        orden.append(f"{_quote(col)} {direccion}{nulos}")
+                elif clave == "limit":
+                    limit = int(valor)
+                elif clave == "offset":
+                    offset = int(valor)
+                elif clave not in RESERVED_PARAMS:
+                    self._check_columns(table, [clave])
+                    condicion, argumentos = self._condition(clave, valor)
+                    where.append(condicion)
+                    valores.extend(argumentos)
+            if limit is None and range_header:
+                desde, _, hasta = range_header.partition("-")
+                offset = int(desde)
+                limit = int(hasta) - offset + 1 if hasta else None
+            limit = self._limit(limit)
+
+            condiciones = f" where {' and '.join(where)}" if where else ""
+            total = self._conn.execute(f"select count(*) from {_quote(table)}{condiciones}", valores).fetchone()[0] if count else None
+            sql = f"select {', '.join(c if c == '*' else _quote(c) for c in columnas)} from {_quote(table)}{condiciones}"
+            if orden:
+                sql += " order by " + ", ".join(orden)
+            sql += " limit ? offset ?"
+            cursor = self._conn.execute(sql, [*valores, -1 if limit is None else limit, offset])
+            nombres = [d[0] for d in cursor.description]
+            filas = [dict(zip(nombres, fila)) for fila in cursor.fetchall()]
+        return json.dumps(filas, ensure_ascii=False), offset, len(filas), total
+
+    @staticmethod
+    def _condition(columna, expresion):
+        operador, _, texto = expresion.partition(".")
+        if operador.startswith("not"):
+            raise PostgRESTError(400, f"Operador no soportado: {operador}", "PGRST100")
+        if operador in OPERATORS:
+            return f"{_quote(columna)} {OPERATORS[operador]} ?", [texto]
+        if operador == "in":
+            valores = _parse_list(texto)
+            return f"{_quote(columna)} in ({', '.join('?' * len(valores))})", valores
+        if operador in ("like", "ilike"):
+            # PostgREST usa * como comodín; LIKE de SQLite no distingue mayúsculas en ASCII
+            return f"{_quote(columna)} like ?", [texto.replace("*", "%")]
+        if operador == "is" and texto in ("null", "true", "false"):
+            return f"{_quote(columna)} is {texto}", []
+        raise PostgRESTError(400, f"Operador no soportado: {operador}", "PGRST100")
+
+    def upsert(self, table, filas, prefer="", on_conflict=None):
+        """
+        Inserta filas como PostgREST: con `resolution=merge-duplicates` actualiza las existentes
+        (según `on_conflict` o la clave primaria), con `resolution=ignore-duplicates` las omite y
+        sin `resolution` un duplicado es un error 409.
+        :return: Lista de filas guardadas si `prefer` incluye `return=representation`, si no None.
+        """
+        if not filas:
+            return [] if "return=representation" in prefer else None
+        columnas = list(filas[0])
+        claves = set(columnas)
+        if any(fila.keys() != claves for fila in filas):
+            raise PostgRESTError(400, "Todas las filas deben tener las mismas claves", "PGRST102")
+        representacion = "return=representation" in prefer
+        with self._lock:
+            self._check_columns(table, columnas)
+            sql = f"insert into {_quote(table)} ({', '.join(map(_quote, columnas))}) values "
+            conflicto = ""
+            if "resolution=merge-duplicates" in prefer or "resolution=ignore-duplicates" in prefer:
+                objetivo = on_conflict.split(",") if on_conflict else [c for c, pk in self._columns[table].items() if pk]
+                self._check_columns(table, objetivo)
+                if "resolution=ignore-duplicates" in prefer:
+                    conflicto = f" on conflict ({', '.join(map(_quote, objetivo))}) do nothing"
+                else:
+                    resto = [c for c in columnas if c not in objetivo]
+                    accion = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in resto) if resto else None
+                    conflicto = f" on conflict ({', '.join(map(_quote, objetivo))}) " + (f"do update set {accion}" if accion else "do nothing")
+            # SQLite limita el número de parámetros por sentencia
+            por_sentencia = max(1, 32_000 // len(columnas))
+            guardadas = []
+            try:
+                for inicio in range(0, len(filas), por_sentencia):
+                    lote = filas[inicio:inicio + por_sentencia]
+                    marcadores = ", ".join([f"({', '.join('?' * len(columnas))})"] * len(lote))
+                    valores = [fila.get(c) for fila in lote for c in columnas]
+                    cursor = self._conn.execute(f"{sql}{marcadores}{conflicto}{' returning *' if representacion else ''}", valores)
+                    if representacion:
+                        nombres = [d[0] for d in cursor.description]
+                        guardadas.extend(dict(zip(nombres, fila)) for fila in cursor.fetchall())
+                self._conn.commit()
+            except sqlite3.IntegrityError as e:
+                self._conn.rollback()
+                if "UNIQUE" in str(e) or "PRIMARY KEY" in str(e):
+                    raise PostgRESTError(409, f"Valor duplicado: {e}", "23505")
+                raise PostgRESTError(400, str(e), "23502" if "NOT NULL" in str(e) else "23514")
+            except sqlite3.OperationalError as e:
+                self._conn.rollback()
+                raise PostgRESTError(400, str(e), "42P10")
+        return guardadas if representacion else None
+
+    def _limit(self, limit):
+        # Como `max-rows` de PostgREST: ninguna respuesta supera `max_rows` filas
+        if self.max_rows is None:
+            return limit
+        return self.max_rows if limit is None else min(limit, self.max_rows)
+
+    def rpc(self, function, params, query=None):
+        """
+        Ejecuta una función de `RPCS`; los argumentos que no se envían valen null.
+        :param query: Lista de tuplas (parámetro, valor) de la URL: `order`, `limit` y `offset`.
+        """
+        if function not in RPCS:
+            raise PostgRESTError(404, f"No existe la función public.{function}", "PGRST202")
+        sql = RPCS[function]
+        argumentos = {nombre: (params or {}).get(nombre) for nombre in re.findall(r":(\w+)", sql)}
+        consulta = dict(query or [])
+        orden = []
+        for parte in filter(None, consulta.get("order", "").split(",")):
+            col, *modificadores = parte.split(".")
+            if not _IDENTIFIER.match(col):
+                raise PostgRESTError(400, f"Orden no válido: {parte}", "PGRST100")
+            orden.append(f"{_quote(col)} {'desc' if 'desc' in modificadores else 'asc'}")
+        limit = self._limit(int(consulta["limit"]) if "limit" in consulta else None)
+        sql = f"select * from ({sql})" + (f" order by {', '.join(orden)}" if orden else "") + " limit :_limit offset :_offset"
+        argumentos.update({"_limit": -1 if limit is None else limit, "_offset": int(consulta.get("offset", 0))})
+        with self._lock:
+            cursor = self._conn.execute(sql, argumentos)
+            nombres = [d[0] for d in cursor.description]
+            filas = [dict(zip(nombres, fila)) for fila in cursor.fetchall()]
+        return json.dumps(filas, ensure_ascii=False)
+
+    def _inject(self):
+        """
+        Espera simulada de la red y error inyectado para la petición actual.
+        :return: True si la petición debe fallar.
+        """
+        with self._lock:
+            self.requests += 1
+            espera = self.latency + (self._random.expovariate(1 / self.jitter) if self.jitter else 0.0)
+            fallo = self.error_rate > 0 and self._random.random() < self.error_rate
+            self.injected_errors += int(fallo)
+        if espera:
+            time.sleep(espera)
+        return fallo
+
+    def stats(self):
+        """
+        Peticiones recibidas y errores inyectados.
+        """
+        with self._lock:
+            return {"peticiones": self.requests, "errores_inyectados": self.injected_errors}
+
+    # --- Servidor HTTP ---
+
+    def start(self, port=0):
+        """
+        Arranca el servidor en un hilo y devuelve su URL base (úsese como SUPABASE_URL).
+        :param port: Puerto local (0 = uno libre).
+        """
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Cabeceras y cuerpo se escriben por separado: sin esto cada respuesta espera ~40 ms (Nagle)
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status, cuerpo="", headers=None):
+                cuerpo = cuerpo.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                for clave, valor in (headers or {}).items():
+                    self.send_header(clave, valor)
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def _handle(self, accion):
+                url = urlparse(self.path)
+                ruta = url.path.removeprefix("/rest/v1/")
+                params = parse_qsl(url.query)
+                cuerpo = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if backend._inject():
+                    self._reply(backend.error_status, json.dumps({"message": "Error inyectado"}), {"Retry-After": "0"})
+                    return
+                try:
+                    accion(ruta, params, cuerpo)
+                except PostgRESTError as e:
+                    self._reply(e.status, e.body())
+                except (ValueError, sqlite3.Error) as e:
+                    self._reply(400, PostgRESTError(400, str(e)).body())
+
+            def do_GET(self):
+                def leer(ruta, params, cuerpo):
+                    contar = "count=exact" in self.headers.get("Prefer", "")
+                    filas, inicio, n, total = backend.select(ruta, params, self.headers.get("Range"), contar)
+                    rango = f"{inicio}-{inicio + n - 1}" if n else "*"
+                    rango += f"/{'*' if total is None else total}"
+                    # Como PostgREST: 206 si se pidió el total y la respuesta no incluye todas las filas
+                    parcial = total is not None and n < total
+                    self._reply(206 if parcial else 200, filas, {"Content-Range": rango})
+                self._handle(leer)
+
+            def do_POST(self):
+                def escribir(ruta, params, cuerpo):
+                    datos = json.loads(cuerpo or b"null")
+                    if ruta.startswith("rpc/"):
+                        self._reply(200, backend.rpc(ruta.removeprefix("rpc/"), datos, params))
+                        return
+                    filas = datos if isinstance(datos, list) else [datos]
+                    guardadas = backend.upsert(ruta, filas, self.headers.get("Prefer", ""), dict(params).get("on_conflict"))
+                    self._reply(201, "" if guardadas is None else json.dumps(guardadas, ensure_ascii=False))
+                self._handle(escribir)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def start_local_backend():
+    """
+    Arranca el backend local configurado con variables de entorno (ver README):
+    LOCAL_BACKEND_DB, LOCAL_BACKEND_LATENCY_MS, LOCAL_BACKEND_JITTER_MS, LOCAL_BACKEND_ERROR_RATE y
+    LOCAL_BACKEND_MAX_ROWS.
+    :return: Tupla (backend, URL base).
+    """
+    database = os.getenv("LOCAL_BACKEND_DB", os.path.join("data", "local.db"))
+    if database != ":memory:":
+        os.makedirs(os.path.dirname(database) or ".", exist_ok=True)
+    backend = LocalPostgREST(
+        database,
+        latency=float(os.getenv("LOCAL_BACKEND_LATENCY_MS", "0")) / 1000,
+        jitter=float(os.getenv("LOCAL_BACKEND_JITTER_MS", "0")) / 1000,
+        error_rate=float(os.getenv("LOCAL_BACKEND_ERROR_RATE", "0")),
+        max_rows=int(os.getenv("LOCAL_BACKEND_MAX_ROWS", "1000")) or None,
+    )
+    return backend, backend.start()
@@ -0,0 +1,158 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import joblib
+import pandas as pd
+
+
+# Directorio donde se guardan los modelos entrenados
+MODELS_DIR = os.getenv("MODELS_DIR", os.path.join("data", "models"))
+
+
+def data_fingerprint(X, y=None):
+    """
+    Calcula una huella de los datos de entrenamiento (valores, columnas y tipos).
+    :param X: DataFrame de características.
+    :param y: Serie objetivo (opcional).
+    :return: Hash hexadecimal de los datos.
+    """
+    h = hashlib.sha1()
+    h.update(json.dumps([list(map(str, X.columns)), list(map(str, X.dtypes))]).encode())
+    h.update(pd.util.hash_pandas_object(X, index=False).values.tobytes())
+    if y is not None:
+        h.update(pd.util.hash_pandas_object(pd.Series(y), index=False).values.tobytes())
+    return h.hexdigest()
+
+def model_key(estimator, features, target):
+    """
+    Clave del modelo: tipo de estimador, características, objetivo e hiperparámetros.
+    """
+    descripcion = {
+        "estimator": type(estimator).__name__,
+        "features": list(map(str, features)),
+        "target": None if target is None else str(target),
+        "params": {k: repr(v) for k, v in sorted(estimator.get_params().items())},
+    }
+    return hashlib.sha1(json.dumps(descripcion, sort_keys=True).encode()).hexdigest()[:20]
+
+
+class ModelRegistry:
+    """
+    Registro de modelos entrenados persistidos con joblib.
+    Un modelo se reutiliza mientras no cambien sus características, objetivo, hiperparámetros
+    ni la huella de los datos de entrenamiento; si cambian los datos se reentrena y se
+    descartan las versiones anteriores.
+    """
+
+    def __init__(self, directory=MODELS_DIR, max_loaded=8):
+        self.directory = directory
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key, fingerprint):
+        return os.path.join(self.directory, f"{key}-{fingerprint[:16]}.joblib")
+
+    def load(self, path):
+        """
+        Carga una entrada del registro, usando memoria mapeada para los arrays grandes.
+        """
+        with self._lock:
+            if path in self._loaded:
+                self._loaded.move_to_end(path)
+                return self._loaded[path]
+        entry = joblib.load(path, mmap_mode="r")
+        self._remember(path, entry)
+        return entry
+
+    def _remember(self, path, entry):
+        # Entradas en memoria de uso más reciente: como máximo `max_loaded`
+        with self._lock:
+            self._loaded[path] = entry
+            self._loaded.move_to_end(path)
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+
+    def save(self, key, fingerprint, entry):
+        """
+        Guarda una entrada y elimina las versiones anteriores con la misma clave.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key, fingerprint)
+        joblib.dump(entry, f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+        for antiguo in glob.glob(os.path.join(self.directory, f"{key}-*.joblib")):
+            if antiguo != path:
+                os.remove(antiguo)
+                with self._lock:
+                    self._loaded.pop(antiguo, None)
+        self._remember(path, entry)
+        return path
+
+    def lookup(self, estimator, X, y=None, fingerprint=None):
+        """
+        Devuelve la entrada registrada para este estimador y estos datos, o None si no existe.
+        """
+        key = model_key(estimator, X.columns, getattr(y, "name", None))
+        path = self._path(key, fingerprint or data_fingerprint(X, y))
+        if os.path.exists(path):
+            return self.load(path)
+        return None
+
+    def latest(self, estimator, features, target=None):
+        """
+        Devuelve la versión registrada de este estimador (tipo e hiperparámetros), características
+        y objetivo, sin comprobar la huella de los datos, o None si no hay ninguna.
+        """
+        rutas = glob.glob(os.path.join(self.directory, f"{model_key(estimator, features, target)}-*.joblib"))
+        if not rutas:
+            return None
+        return self.load(max(rutas, key=os.path.getmtime))
+
+    def get_or_fit(self, estimator, X, y=None, fingerprint=None, fit_fn=None, extras=None):
+        """
+        Devuelve el modelo registrado para estos datos o lo entrena y registra si no existe.
+        :param estimator: Estimador de scikit-learn sin entrenar (define tipo e hiperparámetros).
+        :param X: DataFrame de características.
+        :param y: Serie objetivo (None para modelos no supervisados).
+        :param fingerprint: Huella de los datos ya calculada (opcional).
+        :param fit_fn: Función `fit_fn(estimator, X, y)` que sustituye a `estimator.fit`.
+        :param extras: Objetos que se guardan junto al modelo (por ejemplo, el codificador
+                       usado para preparar `X`).
+        :return: Tupla (entrada, entrenado) donde entrada es un diccionario con el modelo y sus
+                 metadatos, y entrenado indica si hubo que entrenar en esta llamada.
+        """
+        target = getattr(y, "name", None)
+        key = model_key(estimator, X.columns, target)
+        fingerprint = fingerprint or data_fingerprint(X, y)
+        path = self._path(key, fingerprint)
+        if os.path.exists(path):
+            return self.load(path), False
+
+        inicio = time.perf_counter()
+        if fit_fn is not None:
+            fit_fn(estimator, X, y)
+        elif y is None:
+            estimator.fit(X)
+        else:
+            estimator.fit(X, y)
+        entry = {
+            "model": estimator,
+            "features": list(X.columns),
+            "target": target,
+            "params": estimator.get_params(),
+            "fingerprint": fingerprint,
+            "trained_at": time.time(),
+            "fit_seconds": time.perf_counter() - inicio,
+            **(extras or {}),
+        }
+        self.save(key, fingerprint, entry)
+        return entry, True
+
+
+# Registro compartido por todas las secciones
+registry = ModelRegistry()
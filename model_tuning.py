@@ -0,0 +1,235 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+import numpy as np
+from joblib import effective_n_jobs
+from sklearn.base import clone
+from sklearn.metrics import silhouette_score
+from sklearn.model_selection import GridSearchCV, ParameterGrid, ParameterSampler
+from model_registry import data_fingerprint
+from training_jobs import scheduler, report_progress
+
+
+# Directorio donde se guardan los resultados de las búsquedas
+TUNING_DIR = os.getenv("TUNING_DIR", os.path.join("data", "tuning"))
+
+# Registro de entrenamientos en model_training.log
+logger = logging.getLogger("model_training")
+if not logger.handlers:
+    _handler = logging.FileHandler("model_training.log", encoding="utf-8")
+    _handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+METHODS = ("halving", "random")
+
+
+def validate_param_grid(estimator, param_grid):
+    """
+    Valida la rejilla de hiperparámetros y envuelve en una lista los valores sueltos.
+    :param estimator: Estimador al que se aplicará la rejilla.
+    :param param_grid: Diccionario parámetro -> lista de valores (o distribución de scipy).
+    :return: Rejilla normalizada.
+    """
+    if not param_grid:
+        raise ValueError("La rejilla de parámetros está vacía.")
+    validos = estimator.get_params()
+    normalizada = {}
+    for nombre, valores in param_grid.items():
+        if nombre not in validos:
+            raise ValueError(f"El parámetro '{nombre}' no existe en {type(estimator).__name__}.")
+        if hasattr(valores, "rvs"):
+            normalizada[nombre] = valores
+            continue
+        if isinstance(valores, (str, bytes)) or not hasattr(valores, "__iter__"):
+            valores = [valores]
+        valores = list(valores)
+        if not valores:
+            raise ValueError(f"El parámetro '{nombre}' no tiene valores.")
+        normalizada[nombre] = valores
+    return normalizada
+
+def silhouette_scorer(estimator, X, y=None):
+    """
+    Puntuación para modelos de segmentación (coeficiente de silueta sobre una muestra).
+    """
+    labels = estimator.predict(X)
+    if len(np.unique(labels)) < 2:
+        return -1.0
+    return silhouette_score(X, labels, sample_size=min(len(X), 2000), random_state=0)
+
+def _describe(value):
+    # Las funciones se identifican por nombre: su repr incluye una dirección de memoria
+    return getattr(value, "__qualname__", None) or repr(value)
+
+def _cache_key(estimator, param_grid, fingerprint, **options):
+    descripcion = {
+        "estimator": type(estimator).__name__,
+        "params": {k: _describe(v) for k, v in sorted(estimator.get_params().items())},
+        "grid": {k: _describe(v) for k, v in sorted(param_grid.items())},
+        "fingerprint": fingerprint,
+        "options": {k: _describe(v) for k, v in sorted(options.items())},
+    }
+    return hashlib.sha1(json.dumps(descripcion, sort_keys=True).encode()).hexdigest()[:24]
+
+def _read_cache(key):
+    path = os.path.join(TUNING_DIR, f"{key}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_cache(key, result):
+    os.makedirs(TUNING_DIR, exist_ok=True)
+    path = os.path.join(TUNING_DIR, f"{key}.json")
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(result, f, default=lambda o: o.item() if hasattr(o, "item") else str(o))
+    os.replace(f"{path}.tmp", path)
+
+def _candidates(param_grid, n_candidates, random_state):
+    if all(isinstance(v, list) for v in param_grid.values()):
+        grid = ParameterGrid(param_grid)
+        if len(grid) <= n_candidates:
+            return list(grid)
+    return list(ParameterSampler(param_grid, n_candidates, random_state=random_state))
+
+def _resources(n_samples, n_candidates, factor, method, min_resources):
+    if method == "random":
+        return [n_samples]
+    rondas = max(1, math.ceil(math.log(max(n_candidates, 1), factor)))
+    minimo = min(n_samples, max(min_resources, n_samples // factor ** (rondas - 1)))
+    return [min(n_samples, minimo * factor ** i) for i in range(rondas)]
+
+def tune_model(estimator, X, y=None, param_grid=None, method="halving", n_candidates=16, factor=3,
+               cv=3, scoring=None, time_budget=None, n_jobs=-1, random_state=42, report=None, use_cache=True):
+    """
+    Búsqueda de hiperparámetros en paralelo con límite de tiempo.
+    Con `method="halving"` los candidatos se evalúan primero sobre una muestra pequeña y solo
+    el mejor 1/`factor` pasa a la ronda siguiente con `factor` veces más filas (successive halving);
+    con `method="random"` todos los candidatos se evalúan con los datos completos.
+    Los candidatos se evalúan por lotes en todos los núcleos y, agotado `time_budget`, no se
+    lanzan más lotes. Los resultados se guardan por huella de datos y se registran en
+    model_training.log.
+    :param estimator: Estimador base de scikit-learn.
+    :param X: DataFrame de características.
+    :param y: Serie objetivo (None para segmentación, que se puntúa con la silueta).
+    :param param_grid: Diccionario parámetro -> valores, ver `validate_param_grid`.
+    :param n_candidates: Número máximo de combinaciones a evaluar.
+    :param time_budget: Segundos disponibles (None = sin límite).
+    :param report: Función `report(progreso, mensaje)` para informar del avance.
+    :return: Diccionario con `best_params`, `best_score`, las rondas evaluadas y los tiempos.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Método de búsqueda no soportado: {method}")
+    report = report or (lambda progreso, mensaje: None)
+    nombre = type(estimator).__name__
+    grid = validate_param_grid(estimator, param_grid)
+    if y is None and scoring is None:
+        scoring = silhouette_scorer
+
+    fingerprint = data_fingerprint(X, y)
+    key = _cache_key(estimator, grid, fingerprint, method=method, n_candidates=n_candidates,
+                     factor=factor, cv=cv, scoring=scoring, random_state=random_state)
+    if use_cache:
+        cached = _read_cache(key)
+        if cached is not None:
+            logger.info(f"Ajuste de {nombre} recuperado de caché: mejores parámetros {cached['best_params']}")
+            return cached
+
+    base = clone(estimator)
+    # El paralelismo se aplica entre candidatos y particiones, no dentro de cada modelo
+    if "n_jobs" in base.get_params():
+        base.set_params(n_jobs=1)
+
+    candidatos = _candidates(grid, n_candidates, random_state)
+    recursos = _resources(len(X), len(candidatos), factor, method, min_resources=cv * 20)
+    lote = max(1, effective_n_jobs(n_jobs))
+    orden = np.random.RandomState(random_state).permutation(len(X))
+    inicio = time.perf_counter()
+    limite = inicio + time_budget if time_budget else None
+    evaluaciones = 0
+    agotado = False
+    rondas = []
+    mejor = None
+
+    try:
+        for ronda, n in enumerate(recursos):
+            idx = orden[:n]
+            X_r = X.iloc[idx]
+            y_r = None if y is None else y.iloc[idx]
+            inicio_ronda = time.perf_counter()
+            puntuaciones = []
+            for i in range(0, len(candidatos), lote):
+                if limite and time.perf_counter() > limite and (puntuaciones or ronda > 0):
+                    agotado = True
+                    break
+                grupo = candidatos[i:i + lote]
+                search = GridSearchCV(
+                    base, [{k: [v] for k, v in c.items()} for c in grupo],
+                    cv=cv, scoring=scoring, n_jobs=n_jobs, refit=False, error_score=np.nan,
+                )
+                search.fit(X_r, y_r)
+                puntuaciones.extend(search.cv_results_["mean_test_score"])
+                evaluaciones += len(grupo)
+                report(
+                    (ronda + len(puntuaciones) / len(candidatos)) / len(recursos),
+                    f"Ronda {ronda + 1}/{len(recursos)}: {len(puntuaciones)} de {len(candidatos)} candidatos con {n} filas",
+                )
+
+            evaluados = sorted(
+                zip(candidatos[:len(puntuaciones)], puntuaciones),
+                key=lambda cp: -np.inf if np.isnan(cp[1]) else cp[1], reverse=True,
+            )
+            if evaluados and not np.isnan(evaluados[0][1]):
+                mejor = evaluados[0]
+            segundos_ronda = time.perf_counter() - inicio_ronda
+            rondas.append({"filas": n, "candidatos": len(puntuaciones), "segundos": segundos_ronda})
+            logger.info(f"Ajuste de {nombre}, ronda {ronda + 1}: {len(puntuaciones)} candidatos con {n} filas en {segundos_ronda:.1f} s")
+
+            if agotado or len(evaluados) <= 1:
+                break
+            candidatos = [c for c, _ in evaluados[:max(1, math.ceil(len(evaluados) / factor))]]
+    except Exception as e:
+        logger.error(f"Error en el entrenamiento del modelo: {e}")
+        raise
+
+    if mejor is None:
+        logger.error(f"Error en el entrenamiento del modelo: ningún candidato de {nombre} pudo evaluarse.")
+        raise ValueError("Ningún candidato pudo evaluarse. Revise la rejilla de parámetros y los datos.")
+
+    segundos = time.perf_counter() - inicio
+    resultado = {
+        "estimator": nombre,
+        "method": method,
+        "best_params": mejor[0],
+        "best_score": float(mejor[1]),
+        "evaluations": evaluaciones,
+        "rounds": rondas,
+        "seconds": segundos,
+        "budget_exhausted": agotado,
+        "fingerprint": fingerprint,
+    }
+    logger.info(
+        f"Mejor modelo {nombre} ({method}): parámetros {mejor[0]}, puntuación {mejor[1]:.4f}, "
+        f"{evaluaciones} evaluaciones en {segundos:.1f} s con {effective_n_jobs(n_jobs)} núcleos"
+        + (" (presupuesto de tiempo agotado)" if agotado else "")
+    )
+    if use_cache:
+        _write_cache(key, resultado)
+    return resultado
+
+def _run_tuning_job(key, estimator, X, y, param_grid, options):
+    return tune_model(estimator, X, y, param_grid, report=lambda p, m: report_progress(key, p, m), **options)
+
+def submit_tuning(estimator, X, y=None, param_grid=None, description="Búsqueda de hiperparámetros", **options):
+    """
+    Envía una búsqueda de hiperparámetros al planificador de trabajos en segundo plano.
+    :param options: Argumentos adicionales de `tune_model`.
+    :return: Objeto `Job` cuyo resultado es el diccionario de `tune_model`.
+    """
+    grid = validate_param_grid(estimator, param_grid)
+    key = "tuning-" + _cache_key(estimator, grid, data_fingerprint(X, y), **options)
+    return scheduler.submit(key, _run_tuning_job, estimator, X, y, grid, options, description=description)
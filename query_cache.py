@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    """
+    Caché compartida por todo el proceso para los resultados de consultas a Supabase.
+    Las entradas caducan a los `ttl` segundos y, cuando se supera `max_entries` o `max_bytes`,
+    se descartan las menos usadas recientemente.
+    """
+
+    def __init__(self, ttl=300, max_entries=32, max_bytes=512 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(table, **params):
+        """
+        Construye la clave de caché a partir de la tabla y los parámetros de la consulta.
+        """
+        return (table, tuple(sorted((k, _freeze(v)) for k, v in params.items())))
+
+    def get(self, key):
+        """
+        Devuelve el valor almacenado o None si no existe o ha caducado.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size=0):
+        """
+        Almacena un valor. `size` es el tamaño aproximado en bytes usado para el límite de memoria.
+        """
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, table=None, prefix=None):
+        """
+        Elimina las entradas de una tabla, de las tablas cuyo nombre empieza por `prefix`,
+        o todas si no se indica ninguno de los dos.
+        :return: Número de entradas eliminadas.
+        """
+        with self._lock:
+            keys = [
+                k for k in self._entries
+                if (table is None and prefix is None)
+                or k[0] == table
+                or (prefix is not None and k[0].startswith(prefix))
+            ]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def stats(self):
+        """
+        Devuelve los contadores de uso de la caché.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entradas": len(self._entries),
+                "bytes": self._bytes,
+                "aciertos": self.hits,
+                "fallos": self.misses,
+                "tasa_aciertos": self.hits / total if total else 0.0,
+                "expulsiones": self.evictions,
+                "invalidaciones": self.invalidations,
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
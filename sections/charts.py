@@ -0,0 +1,18 @@
+import streamlit as st
+
+
+def show_chart(fig, stats=None):
+    """
+    Muestra un gráfico de Plotly y, si sus datos se redujeron antes de graficar, indica
+    cuántos puntos se enviaron y una estimación del tamaño evitado, calculada con el número de
+    puntos (sin volver a serializar la figura).
+    :param fig: Figura de Plotly.
+    :param stats: Estadísticas devueltas por las funciones de `chart_prep`.
+    """
+    st.plotly_chart(fig)
+    if not stats or stats["puntos_originales"] <= stats["puntos_enviados"]:
+        return
+    st.caption(
+        f"Se muestran {stats['puntos_enviados']:,} de {stats['puntos_originales']:,} puntos "
+        f"(preparación {stats['ms_preparacion']:.0f} ms). Se evitó enviar ~{stats['bytes_evitados'] / 1e6:.1f} MB."
+    )
@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
 import os
-from supabase_api import fetch_data_from_supabase, insert_data_into_supabase
+from supabase_api import insert_data_into_supabase, query_cache, session
+from sections.table_view import show_remote_table
 
 
 def configuration_section():
@@ -11,6 +12,22 @@ def configuration_section():
     st.subheader("Opciones Generales")
     st.write("Configuración general del sistema. Aquí puedes realizar ajustes globales.")
 
+    # Estado de la caché de consultas a Supabase
+    st.subheader("Caché de Consultas")
+    st.write(f"Las consultas se conservan durante {query_cache.ttl} segundos.")
+    st.dataframe(pd.DataFrame([query_cache.stats()]))
+    if st.button("Vaciar Caché"):
+        eliminadas = query_cache.invalidate()
+        st.success(f"Se eliminaron {eliminadas} consultas de la caché.")
+
+    # Métricas de la conexión HTTP compartida con Supabase
+    st.subheader("Conexión con Supabase")
+    st.write(
+        f"Conexiones reutilizadas, hasta {session.max_retries} reintentos por petición y "
+        f"tiempo máximo de {session.timeout[0]:g} s de conexión y {session.timeout[1]:g} s de lectura."
+    )
+    st.dataframe(pd.DataFrame([session.stats()]))
+
 def usuarios_section():
     """
     Gestión de Usuarios.
@@ -26,12 +43,13 @@ def mantenimiento_proveedores_section():
     st.subheader("Mantenimiento de Proveedores")
     st.write("Aquí puedes gestionar los datos de los proveedores.")
 
-    # Botón para consultar proveedores
-    if st.button("Consultar Proveedores"):
+    # Consulta de proveedores por páginas (solo se descarga la página visible)
+    if st.checkbox("Consultar Proveedores"):
         try:
-            response = fetch_data_from_supabase("proveedor")
-            st.success("Datos consultados correctamente:")
-            st.dataframe(response)
+            show_remote_table(
+                "proveedor", key="proveedores", columns=["id", "ruc_proveedor", "nombre_proveedor"],
+                text_columns=["ruc_proveedor", "nombre_proveedor"],
+            )
         except Exception as e:
             st.error(f"Error al consultar la tabla proveedor: {e}")
 
@@ -51,7 +69,7 @@ def mantenimiento_proveedores_section():
                 st.write("Datos a insertar o actualizar:", nuevo_proveedor)  # Depuración
                 response = insert_data_into_supabase("proveedor", nuevo_proveedor)
                 st.success("Proveedor agregado o actualizado correctamente.")
-                st.write("Respuesta de Supabase:", response.data)  # Mostrar respuesta
+                st.write("Respuesta de Supabase:", response)  # Mostrar respuesta
             except Exception as e:
                 st.error(f"Error al agregar o actualizar el proveedor: {e}")
 
@@ -1,17 +1,15 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from supabase_api import fetch_data_from_supabase
+from aggregations import fetch_category_counts, sum_counts
 
 def dashboard_section():
     st.title("Dashboard Interactivo")
     st.subheader("Visión general de las Compras por Categoría")
 
-    # Cargar datos desde Supabase
+    # Cargar los conteos agregados en Supabase (una fila por categoría y subcategoría)
     try:
-        table_name = "vista_categorias_compras"
-        data = fetch_data_from_supabase(table_name)
-        df = pd.DataFrame(data)
+        df = fetch_category_counts()
 
         st.write("Datos cargados (vista previa):")
         st.dataframe(df.head())
@@ -42,7 +40,7 @@ def dashboard_section():
 
         # Métricas clave
         st.subheader("Métricas Clave")
-        st.metric("Total de Compras", len(df))
+        st.metric("Total de Compras", int(df["conteo"].sum()))
         st.metric("Categorías Distintas", df["categoria"].nunique())
         st.metric("Subcategorías Distintas", df["subcategoria"].nunique())
 
@@ -50,12 +48,12 @@ def dashboard_section():
         st.subheader("Visualizaciones")
         
         # Gráfico de barras: Distribución de compras por categoría
-        if "categoria" in df.columns:
-            st.plotly_chart(px.bar(df, x="categoria", title="Distribución de Compras por Categoría", color="categoria"))
+        por_categoria = sum_counts(df, ["categoria"])
+        st.plotly_chart(px.bar(por_categoria, x="categoria", y="conteo", title="Distribución de Compras por Categoría", color="categoria"))
         
         # Gráfico circular: Proporción de compras por subcategoría
-        if "subcategoria" in df.columns:
-            st.plotly_chart(px.pie(df, names="subcategoria", title="Proporción de Compras por Subcategoría"))
+        por_subcategoria = sum_counts(df, ["subcategoria"])
+        st.plotly_chart(px.pie(por_subcategoria, names="subcategoria", values="conteo", title="Proporción de Compras por Subcategoría"))
 
     except Exception as e:
         st.error(f"Error al cargar datos para el Dashboard: {e}")
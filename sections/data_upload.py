@@ -1,55 +1,9 @@
 import streamlit as st
 import pandas as pd
-from supabase_api import insert_data_into_supabase, fetch_data_from_supabase
-from supabase import create_client
-from dotenv import load_dotenv
-import os
-
-# Configurar conexión a Supabase
-load_dotenv()
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-def mapear_campos(df, supabase):
-    """
-    Mapea los valores de campos relacionados (`codigo_producto`, `ruc_proveedor`, `centro_de_coste`)
-    a sus respectivas claves foráneas en la tabla `ordencompra`.
-    """
-    try:
-        # Recuperar datos de las tablas relacionadas
-        productos = supabase.table("producto").select("id, codigo_producto").execute().data
-        proveedores = supabase.table("proveedor").select("id, ruc_proveedor").execute().data
-        centros = supabase.table("centrodecoste").select("id, centro_de_coste").execute().data
-
-        # Crear diccionarios de mapeo
-        producto_map = {p["codigo_producto"]: p["id"] for p in productos}
-        proveedor_map = {p["ruc_proveedor"]: p["id"] for p in proveedores}
-        centro_map = {c["centro_de_coste"]: c["id"] for c in centros}
-
-        # Mapear los campos en el DataFrame
-        df["producto_id"] = df["codigo_producto"].map(producto_map)
-        df["proveedor_id"] = df["ruc_proveedor"].map(proveedor_map)
-        df["centrodecoste_id"] = df["centro_de_coste"].map(centro_map)
-
-        # Verificar si hay valores no mapeados
-        errores = []
-        if df["producto_id"].isnull().any():
-            errores.append("Algunos `codigo_producto` no fueron encontrados en la tabla `producto`.")
-        if df["proveedor_id"].isnull().any():
-            errores.append("Algunos `ruc_proveedor` no fueron encontrados en la tabla `proveedor`.")
-        if df["centrodecoste_id"].isnull().any():
-            errores.append("Algunos `centro_de_coste` no fueron encontrados en la tabla `centrodecoste`.")
-
-        if errores:
-            st.warning("\n".join(errores))
-        else:
-            st.success("Todos los campos han sido mapeados correctamente.")
-        
-        return df
-    except Exception as e:
-        st.error(f"Error durante el mapeo de campos: {e}")
-        return df
+from snapshot_sync import request_sync
+from data_quality import profile_snapshot
+from ingestion import ingest_file, missing_columns, preview_file
+from sections.table_view import show_table
 
 def subir_y_mapear_datos():
     """
@@ -61,85 +15,66 @@ def subir_y_mapear_datos():
     uploaded_file = st.file_uploader("Sube un archivo CSV o Excel para cargar en la tabla", type=["csv", "xlsx"])
 
     if uploaded_file:
-        # Leer el archivo
-        if uploaded_file.name.endswith(".csv"):
-            df = pd.read_csv(uploaded_file)
-        else:
-            df = pd.read_excel(uploaded_file)
+        # Solo se lee el primer bloque para la vista previa; el archivo se procesa por bloques al insertar
+        try:
+            vista = preview_file(uploaded_file, uploaded_file.name)
+        except Exception as e:
+            st.error(f"No se pudo leer el archivo: {e}")
+            return
 
         st.write("Datos cargados (vista previa):")
-        st.dataframe(df.head())
+        st.dataframe(vista)
 
         # Validación de columnas requeridas
-        required_columns = {
-            "codigo_de_compra", "usuario_comprador", "tipo_compra", "cantidad",
-            "impuestos", "estado", "fecha_pedido_compra", "fecha_creacion_compra",
-            "fecha_aprobacion_compra", "fecha_recepcion", "producto_id",
-            "proveedor_id", "centrodecoste_id"
-        }
-
-        if not required_columns.issubset(df.columns):
-            st.error(f"El archivo no contiene las columnas necesarias: {', '.join(required_columns)}")
-        else:
-            st.success("La plantilla contiene las columnas necesarias.")
-            
-            # Validación de tipos de datos antes de la inserción
-            try:
-                # Validar y convertir tipos de datos explícitamente
-                df["cantidad"] = pd.to_numeric(df["cantidad"], errors="raise")
-                df["impuestos"] = pd.to_numeric(df["impuestos"], errors="raise")
-                df["estado"] = pd.to_numeric(df["estado"], errors="raise")
-                df["fecha_pedido_compra"] = pd.to_datetime(df["fecha_pedido_compra"], errors="raise")
-                df["fecha_creacion_compra"] = pd.to_datetime(df["fecha_creacion_compra"], errors="raise")
-                df["fecha_aprobacion_compra"] = pd.to_datetime(df["fecha_aprobacion_compra"], errors="raise")
-                df["fecha_recepcion"] = pd.to_datetime(df["fecha_recepcion"], errors="raise")
-
-                st.success("Los datos cumplen con los tipos requeridos.")
-
-            except Exception as e:
-                st.error(f"Error en la validación de tipos de datos: {e}")
-                return
+        faltantes = missing_columns(vista.columns)
+        if faltantes:
+            st.error(f"El archivo no contiene las columnas necesarias: {', '.join(faltantes)}")
+            return
+        st.success("La plantilla contiene las columnas necesarias.")
 
-            # Mostrar datos validados
-            st.subheader("Datos validados listos para insertar en la tabla `ordencompra`:")
-            st.dataframe(df)
+        formato_fecha = st.text_input(
+            "Formato de las fechas (opcional)", placeholder="%d/%m/%Y %H:%M:%S",
+            help="Si se deja vacío, el formato se deduce del primer valor de cada columna.",
+        ) or None
+        solo_validar = st.checkbox("Solo validar (no insertar)")
 
-            # Botón para insertar en la tabla `ordencompra`
-        if st.button("Insertar Datos en `ordencompra`"):
+        # Botón para validar e insertar en la tabla `ordencompra`
+        if st.button("Validar e Insertar Datos en `ordencompra`"):
+            progreso = st.empty()
             try:
-                # Forzar conversión de las columnas clave a enteros
-                df["producto_id"] = df["producto_id"].astype(float).astype(int)
-                df["proveedor_id"] = df["proveedor_id"].astype(float).astype(int)
-                df["centrodecoste_id"] = df["centrodecoste_id"].astype(float).astype(int)
-
-                # Imprimir los valores después de la conversión en formato horizontal
-                st.write("Valores convertidos de producto_id:", ", ".join(map(str, df["producto_id"].unique())))
-                st.write("Valores convertidos de proveedor_id:", ", ".join(map(str, df["proveedor_id"].unique())))
-                st.write("Valores convertidos de centrodecoste_id:", ", ".join(map(str, df["centrodecoste_id"].unique())))
-
-
-                # Insertar datos fila por fila
-                for _, row in df.iterrows():
-                    data_to_insert = {
-                        "codigo_de_compra": row["codigo_de_compra"],
-                        "usuario_comprador": row["usuario_comprador"],
-                        "tipo_compra": row["tipo_compra"],
-                        "cantidad": row["cantidad"],
-                        "impuestos": row["impuestos"],
-                        "estado": row["estado"],
-                        "fecha_pedido_compra": str(row["fecha_pedido_compra"]),
-                        "fecha_creacion_compra": str(row["fecha_creacion_compra"]),
-                        "fecha_aprobacion_compra": str(row["fecha_aprobacion_compra"]),
-                        "fecha_recepcion": str(row["fecha_recepcion"]),
-                        "producto_id": row["producto_id"],
-                        "proveedor_id": row["proveedor_id"],
-                        "centrodecoste_id": row["centrodecoste_id"],
-                    }
-                    insert_data_into_supabase("ordencompra", data_to_insert)
-
-                st.success("Los datos fueron insertados correctamente en la tabla `ordencompra`.")
+                resultado = ingest_file(
+                    uploaded_file, uploaded_file.name, date_format=formato_fecha,
+                    insert=not solo_validar, report=lambda filas, mensaje: progreso.info(mensaje),
+                )
             except Exception as e:
-                st.error(f"Error al insertar datos: {e}")
+                st.error(f"Error al procesar el archivo: {e}")
+                return
+            if resultado["insertadas"]:
+                request_sync("ordencompra")
+
+            progreso.empty()
+            st.write(
+                f"Filas leídas: {resultado['filas']} · válidas: {resultado['validas']} · "
+                f"con errores: {resultado['filas_invalidas']} · insertadas: {resultado['insertadas']}"
+            )
+            if resultado["filas_invalidas"]:
+                st.warning(f"{resultado['filas_invalidas']} filas no cumplen con los tipos requeridos y se omitieron:")
+                show_table(resultado["errores"], key="errores_carga")
+                st.download_button(
+                    "Descargar errores (CSV)", resultado["errores"].to_csv(index=False).encode("utf-8"),
+                    file_name="errores_validacion.csv", mime="text/csv",
+                )
+            if resultado["lotes_fallidos"]:
+                filas_fallidas = resultado["validas"] - resultado["insertadas"]
+                st.warning(
+                    f"{filas_fallidas} filas válidas no se insertaron ({len(resultado['lotes_fallidos'])} lotes fallidos). "
+                    "Solo es necesario reenviar estas filas del archivo:"
+                )
+                st.dataframe(pd.DataFrame(resultado["lotes_fallidos"]))
+            elif resultado["insertadas"]:
+                st.success("Los datos válidos fueron insertados correctamente en la tabla `ordencompra`.")
+            elif solo_validar and not resultado["filas_invalidas"]:
+                st.success("Los datos cumplen con los tipos requeridos.")
 
 def preparar_datos():
     """
@@ -152,86 +87,54 @@ def preparar_datos():
         st.info("Presione el botón para analizar la preparación de datos.")
         return
 
-    # Consultar los datos subidos en la tabla `ordencompra`
+    # Analizar la copia local de la tabla `ordencompra` (el reporte se reutiliza mientras no haya datos nuevos)
     try:
-        data = fetch_data_from_supabase("ordencompra")
-        if not data:
+        reporte, en_cache = profile_snapshot("ordencompra")
+        if reporte["filas"] == 0:
             st.warning("No hay datos disponibles en la tabla `ordencompra` para preparar.")
             return
 
-        df = pd.DataFrame(data)
-        st.write("Datos cargados desde Supabase:")
-        st.dataframe(df)
+        st.caption(
+            f"{reporte['filas']} filas analizadas en {reporte['segundos']:.2f} s"
+            + (" (reporte guardado, sin datos nuevos desde el último análisis)" if en_cache else "")
+        )
 
         # Resumen de problemas detectados
         st.subheader("Resumen de Problemas Detectados")
-
-        # Verificar valores nulos
-        nulos = df.isnull().sum()
-        st.write("Valores nulos por columna:")
-        st.dataframe(nulos[nulos > 0])  # Mostrar solo columnas con valores nulos
-
-        # Verificar tipos de datos y formato
-        tipos_esperados = {
-            "codigo_de_compra": "string",
-            "usuario_comprador": "string",
-            "tipo_compra": "string",
-            "cantidad": "float",
-            "impuestos": "float",
-            "estado": "int",
-            "fecha_pedido_compra": "timestamp",
-            "fecha_creacion_compra": "timestamp",
-            "fecha_aprobacion_compra": "timestamp",
-            "fecha_recepcion": "timestamp",
-            "producto_id": "int",
-            "proveedor_id": "int",
-            "centrodecoste_id": "int"
+        totales = reporte["totales"]
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Tipos no válidos", totales["no_conformes"])
+        col2.metric("Fuera de rango", totales["fuera_de_rango"])
+        col3.metric("Códigos de compra repetidos", totales["duplicados"])
+        col4.metric("Claves sin registro relacionado", totales["huerfanos"])
+
+        # Conteo de cada comprobación por columna (solo columnas con algún problema)
+        columnas = reporte["columnas"]
+        st.write("Problemas por columna:")
+        st.dataframe(columnas[(columnas.drop(columns="tipo_esperado") > 0).any(axis=1)])
+
+        # Filas de ejemplo de cada problema
+        titulos = {
+            "nulos_requeridos": "Valores requeridos vacíos",
+            "no_conformes": "Valores que no cumplen el tipo esperado",
+            "fuera_de_rango": "Valores fuera de rango (negativos o fechas futuras)",
+            "huerfanos": "Claves foráneas sin registro en su tabla",
+            "duplicados": "Códigos de compra repetidos",
         }
-
-        errores_tipos = {}
-        for col, tipo in tipos_esperados.items():
-            if col in df.columns:
-                if tipo == "timestamp":
-                    # Validar si las fechas están en el formato correcto
-                    try:
-                        df[col] = pd.to_datetime(df[col], format='%d/%m/%Y %H:%M:%S', errors='coerce')
-                        if df[col].isnull().any():
-                            errores_tipos[col] = "Algunos valores no son fechas válidas o no cumplen con el formato 'DD/MM/YYYY HH:MM:SS'."
-                    except Exception:
-                        errores_tipos[col] = "No es un tipo timestamp o no tiene el formato correcto."
-                elif tipo == "float":
-                    if not pd.api.types.is_float_dtype(df[col]):
-                        errores_tipos[col] = "Se esperaba float, pero no tiene el formato correcto."
-                elif tipo == "int":
-                    if not pd.api.types.is_integer_dtype(df[col]):
-                        errores_tipos[col] = "Se esperaba int, pero no tiene el formato correcto."
-                elif tipo == "string":
-                    if not pd.api.types.is_string_dtype(df[col]):
-                        errores_tipos[col] = "Se esperaba string, pero no tiene el formato correcto."
-
-        if errores_tipos:
-            st.write("Errores detectados en los tipos de datos:")
-            for col, error in errores_tipos.items():
-                st.write(f"- {col}: {error}")
-
-        # Verificar valores fuera de rango
-        if "cantidad" in df.columns:
-            fuera_rango = df[df["cantidad"] < 0]
-            if not fuera_rango.empty:
-                st.write("Valores fuera de rango detectados en `cantidad` (valores negativos):")
-                st.dataframe(fuera_rango)
+        for comprobacion, muestra in reporte["muestras"].items():
+            with st.expander(f"{titulos.get(comprobacion, comprobacion)}: {totales[comprobacion]} filas (ejemplos)"):
+                st.dataframe(muestra)
 
         # Mostrar recomendaciones
         st.subheader("Recomendaciones")
-        if nulos.any() or errores_tipos or not fuera_rango.empty:
+        if reporte["problemas"]:
             st.warning("Se detectaron problemas en los datos. Corrija los errores en el archivo de importación y vuelva a cargar los datos.")
         else:
             st.success("Los datos no presentan problemas importantes.")
 
         # Mostrar un cuadro detallado con los tipos de datos esperados
         st.subheader("Tipos de Datos Esperados para `ordencompra`")
-        tipos_df = pd.DataFrame.from_dict(tipos_esperados, orient="index", columns=["Tipo Esperado"])
-        st.dataframe(tipos_df)
+        st.dataframe(columnas[["tipo_esperado"]].rename(columns={"tipo_esperado": "Tipo Esperado"}))
 
     except Exception as e:
         st.error(f"Error al cargar datos desde Supabase: {e}")
@@ -1,10 +1,21 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
-from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics import mean_absolute_error
-from supabase_api import fetch_data_from_supabase
+from supabase_api import fetch_dataframe_from_supabase
+from aggregations import fetch_monthly_demand
+from forecasting import submit_forecast, to_timestamps
+from anomaly_detection import detector, THRESHOLD
+from lead_times import lead_time_index, SUPPLIER_COLUMN, PRODUCT_COLUMN
+from sections.training_progress import wait_for_job
+from encoders import CategoricalEncoder
+from dates import parse_dates
+from chart_prep import downsample_series, sample_points, category_counts
+from sections.charts import show_chart
+from sections.table_view import show_table
+
+# Columnas por las que se agrupan las series del pronóstico de demanda
+SERIES_LEVELS = {"categoria": "Categoría", "subcategoria": "Subcategoría", "producto_tipo": "Tipo de producto"}
+FREQUENCY_LABELS = {"M": "Mensual", "W": "Semanal"}
 
 def predictions_section():
     st.header("Predicciones de Compras")
@@ -18,45 +29,34 @@ def predictions_section():
     # Cargar datos desde Supabase
     try:
         table_name = "vista_analisis_compras4"
-        data = fetch_data_from_supabase(table_name)
-        df = pd.DataFrame(data)
+        df = fetch_dataframe_from_supabase(table_name)
         st.write("Datos cargados (vista previa):")
         st.dataframe(df.head())
     except Exception as e:
         st.error(f"Error al cargar datos desde Supabase: {e}")
         return
 
-    # Codificar columnas categóricas automáticamente
-    categorical_columns = df.select_dtypes(include=['object']).columns.tolist()
+    # Las columnas categóricas se codifican solo para las características de cada modelo
+    categorical_columns = CategoricalEncoder.detect_columns(df)
     st.write(f"Columnas categóricas detectadas: {categorical_columns}")
-    df = encode_categorical_columns(df, categorical_columns)
 
     # Predicción de Demanda Futura
     if prediction_type == "Demanda Futura":
         st.subheader("Predicción de Demanda Futura")
-        features = ["categoria", "tipo_compra", "cantidad", "precio_total"]
-        if validate_features(df, features):
-            X, y = prepare_regression_data(df, features, target="cantidad")
-            predict_future_demand(X, y)
+        if validate_features(df, ["fecha_pedido_compra", "cantidad"]):
+            predict_future_demand(df)
 
     # Predicción de Tiempos de Entrega
     elif prediction_type == "Tiempos de Entrega":
         st.subheader("Predicción de Tiempos de Entrega")
-        features = ["nombre_proveedor", "producto_tipo", "cantidad"]
-        if validate_features(df, features):
-            X, y = prepare_regression_data(df, features, target="tiempo_entrega")
-            predict_delivery_times(X, y)
+        if validate_features(df, [SUPPLIER_COLUMN, PRODUCT_COLUMN]):
+            predict_delivery_times(df)
 
     # Clasificación de Compras Atípicas
     elif prediction_type == "Compras Atípicas":
         st.subheader("Clasificación de Compras Atípicas")
-        features = ["precio_total", "cantidad", "categoria"]
-        if validate_features(df, features):
-            try:
-                X, y = prepare_classification_data(df, features, target="atipica")
-                classify_purchases(X, y)
-            except Exception as e:
-                st.error(f"Error durante la preparación de los datos o el entrenamiento: {e}")
+        if validate_features(df, ["precio_total", "cantidad"]):
+            show_unusual_purchases(df)
 
     # Evolución Temporal de Demandas
     elif prediction_type == "Evolución Temporal de Demandas":
@@ -72,12 +72,7 @@ def encode_categorical_columns(df, categorical_columns):
     :param categorical_columns: Lista de columnas categóricas a codificar.
     :return: DataFrame con las columnas categóricas codificadas.
     """
-    df = df.copy()
-    for col in categorical_columns:
-        if col in df.columns:
-            le = LabelEncoder()
-            df[col] = le.fit_transform(df[col].astype(str))
-    return df
+    return CategoricalEncoder().fit_transform(df, categorical_columns)
 
 # Validar características
 def validate_features(df, features):
@@ -87,96 +82,128 @@ def validate_features(df, features):
         return False
     return True
 
-# Preprocesar datos para regresión
-def prepare_regression_data(df, features, target):
-    X = df[features]
-    y = df[target]
-    return X, y
-
 # Predecir demanda futura
-def predict_future_demand(X, y):
+def predict_future_demand(df):
+    """
+    Pronóstico fuera de muestra de la cantidad pedida por serie (categoría, subcategoría o tipo de
+    producto). Cada serie tiene su propio modelo, que solo se reentrena cuando recibe órdenes nuevas.
+    """
     try:
-        model = RandomForestRegressor(random_state=42)
-        model.fit(X, y)
-        st.success("Modelo entrenado correctamente para la predicción de demanda futura.")
-        st.write(f"MAE: {mean_absolute_error(y, model.predict(X))}")
-        st.plotly_chart(px.line(x=range(len(y)), y=model.predict(X), title="Demanda Futura"))
+        niveles = [col for col in SERIES_LEVELS if col in df.columns]
+        if not niveles:
+            st.error(f"Se necesita alguna de estas columnas para agrupar las series: {', '.join(SERIES_LEVELS)}")
+            return
+        nivel_col, frecuencia_col, horizonte_col = st.columns(3)
+        nivel = nivel_col.selectbox("Serie por:", niveles, format_func=SERIES_LEVELS.get)
+        frecuencia = frecuencia_col.radio("Periodo:", list(FREQUENCY_LABELS), format_func=FREQUENCY_LABELS.get, horizontal=True)
+        horizonte = horizonte_col.slider("Periodos a pronosticar:", 1, 12, 6)
+
+        panel, job = submit_forecast(df, nivel, frecuencia, horizonte, "Pronóstico de demanda por serie")
+        resultado = wait_for_job(job, "Los modelos de cada serie se están entrenando en segundo plano. Puede seguir usando la aplicación.")
+        if resultado is None:
+            return
+        resumen = resultado["summary"]
+        if resumen.empty:
+            st.warning("No hay órdenes con fecha de pedido para construir las series.")
+            return
+        reentrenadas = int(resumen["reentrenada"].sum())
+        st.success(
+            f"{len(resumen)} series pronosticadas; {reentrenadas} reentrenadas por tener datos nuevos."
+            if reentrenadas else f"{len(resumen)} series recuperadas de la caché (sin datos nuevos)."
+        )
+        st.dataframe(resumen.assign(ultimo_periodo=to_timestamps(resumen["ultimo_periodo"], frecuencia)).rename(columns={"mae": "mae_fuera_de_muestra"}))
+
+        serie = st.selectbox("Serie a graficar:", sorted(resumen["serie"]))
+        historia = panel[panel["serie"] == serie].assign(tipo="Histórico")
+        pronostico = resultado["forecast"]
+        pronostico = pronostico[pronostico["serie"] == serie].assign(tipo="Pronóstico")
+        grafico = pd.concat([historia, pronostico], ignore_index=True)
+        grafico["periodo"] = to_timestamps(grafico["periodo"], frecuencia)
+        show_chart(px.line(grafico, x="periodo", y="cantidad", color="tipo", title=f"Demanda Futura: {serie}"))
     except Exception as e:
         st.error(f"Error en la predicción de demanda futura: {e}")
 
 # Predecir tiempos de entrega
-def predict_delivery_times(X, y):
+def predict_delivery_times(df):
+    """
+    Tiempos de entrega a partir del índice precalculado por proveedor y producto (`lead_times`):
+    el índice solo se reconstruye cuando cambian las órdenes y las predicciones lo consultan.
+    """
     try:
-        model = RandomForestRegressor(random_state=42)
-        model.fit(X, y)
-        st.success("Modelo entrenado correctamente para la predicción de tiempos de entrega.")
-        st.write(f"MAE: {mean_absolute_error(y, model.predict(X))}")
-        st.plotly_chart(px.scatter(x=y, y=model.predict(X), title="Tiempos de Entrega"))
+        indice, reconstruido = lead_time_index.refresh(df)
+        if reconstruido:
+            st.success("Índice de tiempos de entrega actualizado con las órdenes nuevas.")
+        evaluacion = indice.evaluation
+        if evaluacion is not None:
+            st.write(
+                f"MAE fuera de muestra ({evaluacion['ordenes_prueba']:,} órdenes más recientes): "
+                f"{evaluacion['mae']:.2f} días (mediana general: {evaluacion['mae_referencia']:.2f} días)."
+            )
+            puntos, stats = sample_points(evaluacion["detalle"].dropna())
+            show_chart(px.scatter(puntos, x="real", y="prediccion", title="Tiempos de Entrega"), stats)
+
+        st.write("Estadísticas por proveedor y producto (días):")
+        show_table(indice.table(), "tiempos_entrega", version=indice.fingerprint)
+
+        st.write("Predicción para nuevas órdenes:")
+        proveedor_col, producto_col = st.columns(2)
+        proveedores = proveedor_col.multiselect("Proveedores:", sorted(indice.table("proveedor")[SUPPLIER_COLUMN].astype(str)))
+        productos = producto_col.multiselect("Tipos de producto:", sorted(indice.table("producto")[PRODUCT_COLUMN].astype(str)))
+        if proveedores and productos:
+            nuevas = pd.MultiIndex.from_product([proveedores, productos], names=[SUPPLIER_COLUMN, PRODUCT_COLUMN]).to_frame(index=False)
+            st.dataframe(nuevas.join(indice.predict(nuevas)))
     except Exception as e:
         st.error(f"Error en la predicción de tiempos de entrega: {e}")
 
-# Clasificar compras atípicas
-def classify_purchases(X, y):
+# Compras atípicas
+def show_unusual_purchases(df):
     """
-    Entrena un modelo para clasificar compras atípicas.
+    Marca las compras atípicas consultando las puntuaciones guardadas por `anomaly_detection`;
+    solo las órdenes que aún no tienen puntuación se procesan (y actualizan las estadísticas).
+    Tras corregir órdenes ya puntuadas se puede recalcular todo con el botón de la sección.
     """
     try:
-        model = RandomForestClassifier(random_state=42)
-        model.fit(X, y)
-        st.success("Modelo entrenado correctamente para la clasificación de compras atípicas.")
-        st.write(f"Precisión: {model.score(X, y)}")
-        st.plotly_chart(px.bar(x=range(len(y)), y=model.predict(X), title="Clasificación de Compras Atípicas"))
+        # Las órdenes modificadas o borradas después de puntuarlas no se actualizan solas
+        if st.button("Recalcular con los datos actuales", help="Descarta las estadísticas y puntuaciones guardadas "
+                     "y vuelve a puntuar todas las órdenes (por ejemplo, tras corregir o borrar órdenes)."):
+            detector.reset()
+        nuevas = detector.process(df)
+        if nuevas:
+            st.info(f"Se puntuaron {nuevas:,} órdenes nuevas y se actualizaron las estadísticas de sus grupos.")
+        umbral = st.slider("Puntuación mínima para considerar una compra atípica:", 2.0, 8.0, float(THRESHOLD), 0.5,
+                           help="Desviación respecto de la mediana de su categoría y de su proveedor, en MAD.")
+        marcas = detector.lookup(df)
+        atipicas = marcas["puntuacion"] > umbral
+        st.write(f"Compras atípicas: {int(atipicas.sum()):,} de {len(df):,} ({atipicas.mean():.2%}).")
+        conteos, stats = category_counts(atipicas.astype(int).to_numpy(), "atipica")
+        show_chart(px.bar(conteos, x="atipica", y="conteo", title="Clasificación de Compras Atípicas"), stats)
+        detalle = df[atipicas.to_numpy()].join(marcas.loc[atipicas, ["puntuacion", "motivo"]])
+        show_table(detalle.sort_values("puntuacion", ascending=False), "compras_atipicas")
     except Exception as e:
         st.error(f"Error en la clasificación de compras atípicas: {e}")
+
 # Evolución temporal
 def temporal_demand_evolution(df):
-    try:
-        df["fecha_pedido_compra"] = pd.to_datetime(df["fecha_pedido_compra"])
-        temporal_df = df.groupby("fecha_pedido_compra")["cantidad"].sum().reset_index()
-        st.plotly_chart(px.line(temporal_df, x="fecha_pedido_compra", y="cantidad", title="Evolución Temporal"))
-    except Exception as e:
-        st.error(f"Error en la evolución temporal de demandas: {e}")
-
-
-# Función auxiliar: Preprocesar datos para clasificación
-def prepare_classification_data(df, features, target):
     """
-    Prepara los datos para un modelo de clasificación.
+    Cantidad pedida por mes, leída de la tabla de resumen `resumen_demanda_mensual` (su tamaño no
+    depende de la historia). Si el resumen aún no existe se agrega la vista cargada por fecha.
     """
     try:
-        # Verificar si la columna objetivo existe
-        if target not in df.columns:
-            st.warning(f"La columna objetivo '{target}' no está presente. Generando columna basada en reglas...")
-            # Generar columna objetivo basada en reglas, por ejemplo:
-            df[target] = (df["precio_total"] > df["precio_total"].quantile(0.95)).astype(int)
-
-        # Validar que todas las características estén presentes
-        missing_features = [feature for feature in features if feature not in df.columns]
-        if missing_features:
-            raise ValueError(f"Las siguientes características no están presentes: {', '.join(missing_features)}")
-
-        # Verificar valores nulos
-        if df[features].isnull().any().any() or df[target].isnull().any():
-            raise ValueError("Los datos contienen valores nulos. Limpia los datos antes de entrenar.")
-
-        # Separar características y objetivo
-        X = df[features]
-        y = df[target]
-        return X, y
-
+        opciones = sorted(df["categoria"].dropna().unique()) if "categoria" in df.columns else []
+        categorias = st.multiselect("Categorías (vacío = todas):", opciones)
+        try:
+            mensual = fetch_monthly_demand(categorias)
+        except Exception:
+            mensual = pd.DataFrame()
+        if not mensual.empty:
+            show_chart(px.line(mensual, x="mes", y="cantidad", title="Evolución Temporal (mensual)"))
+            return
+
+        if categorias:
+            df = df[df["categoria"].isin(categorias)]
+        fechas = parse_dates(df["fecha_pedido_compra"])
+        temporal_df = df["cantidad"].groupby(fechas).sum().reset_index()
+        temporal_df, stats = downsample_series(temporal_df, "fecha_pedido_compra", "cantidad")
+        show_chart(px.line(temporal_df, x="fecha_pedido_compra", y="cantidad", title="Evolución Temporal"), stats)
     except Exception as e:
-        raise ValueError(f"Error al preparar los datos de clasificación: {e}")
-def encode_categorical_columns(df, categorical_columns):
-    """
-    Codifica las columnas categóricas en un DataFrame.
-    :param df: DataFrame a procesar.
-    :param categorical_columns: Lista de columnas categóricas a codificar.
-    :return: DataFrame con las columnas categóricas codificadas.
-    """
-    df = df.copy()
-    for col in categorical_columns:
-        if col in df.columns:
-            le = LabelEncoder()
-            df[col] = le.fit_transform(df[col].astype(str))
-    return df
-
+        st.error(f"Error en la evolución temporal de demandas: {e}")
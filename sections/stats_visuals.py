@@ -1,7 +1,42 @@
+import threading
+from collections import OrderedDict
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from supabase_api import fetch_data_from_supabase
+from snapshot_sync import load_snapshot, snapshot_version
+from dates import parse_dates
+from aggregations import fetch_order_summary, sum_counts
+from sections.table_view import show_table
+
+# Resúmenes descriptivos ya calculados: (versión de la copia local, filtros) -> describe()
+MAX_CACHED_SUMMARIES = 16
+_summaries = OrderedDict()
+_summaries_lock = threading.Lock()
+
+def describe_filtered(df, version, estados, tipos, rango_fechas):
+    """
+    Filtra las órdenes y calcula sus estadísticas descriptivas. Se calculan una vez por versión
+    de la copia local y combinación de filtros, no en cada ejecución de la página.
+    """
+    clave = (version, tuple(estados), tuple(tipos), tuple(rango_fechas or ()))
+    with _summaries_lock:
+        if version is not None and clave in _summaries:
+            _summaries.move_to_end(clave)
+            return _summaries[clave]
+    if estados:
+        df = df[df["estado"].isin(estados)]
+    if tipos:
+        df = df[df["tipo_compra"].isin(tipos)]
+    if rango_fechas and len(rango_fechas) == 2:
+        fechas = parse_dates(df["fecha_creacion_compra"])
+        df = df[(fechas >= pd.Timestamp(rango_fechas[0])) & (fechas < pd.Timestamp(rango_fechas[1]) + pd.Timedelta(days=1))]
+    resumen = df.describe()
+    if version is not None:
+        with _summaries_lock:
+            _summaries[clave] = resumen
+            while len(_summaries) > MAX_CACHED_SUMMARIES:
+                _summaries.popitem(last=False)
+    return resumen
 
 def stats_visuals_section():
     """
@@ -9,55 +44,53 @@ def stats_visuals_section():
     """
     st.header("Estadísticas y Visualización")
 
-    # Consultar datos desde Supabase
+    # Consultar datos desde la copia local sincronizada con Supabase
     try:
-        data = fetch_data_from_supabase("ordencompra")
-        if not data:
+        # La página solo lee la copia: se usa la compartida en memoria, sin copiarla
+        df = load_snapshot("ordencompra", copy=False)
+        if df.empty:
             st.warning("No hay datos disponibles en la tabla `ordencompra`.")
             return
+        version = snapshot_version("ordencompra")
 
-        df = pd.DataFrame(data)
         st.write("Datos cargados desde Supabase:")
-        st.dataframe(df)
+        show_table(df, key="stats_ordencompra", version=version)
 
         # Filtros
         st.subheader("Filtros")
         estados = st.multiselect("Seleccione Estados:", options=df["estado"].unique(), default=df["estado"].unique())
         tipos = st.multiselect("Seleccione Tipos de Compra:", options=df["tipo_compra"].unique(), default=df["tipo_compra"].unique())
         rango_fechas = st.date_input("Seleccione el Rango de Fechas:", [])
-        
-        # Aplicar filtros
-        if estados:
-            df = df[df["estado"].isin(estados)]
-        if tipos:
-            df = df[df["tipo_compra"].isin(tipos)]
-        if rango_fechas and len(rango_fechas) == 2:
-            df = df[(df["fecha_creacion_compra"] >= str(rango_fechas[0])) & (df["fecha_creacion_compra"] <= str(rango_fechas[1]))]
 
         # Estadísticas Descriptivas
         st.subheader("Estadísticas Descriptivas")
         st.write("Resumen de los datos filtrados:")
-        st.write(df.describe())
+        st.write(describe_filtered(df, version, estados, tipos, rango_fechas))
 
-        # Gráficos
+        # Gráficos (conteos agregados en Supabase con los mismos filtros)
         st.subheader("Visualización de Datos")
+        desde, hasta = None, None
+        if rango_fechas and len(rango_fechas) == 2:
+            desde, hasta = rango_fechas[0], pd.Timestamp(rango_fechas[1]) + pd.Timedelta(days=1)
+        resumen = fetch_order_summary(desde, hasta)
+        if estados:
+            resumen = resumen[resumen["estado"].isin(estados)]
+        if tipos:
+            resumen = resumen[resumen["tipo_compra"].isin(tipos)]
 
         # Distribución de Estados
-        estado_count = df["estado"].value_counts().reset_index()
-        estado_count.columns = ["estado", "conteo"]
+        estado_count = sum_counts(resumen, ["estado"])
         fig_estado = px.bar(estado_count, x="estado", y="conteo", title="Distribución de Órdenes por Estado")
         st.plotly_chart(fig_estado)
 
         # Evolución Temporal de Órdenes
-        df["fecha_creacion_compra"] = pd.to_datetime(df["fecha_creacion_compra"], errors="coerce")
-        df_time = df.groupby(df["fecha_creacion_compra"].dt.to_period("M")).size().reset_index(name="conteo")
-        df_time["fecha_creacion_compra"] = df_time["fecha_creacion_compra"].astype(str)
+        df_time = sum_counts(resumen, ["mes"]).sort_values("mes")
+        df_time["fecha_creacion_compra"] = df_time["mes"].dt.strftime("%Y-%m")
         fig_tiempo = px.line(df_time, x="fecha_creacion_compra", y="conteo", title="Evolución Temporal de Órdenes")
         st.plotly_chart(fig_tiempo)
 
         # Distribución por Tipo de Compra
-        tipo_count = df["tipo_compra"].value_counts().reset_index()
-        tipo_count.columns = ["tipo_compra", "conteo"]
+        tipo_count = sum_counts(resumen, ["tipo_compra"])
         fig_tipo = px.pie(tipo_count, names="tipo_compra", values="conteo", title="Distribución por Tipo de Compra")
         st.plotly_chart(fig_tipo)
 
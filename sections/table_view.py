@@ -0,0 +1,108 @@
+import streamlit as st
+from table_paging import PAGE_SIZE, page_view
+from supabase_api import fetch_page_from_supabase
+
+PAGE_SIZES = sorted({PAGE_SIZE, 100, 250, 500, 1000})
+
+
+FILTER_HELP = "Texto contenido; en números un valor o un rango `min..max`; en fechas `2024`, `2024-03` o `2024-03-15`."
+
+
+def _controls(key, sort_columns, filter_columns, page_size, filter_help=FILTER_HELP):
+    """
+    Controles de filtro, orden y tamaño de página (sus valores se guardan en `st.session_state`).
+    :return: Diccionario con la columna y el texto del filtro, la columna y el sentido del orden y el tamaño de página.
+    """
+    filtro_col, filtro_txt, orden_col, orden_dir, tamano = st.columns([2, 3, 2, 1, 1])
+    columna_filtro = filtro_col.selectbox("Filtrar por", ["(ninguna)", *filter_columns], key=f"{key}_filtro_col")
+    texto = filtro_txt.text_input(
+        "Valor", key=f"{key}_filtro_txt", disabled=columna_filtro == "(ninguna)",
+        help=filter_help,
+    )
+    columna_orden = orden_col.selectbox("Ordenar por", ["(sin orden)", *sort_columns], key=f"{key}_orden_col")
+    descendente = orden_dir.selectbox("Sentido", ["Asc", "Desc"], key=f"{key}_orden_dir") == "Desc"
+    tamano_pagina = tamano.selectbox("Filas", PAGE_SIZES, index=PAGE_SIZES.index(page_size) if page_size in PAGE_SIZES else 0, key=f"{key}_tamano")
+    return {
+        "filter_column": None if columna_filtro == "(ninguna)" else columna_filtro,
+        "filter_text": texto.strip(),
+        "sort": None if columna_orden == "(sin orden)" else columna_orden,
+        "ascending": not descendente,
+        "page_size": tamano_pagina,
+    }
+
+def _pager(key, total, page_size):
+    """
+    Selector de página; vuelve a la primera página cuando cambia el total de filas (nuevo filtro)
+    o el tamaño de página.
+    :return: Número de página elegido.
+    """
+    paginas = max(1, -(-total // page_size))
+    if st.session_state.get(f"{key}_total") != (total, page_size):
+        st.session_state[f"{key}_total"] = (total, page_size)
+        st.session_state[f"{key}_pagina"] = 1
+    return st.number_input(f"Página (de {paginas:,})", min_value=1, max_value=paginas, step=1, key=f"{key}_pagina")
+
+def _caption(pagina, page_size, total, filas):
+    inicio = (pagina - 1) * page_size
+    st.caption(f"Filas {inicio + 1 if filas else 0:,}–{inicio + filas:,} de {total:,}.")
+
+def show_table(df, key, version=None, page_size=PAGE_SIZE):
+    """
+    Muestra un DataFrame grande por páginas: al navegador solo se envía la página visible y el
+    número de filas. El orden y el filtro se aplican en el servidor sobre la tabla completa.
+    :param df: DataFrame en memoria (por ejemplo la copia local de una tabla).
+    :param key: Identificador único de la tabla en la página (para los controles).
+    :param version: Versión de los datos (por ejemplo `snapshot_version`) con la que se
+                    reutilizan el orden y el filtro entre ejecuciones; None = sin reutilizar.
+    :param page_size: Filas por página; las tablas más pequeñas se muestran completas.
+    """
+    if len(df) <= page_size:
+        st.dataframe(df)
+        return
+    columnas = list(df.columns)
+    opciones = _controls(key, columnas, columnas, page_size)
+    tamano = opciones.pop("page_size")
+    posiciones = page_view.positions(df, version=version, table=key, **opciones)
+    total = len(df) if posiciones is None else len(posiciones)
+    visible, total, pagina = page_view.slice(df, posiciones, _pager(key, total, tamano), tamano)
+    st.dataframe(visible)
+    _caption(pagina, tamano, total, len(visible))
+
+def show_remote_table(table, key, columns, text_columns=None, select=None, order="id", page_size=PAGE_SIZE):
+    """
+    Muestra una tabla de Supabase por páginas, pidiendo a la API solo la página visible y el
+    total de filas (`fetch_page_from_supabase`); el orden y el filtro los aplica PostgREST.
+    :param table: Tabla o vista a consultar.
+    :param key: Identificador único de la tabla en la página.
+    :param columns: Columnas por las que se puede ordenar.
+    :param text_columns: Columnas de texto por las que se puede filtrar (`ilike`); None = `columns`.
+    :param select: Columnas a mostrar (None = todas).
+    :param order: Orden por defecto (una columna única hace que las páginas sean estables).
+    """
+    opciones = _controls(
+        key, columns, text_columns if text_columns is not None else columns, page_size,
+        filter_help="Filas cuyo valor contiene el texto (sin distinguir mayúsculas).",
+    )
+    tamano = opciones["page_size"]
+    filtros = []
+    if opciones["filter_column"] and opciones["filter_text"]:
+        filtros.append((opciones["filter_column"], "ilike", f"*{opciones['filter_text']}*"))
+    orden = order
+    if opciones["sort"]:
+        orden = f"{opciones['sort']}.{'asc' if opciones['ascending'] else 'desc'}"
+        if order and opciones["sort"] != order:
+            orden = f"{orden},{order}"
+
+    # Con otro filtro, orden o tamaño se vuelve a la primera página antes de consultar
+    consulta = (repr(filtros), orden, tamano)
+    if st.session_state.get(f"{key}_consulta") != consulta:
+        st.session_state[f"{key}_consulta"] = consulta
+        st.session_state[f"{key}_pagina"] = 1
+    # El total llega con la página actual; solo si cambió (datos nuevos) se pide otra página
+    pagina = st.session_state[f"{key}_pagina"]
+    visible, total = fetch_page_from_supabase(table, (pagina - 1) * tamano, tamano, select, filtros, orden)
+    elegida = _pager(key, total, tamano)
+    if elegida != pagina:
+        visible, total = fetch_page_from_supabase(table, (elegida - 1) * tamano, tamano, select, filtros, orden)
+    st.dataframe(visible)
+    _caption(elegida, tamano, total, len(visible))
@@ -5,24 +5,59 @@ from sklearn.cluster import KMeans
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
-from supabase_api import fetch_data_from_supabase
+from supabase_api import fetch_dataframe_from_supabase, fetch_pages_from_supabase
+from sections.training_progress import wait_for_training, wait_for_job
+from model_tuning import submit_tuning
+from encoders import CategoricalEncoder
+from streaming_training import KEY_COLUMN, MAX_CLASSES, submit_streaming_training
+from training_jobs import scheduler
+from model_registry import registry, data_fingerprint
+from chart_prep import sample_points
+from sections.charts import show_chart
+from sections.table_view import show_table
+
+# Rejillas de hiperparámetros para el modo de ajuste
+CLASSIFICATION_GRID = {
+    "n_estimators": [50, 100, 200, 400],
+    "max_depth": [None, 10, 20, 40],
+    "min_samples_leaf": [1, 2, 5, 10],
+    "max_features": ["sqrt", "log2", None],
+}
+SEGMENTATION_GRID = {
+    "n_clusters": list(range(2, 11)),
+    "init": ["k-means++", "random"],
+}
 
 def train_model_section():
     st.header("Entrenamiento de Modelos")
 
+    table_name = "vista_analisis_compras4"
+    modo = st.radio(
+        "Modo de entrenamiento:",
+        ["En memoria", "Por bloques (tablas grandes)"],
+        horizontal=True,
+        help="El modo por bloques recorre la vista sin cargarla completa en memoria.",
+    )
+
     # Cargar datos desde Supabase
     try:
-        table_name = "vista_analisis_compras4"
-        data = fetch_data_from_supabase(table_name)
-        df = pd.DataFrame(data)
+        if modo == "En memoria":
+            df = fetch_dataframe_from_supabase(table_name)
+        else:
+            df = pd.DataFrame(next(fetch_pages_from_supabase(table_name, page_size=100), []))
         st.write("Datos cargados (vista previa):")
         st.dataframe(df.head())
     except Exception as e:
         st.error(f"Error al cargar datos desde Supabase: {e}")
         return
 
+    if modo != "En memoria":
+        streaming_training_section(table_name, df)
+        return
+
     # Seleccionar Tipo de Modelo
     tipo_modelo = st.radio("Seleccione el tipo de modelo:", ["Clasificación", "Segmentación"])
+    ajuste = tuning_options()
 
     if tipo_modelo == "Clasificación":
         st.subheader("Clasificación")
@@ -39,16 +74,34 @@ def train_model_section():
             st.warning("Seleccione características y una variable objetivo para continuar.")
             return
 
+        # Codificadores guardados con el modelo registrado, si se entrenó con estos mismos datos
+        modelo = RandomForestClassifier(random_state=42, n_jobs=-1)
+        huella, encoder, target_encoder = registered_encoders(modelo, df, features, target)
+
         # Preprocesar datos
-        X = preprocess_data(df, features)
-        y = df[target].astype("category").cat.codes
+        X, encoder = preprocess_data(df, features, encoder)
+        target_encoder = target_encoder or CategoricalEncoder().fit(df, [target])
+        y = target_encoder.transform(df[[target]])[target].rename(target)
 
         # Dividir en conjunto de entrenamiento y prueba
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-        # Entrenar modelo
-        model = RandomForestClassifier(random_state=42)
-        model.fit(X_train, y_train)
+        # Entrenar modelo (con los mejores hiperparámetros si se activó el ajuste)
+        if ajuste:
+            mejores = run_tuning(modelo, X_train, y_train, CLASSIFICATION_GRID, ajuste)
+            if mejores is None:
+                return
+            modelo.set_params(**mejores)
+        resultado = wait_for_training(
+            modelo, X_train, y_train, "Clasificación",
+            extras={"encoder": encoder, "target_encoder": target_encoder, "source_fingerprint": huella},
+        )
+        if resultado is None:
+            return
+        entry, trained = resultado
+        model = entry["model"]
+        if not trained:
+            st.info("Modelo recuperado del registro: los datos y parámetros no han cambiado.")
 
         # Predicciones y métricas
         y_pred = model.predict(X_test)
@@ -65,34 +118,156 @@ def train_model_section():
             options=df.columns,
             default=["cantidad", "precio_total"]
         )
-        n_clusters = st.slider("Número de Clusters:", min_value=2, max_value=10, value=3)
+        n_clusters = st.slider("Número de Clusters:", min_value=2, max_value=10, value=3, disabled=bool(ajuste))
 
         if not features:
             st.warning("Seleccione al menos una característica para continuar.")
             return
 
-        # Preprocesar datos
-        X = preprocess_data(df, features)
+        # Preprocesar datos (con el codificador del modelo registrado si se entrenó con estos datos)
+        modelo = KMeans(n_clusters=n_clusters, random_state=42)
+        huella, encoder, _ = registered_encoders(modelo, df, features)
+        X, encoder = preprocess_data(df, features, encoder)
 
-        # Entrenar modelo
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-        clusters = kmeans.fit_predict(X)
+        # Entrenar modelo (el ajuste elige también el número de clusters)
+        if ajuste:
+            mejores = run_tuning(modelo, X, None, SEGMENTATION_GRID, ajuste)
+            if mejores is None:
+                return
+            modelo.set_params(**mejores)
+        resultado = wait_for_training(modelo, X, description="Segmentación", extras={"encoder": encoder, "source_fingerprint": huella})
+        if resultado is None:
+            return
+        entry, trained = resultado
+        clusters = entry["model"].predict(X)
+        if not trained:
+            st.info("Modelo recuperado del registro: los datos y parámetros no han cambiado.")
 
         # Agregar clusters al DataFrame
         df["Cluster"] = clusters
         st.write("Segmentación completada:")
-        st.dataframe(df)
+        show_table(df, key="segmentacion")
 
         # Visualización
         if len(features) >= 2:
-            fig = px.scatter(df, x=features[0], y=features[1], color="Cluster", title="Segmentación de Compras")
+            puntos, stats = sample_points(df[[features[0], features[1], "Cluster"]])
+            fig = px.scatter(puntos, x=features[0], y=features[1], color="Cluster", title="Segmentación de Compras")
+            show_chart(fig, stats)
+
+def streaming_training_section(table_name, preview):
+    """
+    Entrenamiento por bloques: MiniBatchKMeans para segmentación y muestra estratificada de
+    tamaño fijo para clasificación. La memoria usada no depende del tamaño de la vista.
+    """
+    tipo_modelo = st.radio("Seleccione el tipo de modelo:", ["Clasificación", "Segmentación"], key="tipo_modelo_bloques")
+
+    if tipo_modelo == "Clasificación":
+        features = st.multiselect(
+            "Seleccione las características para la clasificación:",
+            options=preview.columns,
+            default=[c for c in ["cantidad", "precio_total", "centro_de_coste"] if c in preview.columns],
+        )
+        target = st.selectbox("Seleccione la variable objetivo:", options=preview.columns)
+        per_class = st.number_input("Filas de muestra por clase:", min_value=1000, max_value=200_000, value=20_000, step=1000)
+        if not features or not target:
+            st.warning("Seleccione características y una variable objetivo para continuar.")
+            return
+        if preview[target].nunique() > MAX_CLASSES:
+            st.warning(f"La variable objetivo tiene más de {MAX_CLASSES} valores distintos; seleccione una columna categórica.")
+            return
+        kind = "classification"
+        kwargs = {"table": table_name, "features": features, "target": target, "per_class": int(per_class), "key_column": KEY_COLUMN}
+    else:
+        features = st.multiselect(
+            "Seleccione las características para la segmentación:",
+            options=preview.columns,
+            default=[c for c in ["cantidad", "precio_total"] if c in preview.columns],
+        )
+        n_clusters = st.slider("Número de Clusters:", min_value=2, max_value=10, value=3, key="clusters_bloques")
+        if not features:
+            st.warning("Seleccione al menos una característica para continuar.")
+            return
+        kind = "segmentation"
+        kwargs = {"table": table_name, "features": features, "n_clusters": n_clusters, "key_column": KEY_COLUMN}
+
+    job = submit_streaming_training(kind, description="Entrenamiento por bloques", **kwargs)
+    if st.button("Volver a entrenar con los datos actuales"):
+        scheduler.forget(job.key)
+        job = submit_streaming_training(kind, description="Entrenamiento por bloques", **kwargs)
+    resultado = wait_for_job(job, "La vista se está procesando por bloques en segundo plano.")
+    if resultado is None:
+        return
+
+    st.success(f"Modelo entrenado con {resultado['rows']} filas procesadas por bloques.")
+    if kind == "classification":
+        st.write(f"Filas en la muestra estratificada: {resultado['sample_rows']}")
+        conteos = pd.Series(resultado["class_counts"], name="filas")
+        conteos.index = resultado["target_encoder"].inverse_transform_column(target, conteos.index)
+        st.write("Filas por clase en la vista:")
+        st.dataframe(conteos)
+    else:
+        sample = resultado["sample"]
+        st.write("Centros de los clusters:")
+        st.dataframe(pd.DataFrame(resultado["model"].cluster_centers_, columns=features))
+        if len(features) >= 2:
+            fig = px.scatter(sample, x=features[0], y=features[1], color="Cluster", title="Segmentación de Compras (muestra)")
             st.plotly_chart(fig)
 
-def preprocess_data(df, selected_features):
+def tuning_options():
+    """
+    Opciones del modo de ajuste de hiperparámetros.
+    :return: Diccionario de opciones para `tune_model`, o None si el ajuste está desactivado.
+    """
+    if not st.checkbox("Optimizar hiperparámetros (búsqueda en paralelo)"):
+        return None
+    metodo = st.radio("Método de búsqueda:", ["Successive halving", "Aleatoria"], horizontal=True)
+    presupuesto = st.slider("Tiempo máximo de búsqueda (segundos):", min_value=10, max_value=600, value=60, step=10)
+    candidatos = st.slider("Número de combinaciones a evaluar:", min_value=4, max_value=64, value=16, step=4)
+    return {
+        "method": "halving" if metodo == "Successive halving" else "random",
+        "time_budget": presupuesto,
+        "n_candidates": candidatos,
+    }
+
+def run_tuning(modelo, X, y, grid, opciones):
+    """
+    Lanza (o recupera) la búsqueda de hiperparámetros y muestra el resultado.
+    :return: Mejores parámetros, o None si la búsqueda aún no ha terminado.
+    """
+    job = submit_tuning(modelo, X, y, grid, description="Búsqueda de hiperparámetros", **opciones)
+    resultado = wait_for_job(job, "La búsqueda de hiperparámetros se ejecuta en segundo plano.")
+    if resultado is None:
+        return None
+    st.success(
+        f"Mejores parámetros: {resultado['best_params']} (puntuación {resultado['best_score']:.4f}, "
+        f"{resultado['evaluations']} evaluaciones en {resultado['seconds']:.1f} s)"
+    )
+    if resultado["budget_exhausted"]:
+        st.warning("Se agotó el tiempo de búsqueda: se usa el mejor candidato evaluado hasta ese momento.")
+    return resultado["best_params"]
+
+def registered_encoders(modelo, df, features, target=None):
+    """
+    Codificadores guardados junto al modelo registrado para este estimador, características y
+    objetivo, si ese modelo se entrenó con estos mismos datos: la comprobación usa la huella de
+    las columnas sin codificar, así que no hace falta codificar ni dividir los datos para hacerla.
+    :return: Tupla (huella de los datos, encoder, target_encoder); los codificadores son None si
+             no hay modelo registrado para estos datos y hay que ajustar unos nuevos.
+    """
+    huella = data_fingerprint(df[features], None if target is None else df[target])
+    entry = registry.latest(modelo, features, target)
+    if entry is None or entry.get("source_fingerprint") != huella:
+        return huella, None, None
+    return huella, entry.get("encoder"), entry.get("target_encoder")
+
+def preprocess_data(df, selected_features, encoder=None):
     """
     Convierte columnas categóricas a numéricas automáticamente.
+    :param encoder: Codificador ya ajustado (por ejemplo, el guardado con un modelo). Si es None
+                    se ajusta uno nuevo con los datos recibidos.
+    :return: Tupla (características codificadas, codificador).
     """
-    X = df[selected_features].copy()
-    for col in X.select_dtypes(include=["object", "category"]).columns:
-        X[col] = X[col].astype("category").cat.codes
-    return X
+    X = df[selected_features]
+    if encoder is None:
+        encoder = CategoricalEncoder().fit(X)
+    return encoder.transform(X), encoder
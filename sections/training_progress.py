@@ -0,0 +1,34 @@
+import streamlit as st
+from training_jobs import scheduler, COMPLETADO, ERROR
+
+
+def wait_for_training(estimator, X, y=None, description="Entrenamiento", extras=None):
+    """
+    Envía un entrenamiento al planificador sin bloquear la página.
+    Mientras el trabajo no termina se muestra una barra de progreso que se actualiza sola y,
+    al completarse, la página se vuelve a ejecutar para mostrar los resultados.
+    :return: Tupla (entrada del registro, entrenado) si el modelo está disponible, o None.
+    """
+    return wait_for_job(scheduler.submit_fit(estimator, X, y, description, extras=extras))
+
+def wait_for_job(job, message="El modelo se está entrenando en segundo plano. Puede seguir usando la aplicación."):
+    """
+    Devuelve el resultado de un trabajo del planificador si ya terminó; si no, muestra su
+    avance y devuelve None.
+    """
+    if job.status == COMPLETADO:
+        return job.result
+    if job.status == ERROR:
+        st.error(f"Error en el trabajo '{job.description}': {job.error}")
+        return None
+
+    st.info(message)
+    _poll_job(job.key)
+    return None
+
+@st.fragment(run_every=1)
+def _poll_job(key):
+    job = scheduler.get(key)
+    if job is None or job.done():
+        st.rerun()
+    st.progress(job.progress, text=f"{job.description}: {job.message}")
@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+import time
+import pandas as pd
+from dates import normalize_dates
+from supabase_api import fetch_dataframe_from_supabase
+
+
+# Directorio donde se guardan las copias locales de las tablas
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join("data", "snapshots"))
+# Segundos mínimos entre dos consultas incrementales de la misma tabla
+SYNC_MIN_INTERVAL = int(os.getenv("SNAPSHOT_SYNC_MIN_INTERVAL", "60"))
+# Cada cuántas horas se descarga la tabla completa para recoger borrados (y modificaciones en
+# las tablas sin `UPDATED_AT_COLUMN`)
+FULL_REFRESH_HOURS = float(os.getenv("SNAPSHOT_FULL_REFRESH_HOURS", "24"))
+# Columna de última modificación mantenida por un trigger (sql/actualizaciones.sql)
+UPDATED_AT_COLUMN = "updated_at"
+# Margen con el que se vuelven a pedir las últimas modificaciones: una transacción que confirma
+# tarde puede traer una marca anterior a la última ya guardada
+WATERMARK_OVERLAP = pd.Timedelta(minutes=5)
+
+_locks = {}
+_locks_guard = threading.Lock()
+_last_check = {}
+_loaded = {}
+
+
+def _lock_for(table):
+    with _locks_guard:
+        return _locks.setdefault(table, threading.Lock())
+
+def _paths(table):
+    base = os.path.join(SNAPSHOT_DIR, table)
+    return f"{base}.parquet", f"{base}.json"
+
+def _read_meta(table):
+    _, meta_path = _paths(table)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _write(table, df, meta):
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    data_path, meta_path = _paths(table)
+    # Escritura atómica: otro proceso nunca lee un archivo a medio escribir
+    df.to_parquet(f"{data_path}.tmp", index=False)
+    os.replace(f"{data_path}.tmp", data_path)
+    with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(f"{meta_path}.tmp", meta_path)
+
+def _watermark(df, column, is_time):
+    # Máximo de la columna de marca; las fechas se guardan en ISO (UTC) para el filtro de PostgREST
+    if column not in df.columns or df.empty:
+        return None
+    if is_time:
+        return pd.to_datetime(df[column], utc=True, format="ISO8601").max().isoformat()
+    valor = df[column].max()
+    return valor.item() if hasattr(valor, "item") else valor
+
+def _watermark_filter(column, watermark, is_time):
+    if is_time:
+        return (column, "gte", (pd.Timestamp(watermark) - WATERMARK_OVERLAP).isoformat())
+    return (column, "gt", watermark)
+
+def request_sync(table):
+    """
+    Fuerza que la próxima llamada a `sync_table` consulte Supabase aunque no haya pasado
+    `SYNC_MIN_INTERVAL`, por ejemplo después de subir datos.
+    """
+    _last_check.pop(table, None)
+
+def sync_table(table, key_column="id", watermark_column=None, force_full=False):
+    """
+    Sincroniza de forma incremental una tabla de Supabase con su copia local en Parquet.
+    Solo se descargan las filas cuyo `watermark_column` supera el máximo ya guardado, y se
+    combinan con la copia local usando `key_column` (la versión nueva reemplaza a la anterior).
+    Con la marca de modificación `updated_at` (sql/actualizaciones.sql) se recogen también las
+    filas actualizadas; con `id` solo las nuevas, y las modificaciones y los borrados esperan a
+    la descarga completa cada `FULL_REFRESH_HOURS`.
+    Las columnas `fecha*` se guardan ya convertidas a datetime64 con `normalize_dates`.
+    :param table: Nombre de la tabla a sincronizar.
+    :param key_column: Clave única de la tabla.
+    :param watermark_column: Columna creciente que marca filas nuevas o modificadas. Si es None
+                             se usa `UPDATED_AT_COLUMN` cuando la tabla la tiene, y si no `key_column`.
+    :param force_full: Descargar la tabla completa aunque exista una copia local.
+    :return: Número de filas descargadas en esta sincronización.
+    """
+    with _lock_for(table):
+        if not force_full and time.monotonic() - _last_check.get(table, float("-inf")) < SYNC_MIN_INTERVAL:
+            return 0
+
+        meta = _read_meta(table)
+        data_path, _ = _paths(table)
+        full = (
+            force_full
+            or meta is None
+            or not os.path.exists(data_path)
+            or time.time() - meta["last_full_sync"] > FULL_REFRESH_HOURS * 3600
+        )
+
+        if full:
+            df = normalize_dates(fetch_dataframe_from_supabase(table, key_column=key_column, use_cache=False))
+            descargadas = len(df)
+            meta = {"last_full_sync": time.time()}
+            if watermark_column is None:
+                watermark_column = UPDATED_AT_COLUMN if UPDATED_AT_COLUMN in df.columns else key_column
+        else:
+            watermark_column = watermark_column or meta["watermark_column"]
+            filtros = []
+            if meta.get("watermark") is not None and meta.get("watermark_column") == watermark_column:
+                filtros.append(_watermark_filter(watermark_column, meta["watermark"], meta.get("watermark_is_time", False)))
+            nuevas = fetch_dataframe_from_supabase(table, filters=filtros, key_column=key_column, use_cache=False)
+            anterior = pd.read_parquet(data_path)
+            if not nuevas.empty and watermark_column in anterior.columns and watermark_column != key_column:
+                # El margen de WATERMARK_OVERLAP vuelve a traer filas ya guardadas con la misma marca
+                columnas = [key_column, watermark_column]
+                vistas = pd.MultiIndex.from_frame(anterior[columnas].astype(str))
+                nuevas = nuevas[~pd.MultiIndex.from_frame(nuevas[columnas].astype(str)).isin(vistas)]
+            descargadas = len(nuevas)
+            if nuevas.empty:
+                _last_check[table] = time.monotonic()
+                return 0
+            # Las columnas de fecha se guardan como datetime64 (no-op si la copia ya las tiene así)
+            df = pd.concat([normalize_dates(anterior), normalize_dates(nuevas)], ignore_index=True)
+            df = df.drop_duplicates(subset=key_column, keep="last").reset_index(drop=True)
+
+        meta["watermark_is_time"] = watermark_column == UPDATED_AT_COLUMN
+        meta["watermark"] = _watermark(df, watermark_column, meta["watermark_is_time"])
+        meta["watermark_column"] = watermark_column
+        meta["rows"] = len(df)
+        _write(table, df, meta)
+        _last_check[table] = time.monotonic()
+        return descargadas
+
+def snapshot_version(table):
+    """
+    Identificador de la versión actual de la copia local (cambia con cada sincronización que
+    trae datos nuevos), o None si la tabla aún no tiene copia.
+    """
+    data_path, _ = _paths(table)
+    return os.stat(data_path).st_mtime_ns if os.path.exists(data_path) else None
+
+def load_snapshot(table, columns=None, sync=True, copy=True, **sync_kwargs):
+    """
+    Devuelve la copia local de una tabla, sincronizándola antes si corresponde.
+    Mientras el archivo no cambie, las lecturas se sirven desde memoria.
+    :param table: Nombre de la tabla.
+    :param columns: Columnas a leer (None = todas).
+    :param sync: Si es False no se consulta Supabase.
+    :param copy: Si es False se devuelve el DataFrame compartido en memoria, que no debe
+                 modificarse (evita copiar la tabla en páginas que solo la leen).
+    :param sync_kwargs: Argumentos adicionales para `sync_table`.
+    :return: DataFrame con la copia local (una copia, puede modificarse libremente, salvo con `copy=False`).
+    """
+    if sync:
+        sync_table(table, **sync_kwargs)
+    data_path, _ = _paths(table)
+    if not os.path.exists(data_path):
+        return pd.DataFrame(columns=columns or [])
+
+    mtime = os.stat(data_path).st_mtime_ns
+    cached = _loaded.get(table)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, pd.read_parquet(data_path))
+        _loaded[table] = cached
+    df = cached[1]
+    if columns:
+        df = df[[c for c in columns if c in df.columns]]
+    return df.copy() if copy else df
@@ -0,0 +1,22 @@
+-- Marca de última modificación de ordencompra para la sincronización incremental de las copias
+-- locales (snapshot_sync.py). Ejecutar en el editor SQL de Supabase.
+-- Las filas nuevas toman la hora de la transacción por defecto y el trigger la actualiza en cada
+-- update, incluidos los upserts con merge-duplicates y los cambios hechos desde otras pantallas.
+-- Los borrados no dejan marca: se recogen en la descarga completa periódica.
+
+alter table ordencompra add column if not exists updated_at timestamptz not null default now();
+create index if not exists ordencompra_updated_at on ordencompra (updated_at);
+
+create or replace function marcar_actualizacion()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists ordencompra_updated_at on ordencompra;
+create trigger ordencompra_updated_at before update on ordencompra
+    for each row execute function marcar_actualizacion();
@@ -0,0 +1,33 @@
+-- Agregados calculados en Postgres para el Dashboard y las Estadísticas.
+-- Ejecutar en el editor SQL de Supabase. PostgREST expone la vista en /rest/v1/vista_conteo_categorias
+-- y la función en /rest/v1/rpc/resumen_ordenes.
+
+-- Número de compras por categoría y subcategoría (Dashboard)
+create or replace view vista_conteo_categorias as
+select
+    categoria,
+    subcategoria,
+    count(*) as conteo
+from vista_categorias_compras
+group by categoria, subcategoria;
+
+-- Número de órdenes por mes, estado y tipo de compra (Estadísticas).
+-- El rango es [fecha_desde, fecha_hasta); si un extremo es null no se limita.
+create or replace function resumen_ordenes(
+    fecha_desde timestamp default null,
+    fecha_hasta timestamp default null
+)
+returns table (mes date, estado integer, tipo_compra text, conteo bigint)
+language sql
+stable
+as $$
+    select
+        date_trunc('month', o.fecha_creacion_compra)::date as mes,
+        o.estado::integer as estado,
+        o.tipo_compra::text as tipo_compra,
+        count(*) as conteo
+    from ordencompra o
+    where (fecha_desde is null or o.fecha_creacion_compra >= fecha_desde)
+      and (fecha_hasta is null or o.fecha_creacion_compra < fecha_hasta)
+    group by 1, 2, 3;
+$$;
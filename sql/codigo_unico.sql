@@ -0,0 +1,7 @@
+-- Clave única de negocio de ordencompra. Ejecutar en el editor SQL de Supabase.
+-- La carga de archivos (ingestion.py) envía los lotes con on_conflict=codigo_de_compra: PostgREST
+-- necesita esta restricción para resolver el conflicto, y con ella reenviar un lote actualiza las
+-- órdenes ya insertadas en lugar de duplicarlas.
+-- Falla si ya hay códigos repetidos: la página de calidad de datos los lista para corregirlos.
+
+alter table ordencompra add constraint ordencompra_codigo_de_compra_key unique (codigo_de_compra);
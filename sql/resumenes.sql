@@ -0,0 +1,128 @@
+-- Tablas de resumen mensual de ordencompra, mantenidas por triggers en cada escritura.
+-- Ejecutar en el editor SQL de Supabase (requiere Postgres 15 por `nulls not distinct`).
+-- Las Estadísticas y la Evolución Temporal de Demandas leen estas tablas pequeñas (a través de
+-- las vistas del final) en lugar de agregar toda la historia en cada consulta (ver aggregations.py).
+--
+-- resumen_mensual:          mes de fecha_creacion_compra
+-- resumen_demanda_mensual:  mes de fecha_pedido_compra
+-- Dimensiones: mes, estado, tipo_compra y categoría del producto. Medidas: número de órdenes y
+-- sumas de cantidad e impuestos. La categoría se toma del producto al escribir la orden; si se
+-- cambia la categoría de un producto, recalcular con `select recalcular_resumenes();`.
+
+create table if not exists resumen_mensual (
+    mes date not null,
+    estado integer,
+    tipo_compra text,
+    categoria text,
+    conteo bigint not null default 0,
+    cantidad_total numeric not null default 0,
+    impuestos_total numeric not null default 0,
+    unique nulls not distinct (mes, estado, tipo_compra, categoria)
+);
+
+create table if not exists resumen_demanda_mensual (like resumen_mensual including all);
+
+-- Suma (signo 1) o resta (signo -1) al resumen las filas de una tabla de transición del trigger.
+-- Un upsert por lote es una sola sentencia: el resumen se actualiza una vez por lote y las
+-- filas actualizadas restan sus valores anteriores, por lo que reenviar un lote no duplica conteos.
+-- Las filas del resumen se escriben siempre en el orden de la clave (order by 1, 2, 3, 4): dos
+-- lotes simultáneos que tocan los mismos meses bloquean las filas en el mismo orden y no se
+-- bloquean mutuamente (deadlock).
+create or replace function actualizar_resumenes()
+returns trigger
+language plpgsql
+as $$
+declare
+    origen record;
+    destino record;
+begin
+    for origen in
+        select * from (values ('antiguas', -1), ('nuevas', 1)) as v(tabla, signo)
+        where (v.tabla = 'nuevas' and tg_op in ('INSERT', 'UPDATE'))
+           or (v.tabla = 'antiguas' and tg_op in ('UPDATE', 'DELETE'))
+    loop
+        for destino in
+            select * from (values
+                ('resumen_mensual', 'fecha_creacion_compra'),
+                ('resumen_demanda_mensual', 'fecha_pedido_compra')
+            ) as v(tabla, fecha)
+        loop
+            execute format($sql$
+                insert into %1$I as r (mes, estado, tipo_compra, categoria, conteo, cantidad_total, impuestos_total)
+                select
+                    date_trunc('month', o.%2$I)::date,
+                    o.estado::integer,
+                    o.tipo_compra::text,
+                    p.categoria::text,
+                    %4$s * count(*),
+                    %4$s * coalesce(sum(o.cantidad), 0),
+                    %4$s * coalesce(sum(o.impuestos), 0)
+                from %3$I o
+                left join producto p on p.id = o.producto_id
+                where o.%2$I is not null
+                group by 1, 2, 3, 4
+                order by 1, 2, 3, 4
+                on conflict (mes, estado, tipo_compra, categoria) do update set
+                    conteo = r.conteo + excluded.conteo,
+                    cantidad_total = r.cantidad_total + excluded.cantidad_total,
+                    impuestos_total = r.impuestos_total + excluded.impuestos_total
+            $sql$, destino.tabla, destino.fecha, origen.tabla, origen.signo);
+        end loop;
+    end loop;
+
+    if tg_op <> 'INSERT' then
+        delete from resumen_mensual where conteo = 0;
+        delete from resumen_demanda_mensual where conteo = 0;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists resumenes_insert on ordencompra;
+drop trigger if exists resumenes_update on ordencompra;
+drop trigger if exists resumenes_delete on ordencompra;
+
+create trigger resumenes_insert after insert on ordencompra
+    referencing new table as nuevas
+    for each statement execute function actualizar_resumenes();
+create trigger resumenes_update after update on ordencompra
+    referencing old table as antiguas new table as nuevas
+    for each statement execute function actualizar_resumenes();
+create trigger resumenes_delete after delete on ordencompra
+    referencing old table as antiguas
+    for each statement execute function actualizar_resumenes();
+
+-- Recalcula los resúmenes desde cero (carga inicial o cambio de categorías).
+create or replace function recalcular_resumenes()
+returns void
+language plpgsql
+as $$
+begin
+    truncate resumen_mensual, resumen_demanda_mensual;
+    insert into resumen_mensual (mes, estado, tipo_compra, categoria, conteo, cantidad_total, impuestos_total)
+    select date_trunc('month', o.fecha_creacion_compra)::date, o.estado::integer, o.tipo_compra::text, p.categoria::text,
+           count(*), coalesce(sum(o.cantidad), 0), coalesce(sum(o.impuestos), 0)
+    from ordencompra o left join producto p on p.id = o.producto_id
+    where o.fecha_creacion_compra is not null
+    group by 1, 2, 3, 4;
+    insert into resumen_demanda_mensual (mes, estado, tipo_compra, categoria, conteo, cantidad_total, impuestos_total)
+    select date_trunc('month', o.fecha_pedido_compra)::date, o.estado::integer, o.tipo_compra::text, p.categoria::text,
+           count(*), coalesce(sum(o.cantidad), 0), coalesce(sum(o.impuestos), 0)
+    from ordencompra o left join producto p on p.id = o.producto_id
+    where o.fecha_pedido_compra is not null
+    group by 1, 2, 3, 4;
+end;
+$$;
+
+select recalcular_resumenes();
+
+-- Vistas con el detalle que usa cada gráfico; agregan las tablas de resumen (pocas filas), no ordencompra.
+create or replace view vista_resumen_ordenes as
+select mes, estado, tipo_compra, sum(conteo) as conteo
+from resumen_mensual
+group by mes, estado, tipo_compra;
+
+create or replace view vista_demanda_mensual as
+select mes, categoria, sum(cantidad_total) as cantidad, sum(conteo) as conteo
+from resumen_demanda_mensual
+group by mes, categoria;
@@ -0,0 +1,203 @@
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.ensemble import RandomForestClassifier
+from encoders import CategoricalEncoder
+from supabase_api import fetch_page_from_supabase, fetch_pages_from_supabase
+from training_jobs import scheduler, report_progress
+
+
+# Filas que se procesan juntas en cada bloque
+CHUNK_SIZE = 50_000
+# Clases máximas del objetivo en la clasificación por bloques (un id o un código no es un objetivo)
+MAX_CLASSES = 100
+# Columna única y ordenable por la que se pagina la vista (el id de la orden): cada página se lee
+# con `id > último id`, sin que el servidor recorra el offset de las anteriores
+KEY_COLUMN = "id"
+
+
+def iter_chunks(table, columns, chunk_size=CHUNK_SIZE, key_column=KEY_COLUMN):
+    """
+    Recorre una tabla o vista de Supabase por bloques de tamaño acotado.
+    :param table: Nombre de la tabla o vista.
+    :param columns: Columnas a recuperar.
+    :param chunk_size: Filas por bloque.
+    :param key_column: Columna para la paginación por clave; None = paginación por offset
+                       (cada página cuesta en el servidor tanto como el offset recorrido).
+    :return: Generador de DataFrames con como máximo `chunk_size` filas.
+    """
+    paginas = []
+    filas = 0
+    for page in fetch_pages_from_supabase(table, select=list(columns), key_column=key_column):
+        paginas.append(page)
+        filas += len(page)
+        if filas >= chunk_size:
+            yield pd.DataFrame([fila for p in paginas for fila in p], columns=list(columns))
+            paginas, filas = [], 0
+    if paginas:
+        yield pd.DataFrame([fila for p in paginas for fila in p], columns=list(columns))
+
+
+def count_rows(table):
+    """
+    Número de filas de una tabla o vista (para informar del avance de un recorrido por bloques).
+    """
+    return fetch_page_from_supabase(table, limit=1, use_cache=False)[1]
+
+
+class StratifiedReservoir:
+    """
+    Muestra aleatoria uniforme por clase con tamaño fijo (reservoir sampling).
+    La memoria depende de `per_class` y del número de clases, no del tamaño de la tabla: la
+    muestra de cada clase crece con sus filas hasta `per_class` y el número de clases se limita
+    con `max_classes`.
+    """
+
+    def __init__(self, per_class, n_features, random_state=42, max_classes=None):
+        self.per_class = per_class
+        self.n_features = n_features
+        self.max_classes = max_classes
+        self.rng = np.random.RandomState(random_state)
+        self.samples = {}
+        self.seen = {}
+
+    def add(self, X, y):
+        """
+        Añade un bloque de filas (`X` array 2D, `y` array de clases).
+        Lanza ValueError si las clases superan `max_classes`.
+        """
+        clases = np.unique(y)
+        if self.max_classes is not None and len(self.samples.keys() | set(clases)) > self.max_classes:
+            raise ValueError(
+                f"El objetivo tiene más de {self.max_classes} clases; seleccione una columna categórica con menos valores."
+            )
+        for clase in clases:
+            filas = X[y == clase]
+            vistos = self.seen.get(clase, 0)
+            muestra = self.samples.get(clase)
+            necesarias = min(self.per_class, vistos + len(filas))
+            if muestra is None or len(muestra) < necesarias:
+                # Se reserva el doble de lo necesario (sin pasar de per_class) para no copiar en cada bloque
+                anteriores = 0 if muestra is None else min(vistos, self.per_class)
+                nueva = np.empty((min(self.per_class, max(necesarias, 2 * anteriores)), self.n_features))
+                if muestra is not None:
+                    nueva[:anteriores] = muestra[:anteriores]
+                muestra = self.samples[clase] = nueva
+
+            # Las primeras filas llenan la muestra; después cada fila i la reemplaza con probabilidad per_class / (i + 1)
+            libres = max(0, min(self.per_class - vistos, len(filas)))
+            muestra[vistos:vistos + libres] = filas[:libres]
+            resto = filas[libres:]
+            if len(resto):
+                posiciones = vistos + libres + np.arange(len(resto))
+                destinos = (self.rng.random_sample(len(resto)) * (posiciones + 1)).astype(np.int64)
+                aceptadas = destinos < self.per_class
+                muestra[destinos[aceptadas]] = resto[aceptadas]
+            self.seen[clase] = vistos + len(filas)
+
+    def arrays(self):
+        """
+        Devuelve la muestra como tupla (X, y).
+        """
+        X, y = [], []
+        for clase, muestra in self.samples.items():
+            n = min(self.per_class, self.seen[clase])
+            X.append(muestra[:n])
+            y.append(np.full(n, clase))
+        if not X:
+            return np.empty((0, self.n_features)), np.empty(0)
+        return np.vstack(X), np.concatenate(y)
+
+
+def train_streaming_segmentation(table, features, n_clusters, chunk_size=CHUNK_SIZE, key_column=KEY_COLUMN,
+                                 sample_size=5000, random_state=42, report=None):
+    """
+    Segmentación por bloques con MiniBatchKMeans, sin cargar la vista completa en memoria.
+    :param sample_size: Filas que se conservan (muestra uniforme) para visualizar los clusters.
+    :param report: Función `report(progreso, mensaje)`, con el progreso entre 0 y 1 (filas leídas / filas de la tabla).
+    :return: Diccionario con el modelo, el codificador, la muestra etiquetada y el total de filas.
+    """
+    report = report or (lambda progreso, mensaje: None)
+    encoder = CategoricalEncoder()
+    model = MiniBatchKMeans(n_clusters=n_clusters, random_state=random_state, n_init=3)
+    muestra = StratifiedReservoir(sample_size, len(features), random_state)
+    total = leidas = 0
+    filas_tabla = count_rows(table)
+    for chunk in iter_chunks(table, features, chunk_size, key_column):
+        leidas += len(chunk)
+        encoder.partial_fit(chunk, CategoricalEncoder.detect_columns(chunk))
+        X = encoder.transform(chunk).to_numpy(dtype=np.float64, na_value=np.nan)
+        X = X[~np.isnan(X).any(axis=1)]
+        if len(X) < n_clusters:
+            continue
+        model.partial_fit(X)
+        muestra.add(X, np.zeros(len(X), dtype=np.int8))
+        total += len(X)
+        report(min(1.0, leidas / max(filas_tabla, 1)), f"{leidas} de {filas_tabla} filas leídas")
+
+    if total == 0:
+        raise ValueError("No hay filas válidas para entrenar la segmentación.")
+    X_muestra, _ = muestra.arrays()
+    sample = pd.DataFrame(X_muestra, columns=list(features))
+    sample["Cluster"] = model.predict(X_muestra)
+    return {"model": model, "encoder": encoder, "sample": sample, "rows": total}
+
+def train_streaming_classification(table, features, target, per_class=20_000, chunk_size=CHUNK_SIZE,
+                                   key_column=KEY_COLUMN, random_state=42, report=None):
+    """
+    Clasificación sobre una muestra estratificada de tamaño fijo obtenida recorriendo la vista
+    por bloques, de modo que la memoria no depende del tamaño de la tabla.
+    :param per_class: Filas que se conservan por cada clase del objetivo.
+    :param report: Función `report(progreso, mensaje)`, con el progreso entre 0 y 1 (filas leídas / filas de la tabla).
+    :return: Diccionario con el modelo, los codificadores, la muestra y el total de filas.
+    """
+    report = report or (lambda progreso, mensaje: None)
+    columnas = list(dict.fromkeys([*features, target]))
+    encoder = CategoricalEncoder()
+    target_encoder = CategoricalEncoder()
+    muestra = StratifiedReservoir(per_class, len(features), random_state, max_classes=MAX_CLASSES)
+    total = leidas = 0
+    filas_tabla = count_rows(table)
+    for chunk in iter_chunks(table, columnas, chunk_size, key_column):
+        leidas += len(chunk)
+        chunk = chunk.dropna(subset=[target])
+        encoder.partial_fit(chunk[features], CategoricalEncoder.detect_columns(chunk[features]))
+        target_encoder.partial_fit(chunk, [target])
+        X = encoder.transform(chunk[features]).to_numpy(dtype=np.float64, na_value=np.nan)
+        y = target_encoder.transform(chunk[[target]])[target].to_numpy()
+        validas = ~np.isnan(X).any(axis=1)
+        muestra.add(X[validas], y[validas])
+        total += int(validas.sum())
+        report(min(1.0, leidas / max(filas_tabla, 1)), f"{leidas} de {filas_tabla} filas leídas, {len(muestra.samples)} clases")
+
+    X_muestra, y_muestra = muestra.arrays()
+    if len(np.unique(y_muestra)) < 2:
+        raise ValueError("La muestra no contiene al menos dos clases del objetivo.")
+    model = RandomForestClassifier(random_state=random_state, n_jobs=-1)
+    model.fit(pd.DataFrame(X_muestra, columns=list(features)), y_muestra)
+    return {
+        "model": model,
+        "encoder": encoder,
+        "target_encoder": target_encoder,
+        "sample_rows": len(y_muestra),
+        "class_counts": {int(k): int(v) for k, v in muestra.seen.items()},
+        "rows": total,
+    }
+
+def _run_streaming_job(key, kind, kwargs):
+    report = lambda progreso, mensaje: report_progress(key, progreso, mensaje)
+    if kind == "segmentation":
+        return train_streaming_segmentation(report=report, **kwargs)
+    return train_streaming_classification(report=report, **kwargs)
+
+def submit_streaming_training(kind, description="Entrenamiento por bloques", **kwargs):
+    """
+    Envía un entrenamiento por bloques al planificador de trabajos en segundo plano.
+    :param kind: "segmentation" o "classification".
+    :param kwargs: Argumentos de `train_streaming_segmentation` o `train_streaming_classification`.
+    :return: Objeto `Job`.
+    """
+    if kind not in ("segmentation", "classification"):
+        raise ValueError(f"Tipo de entrenamiento no soportado: {kind}")
+    key = f"streaming-{kind}-" + repr(sorted(kwargs.items()))
+    return scheduler.submit(key, _run_streaming_job, kind, kwargs, description=description)
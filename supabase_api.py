@@ -1,14 +1,23 @@
 import os
-import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
 from dotenv import load_dotenv
-from supabase import create_client
+from http_session import PooledSession
+from query_cache import QueryCache
 
 
 # Cargar credenciales desde el archivo .env
 load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# Con SUPABASE_BACKEND=local se usa un PostgREST local sobre SQLite (local_backend.py) en lugar de Supabase
+SUPABASE_BACKEND = os.getenv("SUPABASE_BACKEND", "supabase")
+local_backend = None
+if SUPABASE_BACKEND == "local":
+    from local_backend import start_local_backend
+    local_backend, SUPABASE_URL = start_local_backend()
+    SUPABASE_KEY = SUPABASE_KEY or "local"
 
 HEADERS = {
     "Content-Type": "application/json",
@@ -16,45 +25,426 @@ HEADERS = {
     "Authorization": f"Bearer {SUPABASE_KEY}",
 }
 
-def fetch_data_from_supabase(table):
+# Sesión HTTP única (conexiones reutilizadas, reintentos y métricas) para todo el acceso a Supabase
+session = PooledSession(
+    SUPABASE_URL,
+    HEADERS,
+    timeout=(float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "5")), float(os.getenv("SUPABASE_READ_TIMEOUT", "60"))),
+    max_retries=int(os.getenv("SUPABASE_MAX_RETRIES", "4")),
+    pool_size=int(os.getenv("SUPABASE_POOL_SIZE", "16")),
+)
+
+# Códigos de PostgREST y Postgres de una tabla o vista que no existe
+MISSING_RELATION_CODES = {"PGRST205", "42P01"}
+
+
+class SupabaseError(Exception):
+    """
+    Respuesta de error de la API REST de Supabase. Conserva el código HTTP y el código de
+    PostgREST o Postgres (`code` del cuerpo JSON) para distinguir los errores que se pueden tratar.
+    """
+
+    def __init__(self, message, status_code=None, code=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+
+    @classmethod
+    def from_response(cls, response, message="Error al consultar Supabase"):
+        try:
+            code = response.json().get("code")
+        except (ValueError, AttributeError):
+            code = None
+        return cls(f"{message}: {response.status_code} - {response.text}", response.status_code, code)
+
+    def missing_relation(self):
+        """
+        Indica si el error se debe a una tabla o vista que no existe en la base.
+        """
+        return self.status_code == 404 or self.code in MISSING_RELATION_CODES
+
+
+# Caché de consultas compartida por todas las secciones y sesiones del proceso
+query_cache = QueryCache(
+    ttl=int(os.getenv("SUPABASE_CACHE_TTL", "300")),
+    max_entries=int(os.getenv("SUPABASE_CACHE_MAX_ENTRIES", "32")),
+    max_bytes=int(os.getenv("SUPABASE_CACHE_MAX_MB", "512")) * 1024 * 1024,
+)
+
+# Funciones a las que se avisa cuando se escribe en una tabla (cachés de otros módulos)
+_invalidation_listeners = []
+
+def add_invalidation_listener(listener):
+    """
+    Registra una función `listener(table_name)` que se llama después de cada escritura.
+    """
+    _invalidation_listeners.append(listener)
+
+def invalidate_cache(table_name):
+    """
+    Invalida las consultas en caché de una tabla, de todas las vistas (`vista_*`), de las
+    tablas de resumen mantenidas por triggers (`resumen_*`) y de las funciones RPC, ya que
+    estas pueden depender de la tabla modificada.
+    """
+    query_cache.invalidate(table_name)
+    query_cache.invalidate(prefix="vista_")
+    query_cache.invalidate(prefix="resumen_")
+    query_cache.invalidate(prefix="rpc/")
+    for listener in _invalidation_listeners:
+        listener(table_name)
+
+def use_backend(url, key=None):
+    """
+    Dirige todo el acceso a datos (sesión compartida y cliente asíncrono) a otra API compatible
+    con PostgREST, por ejemplo un `LocalPostgREST` arrancado en una prueba, y vacía las cachés.
+    :param url: URL base de la API.
+    :param key: Clave de acceso (None = se mantiene la actual).
+    """
+    if key is not None:
+        HEADERS.update({"apikey": key, "Authorization": f"Bearer {key}"})
+    session.configure(base_url=url, headers=HEADERS)
+    query_cache.invalidate()
+    for listener in _invalidation_listeners:
+        listener(None)
+
+# Tamaño de página por defecto; no debe superar el `max-rows` configurado en PostgREST (1000 en Supabase)
+PAGE_SIZE = int(os.getenv("SUPABASE_PAGE_SIZE", "1000"))
+
+FILTER_OPERATORS = {"eq", "neq", "in", "gt", "gte", "lt", "lte", "like", "ilike"}
+
+# Orden por defecto de la paginación por offset: la clave de cada tabla, o todas las columnas de
+# agrupación de las vistas agregadas. Sin ORDER BY, Postgres puede devolver las filas en otro orden
+# en cada página y la lectura repetiría u omitiría filas.
+DEFAULT_ORDER = {
+    "ordencompra": "id",
+    "producto": "id",
+    "proveedor": "id",
+    "centrodecoste": "id",
+    "vista_analisis_compras4": "id",
+    "vista_conteo_categorias": "categoria,subcategoria",
+    "vista_resumen_ordenes": "mes,estado,tipo_compra",
+    "vista_demanda_mensual": "mes,categoria",
+    "resumen_mensual": "mes,estado,tipo_compra,categoria",
+    "resumen_demanda_mensual": "mes,estado,tipo_compra,categoria",
+    "rpc/resumen_ordenes": "mes,estado,tipo_compra",
+}
+
+def build_query_params(select=None, filters=None, order=None):
+    """
+    Construye los parámetros de consulta de PostgREST.
+    :param select: Lista de columnas a recuperar (None = todas).
+    :param filters: Lista de tuplas (columna, operador, valor) con operador en
+                    `eq`, `neq`, `in`, `gt`, `gte`, `lt`, `lte`, `like`, `ilike`. Para `in` el
+                    valor es una lista; en `like`/`ilike` el comodín es `*`.
+    :param order: Columna (o "columna.desc") por la que ordenar los resultados.
+    :return: Lista de tuplas (parámetro, valor) para `requests`.
+    """
+    params = []
+    if select:
+        params.append(("select", ",".join(select)))
+    for columna, operador, valor in filters or []:
+        if operador not in FILTER_OPERATORS:
+            raise ValueError(f"Operador de filtro no soportado: {operador}")
+        if operador == "in":
+            valores = ",".join(f'"{v}"' if isinstance(v, str) else str(v) for v in valor)
+            params.append((columna, f"in.({valores})"))
+        else:
+            params.append((columna, f"{operador}.{valor}"))
+    if order:
+        params.append(("order", order))
+    return params
+
+def stable_order(table, order=None):
+    """
+    Orden con el que se pagina una tabla por offset: `order` si se indica, o el de `DEFAULT_ORDER`.
+    :return: Orden para PostgREST, o None si la tabla no tiene uno por defecto.
+    """
+    return order or DEFAULT_ORDER.get(table)
+
+def check_next_page(table, order):
+    """
+    Lanza ValueError si se va a pedir una segunda página por offset sin un orden estable.
+    """
+    if not order:
+        raise ValueError(
+            f"La consulta de '{table}' ocupa más de una página: indique `order` o `key_column` "
+            "(o añada la tabla a DEFAULT_ORDER) para que la paginación sea estable."
+        )
+
+def page_requests(table, select=None, filters=None, order=None, page_size=PAGE_SIZE, key_column=None):
+    """
+    Parámetros de cada página de una lectura paginada, sin hacer las peticiones: lo comparten
+    `fetch_pages_from_supabase`, `call_rpc` y sus variantes asíncronas (async_api.py).
+    Es un generador que produce los parámetros de una página y recibe con `send` la página
+    devuelta por PostgREST; termina cuando una página llega incompleta.
+    Argumentos como en `fetch_pages_from_supabase` (`table` es "rpc/<función>" para una función).
+    """
+    if key_column and select and key_column not in select:
+        select = [*select, key_column]
+    order = stable_order(table, order)
+    offset = 0
+    ultima_clave = None
+
+    while True:
+        filtros = list(filters or [])
+        if key_column:
+            if ultima_clave is not None:
+                filtros.append((key_column, "gt", ultima_clave))
+            params = build_query_params(select, filtros, order=key_column)
+        else:
+            if offset:
+                check_next_page(table, order)
+            params = build_query_params(select, filtros, order)
+            params.append(("offset", offset))
+        params.append(("limit", page_size))
+
+        page = yield params
+        if len(page) < page_size:
+            return
+        offset += len(page)
+        if key_column:
+            ultima_clave = page[-1][key_column]
+
+def fetch_pages_from_supabase(table, select=None, filters=None, order=None, page_size=PAGE_SIZE, key_column=None):
+    """
+    Recupera una tabla de Supabase página a página.
+    Por defecto pagina con `limit`/`offset`; si se indica `key_column` (columna única y ordenable,
+    por ejemplo `id`) pagina por clave, lo que evita recorrer el offset en tablas grandes.
+    La paginación por offset necesita un orden total: si no se indica `order` se usa el de
+    `DEFAULT_ORDER`, y sin ninguno solo se admite una página (ValueError si hay más).
+    :param table: Nombre de la tabla o vista a consultar.
+    :param select: Lista de columnas a recuperar (None = todas).
+    :param filters: Lista de tuplas (columna, operador, valor), ver `build_query_params`.
+    :param order: Orden de los resultados (se ignora si se usa `key_column`).
+    :param page_size: Número de filas por página.
+    :param key_column: Columna para la paginación por clave.
+    :return: Generador de listas de diccionarios, una por página.
+    """
+    paginas = page_requests(table, select, filters, order, page_size, key_column)
+    params = next(paginas)
+    while True:
+        response = session.get(f"/rest/v1/{table}", params=params)
+        if response.status_code != 200:
+            raise SupabaseError.from_response(response)
+
+        page = response.json()
+        if page:
+            yield page
+        try:
+            params = paginas.send(page)
+        except StopIteration:
+            break
+
+def fetch_data_from_supabase(table, select=None, filters=None, order=None):
     """
     Recupera datos de una tabla de Supabase.
     :param table: Nombre de la tabla a consultar.
+    :param select: Lista de columnas a recuperar (None = todas).
+    :param filters: Lista de tuplas (columna, operador, valor), ver `build_query_params`.
+    :param order: Orden de los resultados.
     :return: Lista de diccionarios con los datos de la tabla.
     """
-    url = f"{SUPABASE_URL}/rest/v1/{table}"
-    response = requests.get(url, headers=HEADERS)
-    
-    if response.status_code == 200:
-        return response.json()
+    data = []
+    for page in fetch_pages_from_supabase(table, select=select, filters=filters, order=order):
+        data.extend(page)
+    return data
+
+def fetch_dataframe_from_supabase(table, select=None, filters=None, order=None, page_size=PAGE_SIZE, key_column=None, use_cache=True):
+    """
+    Recupera una tabla de Supabase como DataFrame, convirtiendo cada página a medida que llega
+    para no mantener en memoria la lista JSON completa.
+    El resultado se guarda en `query_cache` y se devuelve una copia, para que las secciones
+    puedan modificarlo sin alterar la caché.
+    :param table: Nombre de la tabla o vista a consultar.
+    :param select: Lista de columnas a recuperar (None = todas).
+    :param filters: Lista de tuplas (columna, operador, valor), ver `build_query_params`.
+    :param order: Orden de los resultados.
+    :param page_size: Número de filas por página.
+    :param key_column: Columna para la paginación por clave.
+    :param use_cache: Si es False se consulta siempre a Supabase.
+    :return: DataFrame con los datos (vacío si la consulta no devuelve filas).
+    """
+    key = QueryCache.make_key(table, select=select, filters=filters, order=order)
+    if use_cache:
+        cached = query_cache.get(key)
+        if cached is not None:
+            return cached.copy()
+
+    frames = [
+        pd.DataFrame(page)
+        for page in fetch_pages_from_supabase(table, select, filters, order, page_size, key_column)
+    ]
+    if not frames:
+        df = pd.DataFrame(columns=select or [])
     else:
-        raise Exception(f"Error al consultar Supabase: {response.status_code} - {response.text}")
+        df = pd.concat(frames, ignore_index=True)
+
+    if use_cache:
+        query_cache.set(key, df, size=int(df.memory_usage(index=True, deep=True).sum()))
+        return df.copy()
+    return df
+
+def fetch_page_from_supabase(table, offset=0, limit=PAGE_SIZE, select=None, filters=None, order=None, use_cache=True):
+    """
+    Recupera una sola página de una tabla y el total de filas que cumplen los filtros
+    (`Prefer: count=exact`), sin descargar el resto de la tabla. Se usa en las tablas paginadas.
+    :param offset: Primera fila de la página.
+    :param limit: Número de filas de la página.
+    :param select: Lista de columnas a recuperar (None = todas).
+    :param filters: Lista de tuplas (columna, operador, valor), ver `build_query_params`.
+    :param order: Orden de los resultados (necesario para que las páginas sean estables; por
+                  defecto el de `DEFAULT_ORDER`).
+    :param use_cache: Si es False se consulta siempre a Supabase.
+    :return: Tupla (DataFrame con la página, total de filas).
+    """
+    order = stable_order(table, order)
+    key = QueryCache.make_key(table, select=select, filters=filters, order=order, offset=offset, limit=limit)
+    if use_cache:
+        cached = query_cache.get(key)
+        if cached is not None:
+            return cached[0].copy(), cached[1]
+
+    params = build_query_params(select, filters, order)
+    params += [("offset", offset), ("limit", limit)]
+    response = session.get(f"/rest/v1/{table}", params=params, headers={"Prefer": "count=exact"})
+    if response.status_code not in (200, 206, 416):
+        raise SupabaseError.from_response(response)
+    # 416: la página pedida está fuera del rango (la tabla tiene menos filas)
+    df = pd.DataFrame(response.json() if response.status_code != 416 else [], columns=select or None)
+    # Content-Range: "0-99/12345" ("*/0" si no hay filas)
+    total = response.headers.get("Content-Range", "*/*").rpartition("/")[2]
+    total = int(total) if total.isdigit() else offset + len(df)
+
+    if use_cache:
+        query_cache.set(key, (df, total), size=int(df.memory_usage(index=True, deep=True).sum()))
+        return df.copy(), total
+    return df, total
+
+def call_rpc(function, params=None, use_cache=True, order=None, page_size=PAGE_SIZE):
+    """
+    Ejecuta una función de Postgres expuesta por PostgREST (`/rest/v1/rpc/<función>`).
+    Se usa para los agregados calculados en el servidor (ver sql/agregados.sql).
+    El resultado se pide por páginas con `limit`/`offset`, como las tablas: PostgREST corta
+    cualquier respuesta en `max-rows` filas (1000 en Supabase), también la de una función.
+    :param function: Nombre de la función.
+    :param params: Diccionario con los argumentos de la función.
+    :param use_cache: Si es False se consulta siempre a Supabase.
+    :param order: Orden de las filas (por defecto el de `DEFAULT_ORDER["rpc/<función>"]`).
+    :param page_size: Número de filas por página.
+    :return: DataFrame con las filas devueltas por la función.
+    """
+    key = QueryCache.make_key(f"rpc/{function}", params=params)
+    if use_cache:
+        cached = query_cache.get(key)
+        if cached is not None:
+            return cached.copy()
+
+    frames = []
+    paginas = page_requests(f"rpc/{function}", order=order, page_size=page_size)
+    consulta = next(paginas)
+    while True:
+        # Las funciones que se llaman así solo leen datos: repetirlas no tiene efectos
+        response = session.post(f"/rest/v1/rpc/{function}", params=consulta, json=params or {}, idempotent=True)
+        if response.status_code != 200:
+            raise SupabaseError.from_response(response, f"Error al ejecutar la función {function} en Supabase")
+        page = response.json()
+        if page:
+            frames.append(pd.DataFrame(page))
+        try:
+            consulta = paginas.send(page)
+        except StopIteration:
+            break
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    if use_cache:
+        query_cache.set(key, df, size=int(df.memory_usage(index=True, deep=True).sum()))
+        return df.copy()
+    return df
 
 def insert_data_into_supabase(table_name, data):
     """
     Inserta o actualiza datos en una tabla de Supabase.
     :param table_name: Nombre de la tabla donde se insertarán los datos.
-    :param data: Diccionario con los datos a insertar o actualizar.
-    :return: Respuesta de la API en formato JSON.
+    :param data: Diccionario (o lista de diccionarios) con los datos a insertar o actualizar.
+    :return: Respuesta de la API en formato JSON (lista con las filas guardadas).
     """
     try:
         # Realizar la operación de UPSERT
-        response = supabase.table(table_name).upsert(data).execute()
-        
+        response = session.post(
+            f"/rest/v1/{table_name}", json=data,
+            headers={"Prefer": "resolution=merge-duplicates,return=representation"},
+        )
+
         # Validar si la respuesta contiene datos
-        if hasattr(response, "data") and response.data:  # Verificar atributo "data"
-            return response
+        if response.status_code in (200, 201) and response.json():
+            invalidate_cache(table_name)
+            return response.json()
         else:
-            raise ValueError(f"Error en la respuesta de Supabase: {response}")
+            raise ValueError(f"Error en la respuesta de Supabase: {response.status_code} - {response.text}")
     except Exception as e:
         raise ValueError(f"Error al insertar datos en Supabase: {e}")
 
+def dataframe_to_json_chunks(df, chunk_size=1000):
+    """
+    Serializa un DataFrame a JSON por lotes, sin construir diccionarios fila por fila.
+    Las fechas se envían en formato ISO y los valores NaN/NaT como null.
+    :param df: DataFrame a serializar.
+    :param chunk_size: Número de filas por lote.
+    :return: Generador de tuplas (fila_inicio, fila_fin, cuerpo_json).
+    """
+    for inicio in range(0, len(df), chunk_size):
+        lote = df.iloc[inicio:inicio + chunk_size]
+        cuerpo = lote.to_json(orient="records", date_format="iso", date_unit="s", force_ascii=False)
+        yield inicio, inicio + len(lote), cuerpo
 
+def _upsert_chunk(path, headers, cuerpo, idempotent):
+    response = session.post(path, headers=headers, data=cuerpo.encode("utf-8"), idempotent=idempotent)
+    if response.status_code not in (200, 201, 204):
+        raise Exception(f"{response.status_code} - {response.text}")
 
+def upsert_dataframe_into_supabase(table_name, df, chunk_size=1000, max_workers=4, on_conflict=None):
+    """
+    Inserta o actualiza un DataFrame completo en una tabla de Supabase enviándolo por lotes.
+    Cada lote es una sola petición a la API REST y como máximo `max_workers` peticiones
+    están en curso al mismo tiempo.
+    :param table_name: Nombre de la tabla donde se insertarán los datos.
+    :param df: DataFrame con las columnas de la tabla.
+    :param chunk_size: Número de filas por lote.
+    :param max_workers: Máximo de lotes enviados en paralelo.
+    :param on_conflict: Columnas (separadas por coma) que identifican un registro existente.
+                        Si es None se usa la clave primaria de la tabla; como las filas nuevas no
+                        la traen, un lote que falla tras llegar al servidor no se reenvía (podría
+                        quedar insertado dos veces) y se informa como fallido.
+    :return: Diccionario con el total de filas, el número de lotes y la lista de lotes fallidos
+             (`inicio` y `fin` son posiciones de fila en el DataFrame, `fin` excluido).
+    """
+    path = f"/rest/v1/{table_name}"
+    if on_conflict:
+        path = f"{path}?on_conflict={on_conflict}"
+    headers = {"Prefer": "resolution=merge-duplicates,return=minimal"}
 
+    errores = []
+    lotes = 0
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futuros = {}
+        for inicio, fin, cuerpo in dataframe_to_json_chunks(df, chunk_size):
+            # Limitar los lotes en memoria: esperar a que termine alguno antes de serializar más
+            if len(futuros) >= max_workers * 2:
+                terminado = next(as_completed(futuros))
+                _registrar_lote(terminado, futuros.pop(terminado), errores)
+            futuros[executor.submit(_upsert_chunk, path, headers, cuerpo, bool(on_conflict))] = (inicio, fin)
+            lotes += 1
+        for futuro in as_completed(futuros):
+            _registrar_lote(futuro, futuros[futuro], errores)
 
+    if len(errores) < lotes:
+        invalidate_cache(table_name)
+    errores.sort(key=lambda e: e["inicio"])
+    return {"filas": len(df), "lotes": lotes, "errores": errores}
 
-
-
-
-
+def _registrar_lote(futuro, rango, errores):
+    try:
+        futuro.result()
+    except Exception as e:
+        inicio, fin = rango
+        errores.append({"inicio": inicio, "fin": fin, "error": str(e)})
@@ -0,0 +1,143 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+
+# Filas por página de las tablas paginadas
+PAGE_SIZE = int(os.getenv("TABLE_PAGE_SIZE", "100"))
+# Órdenes y filtros calculados que se conservan (cada uno ocupa 8 bytes por fila)
+MAX_CACHED_ORDERS = 16
+
+
+def filter_mask(serie, texto):
+    """
+    Filtro de una columna a partir del texto escrito por el usuario:
+    - numérica: igualdad con el número (o rango "min..max");
+    - fecha: el periodo indicado ("2024", "2024-03", "2024-03-15");
+    - texto: contiene el texto, sin distinguir mayúsculas.
+    :return: Array booleano.
+    """
+    texto = texto.strip()
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+        minimo, separador, maximo = texto.partition("..")
+        try:
+            if separador:
+                desde = float(minimo) if minimo.strip() else -np.inf
+                hasta = float(maximo) if maximo.strip() else np.inf
+                mascara = serie.between(desde, hasta)
+            else:
+                mascara = serie == float(texto)
+            return mascara.fillna(False).to_numpy(dtype=bool)
+        except ValueError:
+            return np.zeros(len(serie), dtype=bool)
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        try:
+            periodo = pd.Period(texto)
+        except (ValueError, TypeError):
+            return np.zeros(len(serie), dtype=bool)
+        fechas = serie.dt.tz_localize(None) if serie.dt.tz is not None else serie
+        return ((fechas >= periodo.start_time) & (fechas <= periodo.end_time)).to_numpy()
+    # Se compara sobre los valores distintos y no sobre cada fila
+    codigos, valores = pd.factorize(serie)
+    coinciden = pd.Index(valores).astype(str).str.contains(texto, case=False, regex=False)
+    return np.append(np.asarray(coinciden, dtype=bool), False)[codigos]
+
+def sort_order(serie, ascending=True):
+    """
+    Posiciones de las filas ordenadas por una columna (orden estable, nulos al final).
+    Los textos se ordenan a través de sus códigos de `factorize`, que es mucho más rápido que
+    comparar cadenas fila por fila.
+    """
+    nulos = pd.isna(serie).to_numpy()
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        valores = np.where(nulos, 0, serie.to_numpy(dtype="datetime64[ns]").view("int64"))
+    elif pd.api.types.is_numeric_dtype(serie):
+        valores = np.where(nulos, 0, serie.to_numpy(dtype="float64", na_value=np.nan))
+    else:
+        valores, _ = pd.factorize(serie, sort=True)
+        nulos = valores < 0
+    if not ascending:
+        valores = -valores
+    return np.lexsort((valores, nulos))
+
+class PageView:
+    """
+    Paginación, orden y filtro sobre un DataFrame que ya está en memoria (por ejemplo la copia
+    local de `ordencompra`). Solo se construye la página visible; el orden y el filtro de la
+    tabla completa se calculan una vez por versión de los datos y se guardan.
+    """
+
+    def __init__(self, max_cached=MAX_CACHED_ORDERS):
+        self.max_cached = max_cached
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, clave, calcular):
+        if clave[0] is None:
+            return calcular()
+        with self._lock:
+            if clave in self._cache:
+                self._cache.move_to_end(clave)
+                return self._cache[clave]
+        valor = calcular()
+        with self._lock:
+            self._cache[clave] = valor
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return valor
+
+    def positions(self, df, sort=None, ascending=True, filter_column=None, filter_text=None, version=None, table=None):
+        """
+        Posiciones de las filas que cumplen el filtro, en el orden pedido.
+        :param version: Identificador de los datos (por ejemplo `snapshot_version`); si es None
+                        no se guarda nada y se calcula en cada llamada.
+        :param table: Identificador de la tabla (por ejemplo la `key` de `show_table`): dos tablas
+                      distintas pueden tener la misma versión y el mismo número de filas.
+        :return: Array de posiciones, o None si no hay orden ni filtro (todas las filas en su orden).
+        """
+        filtrar = bool(filter_column and filter_text and filter_text.strip())
+        if not filtrar and not sort:
+            return None
+        base = (version, table, len(df))
+        orden = None
+        if sort:
+            orden = self._cached((*base, "orden", sort, ascending), lambda: sort_order(df[sort], ascending))
+        if not filtrar:
+            return orden
+        mascara = self._cached(
+            (*base, "filtro", filter_column, filter_text.strip()), lambda: filter_mask(df[filter_column], filter_text)
+        )
+        return orden[mascara[orden]] if orden is not None else np.flatnonzero(mascara)
+
+    def page(self, df, page=1, page_size=PAGE_SIZE, **kwargs):
+        """
+        Página visible de la tabla.
+        :param page: Número de página (desde 1); se ajusta al rango válido.
+        :param kwargs: Orden y filtro, ver `positions`.
+        :return: Tupla (DataFrame con la página, total de filas tras el filtro, página usada).
+        """
+        return self.slice(df, self.positions(df, **kwargs), page, page_size)
+
+    @staticmethod
+    def slice(df, positions, page=1, page_size=PAGE_SIZE):
+        """
+        Página de un DataFrame a partir de las posiciones devueltas por `positions`.
+        :return: Tupla (DataFrame con la página, total de filas, página usada).
+        """
+        total = len(df) if positions is None else len(positions)
+        paginas = max(1, -(-total // page_size))
+        page = min(max(1, int(page)), paginas)
+        inicio = (page - 1) * page_size
+        if positions is None:
+            return df.iloc[inicio:inicio + page_size], total, page
+        return df.iloc[positions[inicio:inicio + page_size]], total, page
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+
+
+# Instancia compartida por todas las tablas de la aplicación
+page_view = PageView()
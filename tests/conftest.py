@@ -0,0 +1,18 @@
+import os
+import sys
+import pytest
+
+# Los módulos de la aplicación están en la raíz del repositorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def backend():
+    # PostgREST local sobre SQLite en memoria; la aplicación vuelve a su backend al terminar
+    import supabase_api
+    from local_backend import LocalPostgREST
+    anterior = supabase_api.session.base_url
+    with LocalPostgREST() as local:
+        supabase_api.use_backend(local.start())
+        yield local
+    supabase_api.use_backend(anterior)
@@ -0,0 +1,31 @@
+import pandas as pd
+import pytest
+import aggregations
+from supabase_api import SupabaseError
+
+
+def _sin_resumen(error):
+    def leer(*args, **kwargs):
+        raise error
+    return leer
+
+
+def test_sin_tabla_de_resumen_se_agrega_con_la_funcion(monkeypatch):
+    monkeypatch.setattr(aggregations, "fetch_dataframe_from_supabase", _sin_resumen(SupabaseError("no existe", 404, "42P01")))
+    monkeypatch.setattr(aggregations, "call_rpc", lambda funcion, params: pd.DataFrame(
+        {"mes": ["2024-01-01"], "estado": [1], "tipo_compra": ["directa"], "conteo": [3]}
+    ))
+    assert aggregations.fetch_order_summary()["conteo"].tolist() == [3]
+
+@pytest.mark.parametrize("error", [SupabaseError("error interno", 500), SupabaseError("sin permiso", 401, "42501"), TimeoutError()])
+def test_otros_errores_del_resumen_se_propagan(monkeypatch, error):
+    monkeypatch.setattr(aggregations, "fetch_dataframe_from_supabase", _sin_resumen(error))
+    monkeypatch.setattr(aggregations, "call_rpc", lambda funcion, params: pytest.fail("no debe usar la función"))
+    with pytest.raises(type(error)):
+        aggregations.fetch_order_summary()
+
+def test_codigo_de_relacion_inexistente(backend):
+    from supabase_api import fetch_dataframe_from_supabase
+    with pytest.raises(SupabaseError) as error:
+        fetch_dataframe_from_supabase("vista_que_no_existe", use_cache=False)
+    assert error.value.missing_relation() and error.value.code == "42P01"
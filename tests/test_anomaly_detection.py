@@ -0,0 +1,25 @@
+import os
+import numpy as np
+import anomaly_detection
+from anomaly_detection import AnomalyDetector, GroupStatistics, _median_mad, histogram, measures
+from benchmarks.synthetic import generate_vista_analisis
+
+
+def test_los_histogramas_dispersos_dan_las_mismas_estadisticas():
+    df = generate_vista_analisis(2000)
+    grupo = GroupStatistics("categoria")
+    grupo.update(df["categoria"].to_numpy()[:1500], measures(df.iloc[:1500]))
+    grupo.update(df["categoria"].to_numpy()[1500:], measures(df.iloc[1500:]))
+    denso = histogram(grupo.codes(df["categoria"].to_numpy()), measures(df), len(grupo.groups))
+    for obtenido, esperado in zip(grupo.statistics(), _median_mad(denso)):
+        np.testing.assert_array_equal(obtenido, esperado)
+
+def test_cada_lote_anade_un_archivo_de_puntuaciones(monkeypatch, tmp_path):
+    monkeypatch.setattr(anomaly_detection, "MAX_SCORE_PARTS", 3)
+    detector = AnomalyDetector(str(tmp_path))
+    for i in range(4):
+        assert detector.process(generate_vista_analisis(100, seed=i, start_id=1 + i * 100)) == 100
+    # La cuarta escritura junta las tres anteriores en un solo archivo
+    assert os.listdir(tmp_path / "puntuaciones") == ["parte-000004.parquet"]
+    todas = generate_vista_analisis(400)
+    assert AnomalyDetector(str(tmp_path)).lookup(todas)["puntuacion"].notna().all()
@@ -0,0 +1,18 @@
+import pandas as pd
+import async_api
+from async_api import fetch_many
+
+
+def test_fetch_many_reutiliza_el_cliente_y_pagina_como_la_version_sincrona(backend):
+    backend.load_table("proveedor", pd.DataFrame({"id": range(1, 6), "nombre": list("abcde")}))
+    backend.load_table("producto", pd.DataFrame({"id": range(1, 4), "codigo": list("xyz")}))
+    consultas = {
+        "proveedor": {"table": "proveedor", "page_size": 2, "use_cache": False},
+        "producto": {"table": "producto", "select": ["id", "codigo"], "key_column": "id", "page_size": 2, "use_cache": False},
+    }
+    primera = fetch_many(consultas)
+    assert list(primera["proveedor"]["id"]) == [1, 2, 3, 4, 5]
+    assert list(primera["producto"]["codigo"]) == ["x", "y", "z"]
+    clientes = [cliente for _, cliente in async_api._clients.values()]
+    fetch_many(consultas)
+    assert [cliente for _, cliente in async_api._clients.values()] == clientes and len(clientes) == 1
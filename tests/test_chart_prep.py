@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+from chart_prep import BYTES_PER_POINT, category_counts, downsample_series, lttb_indices, minmax_indices
+
+
+def _serie(n=10_000):
+    rng = np.random.default_rng(0)
+    y = rng.normal(size=n).cumsum()
+    y[1234] = 500  # pico aislado
+    return pd.DataFrame({"x": pd.date_range("2020-01-01", periods=n, freq="h"), "y": y})
+
+
+def test_lttb_conserva_extremos_y_picos():
+    df = _serie()
+    idx = lttb_indices(df["x"].to_numpy(), df["y"].to_numpy(), 200)
+    assert len(idx) == 200
+    assert idx[0] == 0 and idx[-1] == len(df) - 1
+    assert (np.diff(idx) > 0).all()
+    assert 1234 in idx
+
+def test_minmax_conserva_el_minimo_y_el_maximo_de_cada_tramo():
+    y = _serie()["y"].to_numpy()
+    idx = minmax_indices(y, 100)
+    assert len(idx) <= 100 and (np.diff(idx) > 0).all()
+    assert y.argmax() in idx and y.argmin() in idx
+    for tramo in np.array_split(np.arange(len(y)), 50):
+        assert tramo[y[tramo].argmax()] in idx
+
+def test_series_cortas_no_se_reducen():
+    assert list(lttb_indices(np.arange(5), np.arange(5), 10)) == list(range(5))
+    assert list(minmax_indices(np.arange(5), 10)) == list(range(5))
+
+def test_estadisticas_de_la_reduccion():
+    reducido, stats = downsample_series(_serie(), "x", "y", max_points=500, method="minmax")
+    assert stats["puntos_originales"] == 10_000 and stats["puntos_enviados"] == len(reducido) <= 500
+    assert stats["bytes_evitados"] == (10_000 - len(reducido)) * BYTES_PER_POINT
+    conteos, stats = category_counts(["a", "b", "a"], "categoria")
+    assert conteos.to_dict("list") == {"categoria": ["a", "b"], "conteo": [2, 1]}
+    assert stats["puntos_enviados"] == 2
@@ -0,0 +1,19 @@
+import data_quality
+
+
+def test_invalidar_descarta_la_tabla_y_las_que_la_referencian():
+    data_quality._reports.clear()
+    data_quality._reports.update({
+        "ordencompra": (1, {}, {"producto", "proveedor", "centrodecoste"}),
+        "producto": (1, {}, set()),
+        "proveedor": (1, {}, set()),
+    })
+
+    data_quality.invalidate_reports("producto")
+    assert set(data_quality._reports) == {"proveedor"}
+
+    data_quality.invalidate_reports("otra_tabla")
+    assert set(data_quality._reports) == {"proveedor"}
+
+    data_quality.invalidate_reports()
+    assert data_quality._reports == {}
@@ -0,0 +1,21 @@
+import pandas as pd
+from dates import parse_dates
+
+
+def test_formato_de_otra_columna_no_se_reutiliza():
+    parse_dates(pd.Series(["03/25/2024", "04/01/2024"]))
+    fechas = parse_dates(pd.Series(["05/03/2024", "25/03/2024", "06/04/2024"]))
+    assert list(fechas) == list(pd.to_datetime(["2024-03-05", "2024-03-25", "2024-04-06"]))
+
+def test_bloques_de_una_columna_comparten_el_formato_detectado():
+    formatos = {}
+    parse_dates(pd.Series(["03/25/2024", "04/01/2024"]), formats=formatos)
+    fechas = parse_dates(pd.Series(["05/03/2024", "06/04/2024"]), formats=formatos)
+    assert list(fechas) == list(pd.to_datetime(["2024-05-03", "2024-06-04"]))
+    # Un bloque que contradice el formato guardado se detecta de nuevo
+    fechas = parse_dates(pd.Series(["25/03/2024", "05/03/2024"]), formats=formatos)
+    assert list(fechas) == list(pd.to_datetime(["2024-03-25", "2024-03-05"]))
+
+def test_columna_sin_valores():
+    fechas = parse_dates(pd.Series([None, None], dtype=object))
+    assert fechas.isna().all() and len(fechas) == 2
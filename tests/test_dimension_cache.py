@@ -0,0 +1,52 @@
+import threading
+import time
+import pandas as pd
+import dimension_cache
+from dimension_cache import DimensionCache, resolve_foreign_keys
+
+
+def _productos(*codigos):
+    return pd.DataFrame({"id": range(1, len(codigos) + 1), "codigo_producto": list(codigos)})
+
+
+def test_al_vencer_se_recarga_completa_con_claves_cambiadas(backend):
+    backend.load_table("producto", _productos("P1", "P2"))
+    cache = DimensionCache(ttl=60)
+    claves, ids = cache.lookup("producto", "codigo_producto")
+    assert dict(zip(claves, ids)) == {"P1": 1, "P2": 2}
+
+    # Cambio hecho fuera de la aplicación: el código del registro 2 cambia
+    backend.upsert("producto", [{"id": 2, "codigo_producto": "P2-nuevo"}], "resolution=merge-duplicates")
+    assert "P2" in cache.lookup("producto", "codigo_producto")[0]
+    cache.ttl = 0
+    claves, ids = cache.lookup("producto", "codigo_producto")
+    assert dict(zip(claves, ids)) == {"P1": 1, "P2-nuevo": 2}
+
+def test_la_descarga_no_bloquea_otras_consultas(monkeypatch):
+    cache = DimensionCache()
+    cache._tables["proveedor"] = cache._build(pd.DataFrame({"id": [7], "ruc_proveedor": ["20100"]}), "ruc_proveedor")
+    empezada, liberar = threading.Event(), threading.Event()
+
+    def descarga_lenta(table, **kwargs):
+        empezada.set()
+        liberar.wait(5)
+        return _productos("P1")
+
+    monkeypatch.setattr(dimension_cache, "fetch_dataframe_from_supabase", descarga_lenta)
+    hilo = threading.Thread(target=cache.lookup, args=("producto", "codigo_producto"))
+    hilo.start()
+    assert empezada.wait(5)
+    inicio = time.perf_counter()
+    claves, ids = cache.lookup("proveedor", "ruc_proveedor")
+    assert time.perf_counter() - inicio < 1 and list(ids) == [7]
+    # Una invalidación durante la descarga impide guardar datos anteriores a la escritura
+    cache.invalidate("producto")
+    liberar.set()
+    hilo.join()
+    assert "producto" not in cache._tables
+
+def test_resuelve_claves_y_devuelve_las_no_encontradas(backend):
+    backend.load_table("producto", _productos("P1", "P2"))
+    df, no_mapeados = resolve_foreign_keys(pd.DataFrame({"codigo_producto": ["P2", "X", "P1"]}), cache=DimensionCache())
+    assert df["producto_id"].tolist() == [2, pd.NA, 1]
+    assert no_mapeados.to_dict("records") == [{"fila": 1, "columna": "codigo_producto", "valor": "X"}]
@@ -0,0 +1,62 @@
+import pandas as pd
+from forecasting import DemandForecaster, build_series
+
+
+def _ordenes():
+    meses = pd.date_range("2021-01-01", "2024-12-01", freq="MS")
+    activa = pd.DataFrame({"categoria": "A", "fecha_pedido_compra": meses, "cantidad": 10.0})
+    # La categoría B dejó de recibir pedidos en 2022-06
+    parada = pd.DataFrame({"categoria": "B", "fecha_pedido_compra": meses[meses <= "2022-06-01"], "cantidad": 150.0})
+    return pd.concat([activa, parada], ignore_index=True)
+
+
+def test_series_llegan_al_ultimo_periodo_con_ceros():
+    panel = build_series(_ordenes(), "categoria")
+    ultimos = panel.groupby("serie")["periodo"].max()
+    assert ultimos["A"] == ultimos["B"]
+    assert (panel.loc[panel["serie"] == "B", "cantidad"].tail(24) == 0).all()
+
+def test_pronostico_de_serie_parada_empieza_tras_el_ultimo_periodo(tmp_path):
+    panel = build_series(_ordenes(), "categoria")
+    resultado = DemandForecaster(str(tmp_path)).forecast(panel, "categoria", "M", horizon=3, max_workers=1)
+    parada = resultado["forecast"][resultado["forecast"]["serie"] == "B"]
+    assert parada["periodo"].min() == panel["periodo"].max() + 1
+    assert (parada["cantidad"] < 1).all()
+    # Sin datos nuevos no se reentrena ninguna serie
+    resultado = DemandForecaster(str(tmp_path)).forecast(panel, "categoria", "M", horizon=3, max_workers=1)
+    assert not resultado["summary"]["reentrenada"].any()
+
+def test_series_pendientes_se_entrenan_en_varios_procesos(tmp_path, monkeypatch):
+    import time
+    import joblib
+    import numpy as np
+    import forecasting
+    from forecasting import MIN_PARALLEL_SERIES, submit_forecast
+    from training_jobs import JobScheduler
+
+    # Los procesos del planificador (spawn) crean su pronosticador con este directorio
+    monkeypatch.setenv("FORECAST_DIR", str(tmp_path))
+    monkeypatch.setattr(forecasting, "forecaster", DemandForecaster(str(tmp_path)))
+    planificador = JobScheduler(max_workers=2)
+    monkeypatch.setattr(forecasting, "scheduler", planificador)
+    series = MIN_PARALLEL_SERIES * 50
+    meses = pd.date_range("2021-01-01", "2024-12-01", freq="MS")
+    ordenes = pd.DataFrame({
+        "categoria": np.repeat([f"serie-{i}" for i in range(series)], len(meses)),
+        "fecha_pedido_compra": np.tile(meses, series),
+        "cantidad": np.random.default_rng(0).poisson(20, series * len(meses)).astype(float),
+    })
+
+    try:
+        _, job = submit_forecast(ordenes, "categoria", "M", horizon=3)
+        limite = time.time() + 120
+        while not job.done() and time.time() < limite:
+            time.sleep(0.1)
+    finally:
+        if planificador._executor is not None:
+            planificador._executor.shutdown()
+    assert job.error is None and job.done()
+    assert job.result["summary"]["reentrenada"].all()
+    assert len(job.result["summary"]) == series
+    procesos = {joblib.load(path)["worker"] for path in tmp_path.glob("*.joblib")}
+    assert len(procesos) > 1
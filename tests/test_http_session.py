@@ -0,0 +1,54 @@
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from http_session import PooledSession
+
+
+class _Respuesta:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+
+class _Sesion:
+    # Devuelve (o lanza) las respuestas en orden y cuenta las peticiones
+    def __init__(self, *respuestas):
+        self.respuestas = list(respuestas)
+        self.peticiones = 0
+
+    def request(self, method, url, **kwargs):
+        self.peticiones += 1
+        respuesta = self.respuestas.pop(0)
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        return _Respuesta(respuesta)
+
+
+def _sesion(*respuestas):
+    pooled = PooledSession("http://api", {}, backoff=0)
+    pooled._session = _Sesion(*respuestas)
+    return pooled
+
+
+def test_post_no_se_reintenta_tras_un_500():
+    pooled = _sesion(500, 201)
+    assert pooled.post("/rest/v1/ordencompra").status_code == 500
+    assert pooled.session.peticiones == 1
+
+def test_post_se_reintenta_si_no_se_proceso():
+    sin_conexion = requests.ConnectionError(MaxRetryError(None, "/", NewConnectionError(None, "rechazada")))
+    pooled = _sesion(503, sin_conexion, 201)
+    assert pooled.post("/rest/v1/ordencompra").status_code == 201
+    assert pooled.session.peticiones == 3
+
+def test_post_no_se_reintenta_tras_agotar_la_lectura():
+    pooled = _sesion(requests.ReadTimeout(), 201)
+    with pytest.raises(requests.ReadTimeout):
+        pooled.post("/rest/v1/ordencompra")
+    assert pooled.session.peticiones == 1
+
+def test_peticiones_idempotentes_se_reintentan():
+    pooled = _sesion(500, requests.ReadTimeout(), 200)
+    assert pooled.get("/rest/v1/ordencompra").status_code == 200
+    pooled = _sesion(502, 201)
+    assert pooled.post("/rest/v1/rpc/resumen", idempotent=True).status_code == 201
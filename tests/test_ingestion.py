@@ -0,0 +1,46 @@
+import io
+import ingestion
+from ingestion import ingest_file, row_ranges
+
+CABECERA = ",".join(ingestion.ORDENCOMPRA_SCHEMA)
+
+
+def _archivo(*filas, separador=","):
+    return io.BytesIO("\n".join([CABECERA, *filas]).replace(",", separador).encode())
+
+def _fila(codigo, cantidad="5", usuario="ana"):
+    return f"{codigo},{usuario},directa,{cantidad},1.5,1,01/02/2024,01/02/2024,,,1,2,3"
+
+
+def test_textos_como_na_no_se_convierten_en_nulos():
+    resultado = ingest_file(_archivo(_fila("OC1", cantidad="n/a", usuario="NA"), _fila("OC2", usuario="NA")), "carga.csv", insert=False)
+    assert resultado["filas_invalidas"] == 1
+    errores = resultado["errores"]
+    assert list(errores["columna"]) == ["cantidad"] and list(errores["valor"]) == ["n/a"]
+    # Número de línea en el archivo: la cabecera es la línea 1
+    assert list(errores["fila"]) == [2]
+
+def test_detecta_el_separador_punto_y_coma():
+    resultado = ingest_file(_archivo(_fila("OC1"), _fila("OC2", cantidad="abc"), separador=";"), "carga.csv", insert=False)
+    assert resultado["filas"] == 2 and resultado["validas"] == 1
+    assert list(resultado["errores"]["fila"]) == [3]
+
+def test_lotes_fallidos_informan_las_filas_del_archivo(monkeypatch):
+    monkeypatch.setattr(ingestion, "upsert_dataframe_into_supabase", lambda tabla, df, on_conflict=None: {"errores": [{"inicio": 0, "fin": len(df), "error": "500"}]})
+    resultado = ingest_file(_archivo(_fila("OC1"), _fila("OC2", cantidad="abc"), _fila("OC3"), _fila("OC4")), "carga.csv")
+    assert resultado["lotes_fallidos"] == [{"filas": "2, 4-5", "n_filas": 3, "error": "500"}]
+    assert resultado["insertadas"] == 0
+
+def test_reenviar_el_archivo_no_duplica_ordenes(backend):
+    from benchmarks.synthetic import generate_ordencompra
+    backend.load_table("ordencompra_carga", generate_ordencompra(1).head(0), unique=[["codigo_de_compra"]])
+    archivo = _archivo(_fila("OC1"), _fila("OC2"), _fila("OC1", cantidad="7"))
+    for _ in range(2):
+        resultado = ingest_file(archivo, "carga.csv", table="ordencompra_carga")
+        assert resultado["insertadas"] == 3 and not resultado["lotes_fallidos"]
+    from supabase_api import fetch_data_from_supabase
+    filas = fetch_data_from_supabase("ordencompra_carga", select=["codigo_de_compra", "cantidad"], order="codigo_de_compra")
+    assert filas == [{"codigo_de_compra": "OC1", "cantidad": 7.0}, {"codigo_de_compra": "OC2", "cantidad": 5.0}]
+
+def test_row_ranges():
+    assert row_ranges([3, 4, 5, 9]) == "3-5, 9"
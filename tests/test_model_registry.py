@@ -0,0 +1,30 @@
+import pandas as pd
+from sklearn.cluster import KMeans
+from model_registry import ModelRegistry
+
+
+def _datos(n=20, desplazamiento=0):
+    return pd.DataFrame({"a": [float(i + desplazamiento) for i in range(n)], "b": [float(i % 3) for i in range(n)]})
+
+def _modelo(k=2):
+    return KMeans(n_clusters=k, random_state=0, n_init=1)
+
+
+def test_reutiliza_el_modelo_mientras_no_cambian_los_datos(tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    entry, entrenado = registry.get_or_fit(_modelo(), _datos())
+    assert entrenado
+    # Otro proceso (o un reinicio) lo lee del disco sin entrenar
+    otra, entrenado = ModelRegistry(str(tmp_path)).get_or_fit(_modelo(), _datos())
+    assert not entrenado and otra["fingerprint"] == entry["fingerprint"]
+    # Con otros datos se reentrena y se descarta la versión anterior
+    _, entrenado = registry.get_or_fit(_modelo(), _datos(desplazamiento=1))
+    assert entrenado and len(list(tmp_path.glob("*.joblib"))) == 1
+    assert registry.lookup(_modelo(), _datos()) is None
+
+def test_los_modelos_guardados_respetan_el_maximo_en_memoria(tmp_path):
+    registry = ModelRegistry(str(tmp_path), max_loaded=2)
+    for k in range(2, 6):
+        registry.get_or_fit(_modelo(k), _datos())
+    assert len(registry._loaded) == 2
+    assert len(list(tmp_path.glob("*.joblib"))) == 4
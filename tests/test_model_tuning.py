@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+import model_tuning
+from model_tuning import tune_model
+
+GRID = {"max_depth": list(range(1, 10))}
+
+
+@pytest.fixture(autouse=True)
+def sin_registro(monkeypatch):
+    # Las pruebas no escriben en model_training.log
+    monkeypatch.setattr(model_tuning.logger, "disabled", True)
+
+
+def _datos(n=600):
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({"a": rng.normal(size=n), "b": rng.normal(size=n)})
+    return X, pd.Series((X["a"] + X["b"] > 0).astype(int), name="clase")
+
+
+def test_halving_pasa_un_tercio_de_los_candidatos_con_mas_filas():
+    X, y = _datos()
+    resultado = tune_model(DecisionTreeClassifier(random_state=0), X, y, GRID, n_candidates=9, n_jobs=1, use_cache=False)
+    assert [(r["filas"], r["candidatos"]) for r in resultado["rounds"]] == [(200, 9), (600, 3)]
+    assert resultado["evaluations"] == 12 and not resultado["budget_exhausted"]
+    assert resultado["best_params"]["max_depth"] in GRID["max_depth"]
+
+def test_agotado_el_tiempo_no_se_lanzan_mas_lotes():
+    X, y = _datos()
+    resultado = tune_model(DecisionTreeClassifier(random_state=0), X, y, GRID, n_candidates=9, n_jobs=1,
+                           time_budget=1e-6, use_cache=False)
+    # El primer lote siempre se evalúa para tener un mejor candidato
+    assert resultado["budget_exhausted"] and resultado["evaluations"] == 1
+    assert len(resultado["rounds"]) == 1
@@ -0,0 +1,36 @@
+from query_cache import QueryCache
+
+
+def test_las_entradas_caducan_tras_el_ttl(monkeypatch):
+    reloj = [100.0]
+    monkeypatch.setattr("query_cache.time.monotonic", lambda: reloj[0])
+    cache = QueryCache(ttl=10)
+    clave = QueryCache.make_key("producto", select=["id"], filters=[("id", "gt", 1)])
+    cache.set(clave, "valor")
+    reloj[0] += 9
+    assert cache.get(clave) == "valor"
+    reloj[0] += 2
+    assert cache.get(clave) is None
+    assert cache.stats()["entradas"] == 0
+
+def test_se_expulsan_las_menos_usadas_por_numero_y_por_bytes():
+    cache = QueryCache(max_entries=2, max_bytes=100)
+    cache.set("a", 1, size=10)
+    cache.set("b", 2, size=10)
+    cache.get("a")
+    cache.set("c", 3, size=10)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    cache.set("d", 4, size=95)
+    assert cache.get("a") is None and cache.get("c") is None and cache.get("d") == 4
+    assert cache.stats()["bytes"] == 95 and cache.stats()["expulsiones"] == 3
+    # Un valor mayor que el límite no se guarda
+    cache.set("e", 5, size=101)
+    assert cache.get("e") is None and cache.get("d") == 4
+
+def test_invalidar_por_tabla_y_por_prefijo():
+    cache = QueryCache()
+    for tabla in ("ordencompra", "vista_resumen", "vista_demanda", "producto"):
+        cache.set(QueryCache.make_key(tabla), tabla)
+    assert cache.invalidate("ordencompra", prefix="vista_") == 3
+    assert cache.get(QueryCache.make_key("producto")) == "producto"
+    assert QueryCache.make_key("t", filters=[("a", "in", [1, 2])]) == QueryCache.make_key("t", filters=[("a", "in", [1, 2])])
@@ -0,0 +1,23 @@
+import pandas as pd
+import snapshot_sync
+from snapshot_sync import load_snapshot, request_sync, sync_table
+
+
+def test_la_sincronizacion_incremental_recoge_las_filas_actualizadas(backend, monkeypatch, tmp_path):
+    monkeypatch.setattr(snapshot_sync, "SNAPSHOT_DIR", str(tmp_path))
+    backend.load_table("pedidos", pd.DataFrame({
+        "id": [1, 2, 3], "cantidad": [1.0, 2.0, 3.0],
+        "updated_at": ["2024-01-01T10:00:00+00:00"] * 3,
+    }))
+    assert sync_table("pedidos", force_full=True) == 3
+
+    # Un upsert con merge-duplicates modifica una fila existente (el trigger cambia su marca)
+    backend.upsert("pedidos", [{"id": 2, "cantidad": 20.0, "updated_at": "2024-01-02T10:00:00+00:00"}],
+                   prefer="resolution=merge-duplicates")
+    request_sync("pedidos")
+    assert sync_table("pedidos") == 1
+    assert load_snapshot("pedidos", sync=False).set_index("id")["cantidad"].to_dict() == {1: 1.0, 2: 20.0, 3: 3.0}
+
+    # Las filas que vuelve a traer el margen de la marca no cuentan como nuevas
+    request_sync("pedidos")
+    assert sync_table("pedidos") == 0
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from streaming_training import StratifiedReservoir
+
+
+def test_la_muestra_crece_con_las_filas_de_cada_clase():
+    muestra = StratifiedReservoir(100, 2, max_classes=10)
+    muestra.add(np.ones((3, 2)), np.array([0, 0, 1]))
+    assert {clase: len(m) for clase, m in muestra.samples.items()} == {0: 2, 1: 1}
+    muestra.add(np.ones((500, 2)), np.zeros(500, dtype=int))
+    X, y = muestra.arrays()
+    assert len(muestra.samples[0]) == 100 and (y == 0).sum() == 100 and (y == 1).sum() == 1
+
+def test_rechaza_objetivos_con_demasiadas_clases():
+    muestra = StratifiedReservoir(100, 1, max_classes=10)
+    muestra.add(np.zeros((10, 1)), np.arange(10))
+    with pytest.raises(ValueError):
+        muestra.add(np.zeros((1, 1)), np.array([10]))
+
+def test_los_bloques_se_leen_por_clave(backend, monkeypatch):
+    import streaming_training
+    from benchmarks.synthetic import generate_vista_analisis
+
+    backend.load_table("vista_analisis_compras4", generate_vista_analisis(2500))
+    claves = []
+    original = streaming_training.fetch_pages_from_supabase
+
+    def paginas(*args, key_column=None, **kwargs):
+        claves.append(key_column)
+        return original(*args, key_column=key_column, page_size=1000, **kwargs)
+
+    monkeypatch.setattr(streaming_training, "fetch_pages_from_supabase", paginas)
+    bloques = list(streaming_training.iter_chunks("vista_analisis_compras4", ["cantidad", "categoria"], chunk_size=1000))
+    assert claves == ["id"]
+    assert [len(b) for b in bloques] == [1000, 1000, 500]
+    assert list(bloques[0].columns) == ["cantidad", "categoria"]
@@ -0,0 +1,69 @@
+import pandas as pd
+import pytest
+from supabase_api import fetch_dataframe_from_supabase, fetch_pages_from_supabase
+
+
+def test_la_paginacion_por_offset_usa_el_orden_de_la_tabla(backend):
+    meses = ["2024-03-01", "2024-01-01", "2024-02-01", "2024-01-01", "2024-03-01"]
+    backend.load_table("resumen_mensual", pd.DataFrame({
+        "mes": meses, "estado": [1, 2, 1, 1, 2], "tipo_compra": "directa", "categoria": "a", "conteo": 1,
+    }))
+    df = fetch_dataframe_from_supabase("resumen_mensual", page_size=2, use_cache=False)
+    assert list(zip(df["mes"], df["estado"])) == sorted(zip(meses, [1, 2, 1, 1, 2]))
+
+def test_sin_orden_solo_se_admite_una_pagina(backend):
+    backend.load_table("sin_clave", pd.DataFrame({"valor": range(5)}))
+    assert sum(len(p) for p in fetch_pages_from_supabase("sin_clave", page_size=10)) == 5
+    with pytest.raises(ValueError):
+        list(fetch_pages_from_supabase("sin_clave", page_size=2))
+
+def test_las_funciones_rpc_se_piden_por_paginas(backend):
+    from benchmarks.synthetic import generate_ordencompra
+    from supabase_api import call_rpc
+    backend.load_table("ordencompra", generate_ordencompra(500))
+    completo = call_rpc("resumen_ordenes", use_cache=False)
+    backend.max_rows = 7
+    paginado = call_rpc("resumen_ordenes", use_cache=False, page_size=7)
+    assert len(completo) > 7
+    pd.testing.assert_frame_equal(paginado, completo)
+
+def test_upsert_informa_los_lotes_fallidos_y_limita_los_pendientes(monkeypatch):
+    import json
+    import threading
+    import time
+    from types import SimpleNamespace
+    import supabase_api
+
+    enviados, pendientes_maximos = [], []
+    contadores = {"serializados": 0, "terminados": 0}
+    lock = threading.Lock()
+
+    def post(path, headers=None, data=None, idempotent=None):
+        primera = json.loads(data)[0]["n"]
+        time.sleep(0.01)
+        with lock:
+            enviados.append(primera)
+            contadores["terminados"] += 1
+        if primera == 3000:
+            return SimpleNamespace(status_code=409, text="duplicate key")
+        return SimpleNamespace(status_code=201, text="")
+
+    original = supabase_api.dataframe_to_json_chunks
+
+    def serializar(df, chunk_size):
+        for lote in original(df, chunk_size):
+            # Al pedir un lote nuevo todos los anteriores ya se enviaron al pool
+            with lock:
+                pendientes_maximos.append(contadores["serializados"] - contadores["terminados"])
+                contadores["serializados"] += 1
+            yield lote
+
+    monkeypatch.setattr(supabase_api.session, "post", post)
+    monkeypatch.setattr(supabase_api, "dataframe_to_json_chunks", serializar)
+    resultado = supabase_api.upsert_dataframe_into_supabase("prueba", pd.DataFrame({"n": range(10_500)}), chunk_size=1000, max_workers=2)
+
+    assert resultado["lotes"] == 11
+    assert sorted(enviados) == list(range(0, 10_500, 1000))
+    assert [(e["inicio"], e["fin"]) for e in resultado["errores"]] == [(3000, 4000)]
+    assert "409" in resultado["errores"][0]["error"]
+    assert 2 <= max(pendientes_maximos) <= 2 * 2
@@ -0,0 +1,10 @@
+import pandas as pd
+from table_paging import PageView
+
+
+def test_el_orden_guardado_no_se_comparte_entre_tablas():
+    vista = PageView()
+    a = pd.DataFrame({"valor": [3, 1, 2]})
+    b = pd.DataFrame({"valor": [1, 2, 3]})
+    assert list(vista.positions(a, sort="valor", version=1, table="a")) == [1, 2, 0]
+    assert list(vista.positions(b, sort="valor", version=1, table="b")) == [0, 1, 2]
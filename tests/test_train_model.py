@@ -0,0 +1,29 @@
+import pandas as pd
+from sklearn.cluster import KMeans
+from model_registry import ModelRegistry
+from sections import train_model
+from sections.train_model import preprocess_data, registered_encoders
+
+
+def _datos(categorias):
+    return pd.DataFrame({"cantidad": range(len(categorias)), "categoria": categorias})
+
+
+def test_reutiliza_el_codificador_del_modelo_registrado(monkeypatch, tmp_path):
+    registry = ModelRegistry(str(tmp_path))
+    monkeypatch.setattr(train_model, "registry", registry)
+    df = _datos(["b", "a", "c", "a", "b", "c"])
+    features = ["cantidad", "categoria"]
+    huella, encoder, _ = registered_encoders(KMeans(n_clusters=2, random_state=42, n_init=1), df, features)
+    assert encoder is None
+    X, encoder = preprocess_data(df, features)
+    registry.get_or_fit(KMeans(n_clusters=2, random_state=42, n_init=1), X, extras={"encoder": encoder, "source_fingerprint": huella})
+
+    # Se comprueba con la huella de los datos sin codificar, sin volver a codificarlos
+    monkeypatch.setattr(train_model, "preprocess_data", None)
+    huella_registrada, encoder_registrado, _ = registered_encoders(KMeans(n_clusters=2, random_state=42, n_init=1), df, features)
+    assert huella_registrada == huella
+    assert encoder_registrado is encoder  # el guardado con el modelo, no uno nuevo
+    assert list(encoder_registrado.vocabularies["categoria"]) == ["a", "b", "c"]
+    # Con datos nuevos hay que reentrenar con un codificador nuevo
+    assert registered_encoders(KMeans(n_clusters=2, random_state=42, n_init=1), _datos(["d"] * 6), features)[1] is None
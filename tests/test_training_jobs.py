@@ -0,0 +1,58 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from training_jobs import COMPLETADO, ERROR, JobScheduler
+
+
+def _planificador():
+    # Hilos en lugar del pool de procesos: la deduplicación no depende del ejecutor
+    planificador = JobScheduler()
+    planificador._executor = ThreadPoolExecutor(max_workers=2)
+    return planificador
+
+
+def test_trabajos_identicos_se_ejecutan_una_vez():
+    planificador = _planificador()
+    liberar = threading.Event()
+    llamadas = []
+
+    def trabajo(key, valor):
+        llamadas.append(key)
+        liberar.wait(5)
+        return valor * 2
+
+    primero = planificador.submit("clave", trabajo, 21)
+    segundo = planificador.submit("clave", trabajo, 21)
+    assert segundo is primero
+    liberar.set()
+    planificador._executor.shutdown(wait=True)
+    assert llamadas == ["clave"]
+    assert primero.status == COMPLETADO and primero.result == 42
+    # Completado sigue deduplicándose hasta que se olvida
+    assert planificador.submit("clave", trabajo, 21) is primero
+    planificador.forget("clave")
+    assert planificador.get("clave") is None
+
+def test_un_trabajo_con_error_se_puede_reenviar():
+    planificador = _planificador()
+
+    def falla(key):
+        raise RuntimeError("sin datos")
+
+    job = planificador.submit("clave", falla)
+    planificador._executor.shutdown(wait=True)
+    assert job.status == ERROR and "sin datos" in job.error
+    planificador._executor = ThreadPoolExecutor(max_workers=1)
+    nuevo = planificador.submit("clave", lambda key: "ok")
+    planificador._executor.shutdown(wait=True)
+    assert nuevo is not job and nuevo.result == "ok"
+
+def test_lotes_de_un_trabajo():
+    planificador = _planificador()
+    job = planificador.submit_batches("lotes", lambda key, lote, factor: [v * factor for v in lote], [[1, 2], [3]], 10,
+                                     finish=lambda resultados: [v for lote in resultados for v in lote])
+    planificador._executor.shutdown(wait=True)
+    assert job.status == COMPLETADO and job.result == [10, 20, 30]
+    fallido = _planificador()
+    job = fallido.submit_batches("lotes", lambda key, lote: 1 / lote, [1, 0, 2])
+    fallido._executor.shutdown(wait=True)
+    assert job.status == ERROR
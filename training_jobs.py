@@ -0,0 +1,289 @@
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from model_registry import registry, model_key, data_fingerprint
+
+
+# Número de procesos dedicados a entrenar modelos (compartidos por todas las sesiones)
+TRAINING_WORKERS = int(os.getenv("TRAINING_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+# Estados de un trabajo
+PENDIENTE = "pendiente"
+EN_CURSO = "en_curso"
+COMPLETADO = "completado"
+ERROR = "error"
+
+_progress_queue = None
+
+
+def _init_worker(queue):
+    global _progress_queue
+    _progress_queue = queue
+
+def report_progress(key, progress, message):
+    """
+    Informa del avance de un trabajo desde el proceso que lo ejecuta.
+    """
+    if _progress_queue is not None:
+        _progress_queue.put((key, progress, message))
+
+def fit_with_progress(estimator, X, y, report):
+    """
+    Entrena un estimador informando del avance.
+    Los ensambles con `warm_start` (RandomForest, etc.) se entrenan añadiendo árboles por tramos,
+    lo que produce el mismo modelo que un único `fit` y permite informar el porcentaje real.
+    :param report: Función `report(progreso, mensaje)` con progreso entre 0 y 1.
+    """
+    params = estimator.get_params()
+    if y is not None and "warm_start" in params and "n_estimators" in params:
+        total = params["n_estimators"]
+        pasos = max(1, min(10, total))
+        estimator.set_params(warm_start=True)
+        for i in range(1, pasos + 1):
+            estimator.set_params(n_estimators=max(1, total * i // pasos))
+            estimator.fit(X, y)
+            report(i / pasos, f"{estimator.n_estimators} de {total} árboles entrenados")
+        estimator.set_params(warm_start=params["warm_start"])
+    else:
+        report(0.0, "Entrenando modelo...")
+        if y is None:
+            estimator.fit(X)
+        else:
+            estimator.fit(X, y)
+        report(1.0, "Modelo entrenado")
+
+def _run_fit_job(key, estimator, X, y, fingerprint, extras):
+    report_progress(key, 0.0, "Iniciando entrenamiento...")
+    return registry.get_or_fit(
+        estimator, X, y, fingerprint=fingerprint, extras=extras,
+        fit_fn=lambda est, X_, y_: fit_with_progress(est, X_, y_, lambda p, m: report_progress(key, p, m)),
+    )
+
+
+class Job:
+    """
+    Trabajo de entrenamiento enviado al planificador.
+    """
+
+    def __init__(self, key, description):
+        self.key = key
+        self.description = description
+        self.status = PENDIENTE
+        self.progress = 0.0
+        self.message = "En cola"
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    def done(self):
+        return self.status in (COMPLETADO, ERROR)
+
+
+class JobScheduler:
+    """
+    Planificador de entrenamientos en un pool de procesos.
+    Los trabajos idénticos (mismo modelo y mismos datos) se agrupan en uno solo, el avance
+    llega desde los procesos a través de una cola y las páginas consultan el estado sin bloquearse.
+    """
+
+    def __init__(self, max_workers=TRAINING_WORKERS, max_finished=32):
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self._executor = None
+        self._queue = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _ensure_executor(self):
+        if self._executor is None:
+            # "spawn" evita heredar los hilos del servidor de Streamlit en los procesos hijos
+            context = multiprocessing.get_context("spawn")
+            self._queue = context.Queue()
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=context,
+                initializer=_init_worker, initargs=(self._queue,),
+            )
+        return self._executor
+
+    def submit(self, key, fn, *args, description=""):
+        """
+        Envía un trabajo genérico al pool. `fn(key, *args)` se ejecuta en otro proceso, debe
+        ser una función de nivel de módulo y puede informar su avance con `report_progress(key, ...)`.
+        Si ya hay un trabajo con la misma clave en curso o completado se devuelve ese mismo.
+        :return: Objeto `Job`.
+        """
+        job, nuevo = self._register(key, description)
+        if nuevo:
+            try:
+                future = self._ensure_executor().submit(fn, key, *args)
+                future.add_done_callback(lambda f: self._on_done(job, f))
+            except Exception as e:
+                self._fail(job, e)
+        return job
+
+    def submit_batches(self, key, fn, batches, *args, finish=None, description=""):
+        """
+        Envía un trabajo repartido en lotes independientes: cada lote se ejecuta como
+        `fn(key, lote, *args)` en su propia tarea del pool, de modo que los lotes se reparten
+        entre todos los procesos. El avance es la fracción de lotes terminados y, cuando terminan
+        todos, `finish(resultados)` se ejecuta en este proceso para obtener el resultado del trabajo.
+        Si ya hay un trabajo con la misma clave en curso o completado se devuelve ese mismo.
+        :param batches: Lista de lotes; `fn` debe ser una función de nivel de módulo.
+        :param finish: Función que recibe la lista de resultados en el orden de `batches`
+                       (None = el resultado es esa lista).
+        :return: Objeto `Job`.
+        """
+        job, nuevo = self._register(key, description)
+        if not nuevo:
+            return job
+        resultados = [None] * len(batches)
+        pendientes = set(range(len(batches)))
+
+        def terminar():
+            try:
+                self._finish(job, finish(resultados) if finish is not None else resultados)
+            except Exception as e:
+                self._fail(job, e)
+
+        def lote_terminado(i, future):
+            try:
+                resultado = future.result()
+            except Exception as e:
+                if not job.done():
+                    self._fail(job, e)
+                return
+            with self._lock:
+                resultados[i] = resultado
+                pendientes.discard(i)
+                restantes = len(pendientes)
+            if job.done():
+                return
+            if restantes:
+                job.status = EN_CURSO
+                job.progress = 1 - restantes / len(batches)
+                job.message = f"{len(batches) - restantes} de {len(batches)} lotes terminados"
+            else:
+                terminar()
+
+        if not batches:
+            terminar()
+            return job
+        try:
+            executor = self._ensure_executor()
+            for i, lote in enumerate(batches):
+                executor.submit(fn, key, lote, *args).add_done_callback(functools.partial(lote_terminado, i))
+        except Exception as e:
+            self._fail(job, e)
+        return job
+
+    def completed(self, key, result, description=""):
+        """
+        Registra como completado un trabajo cuyo resultado ya se conoce (por ejemplo, en caché).
+        """
+        job, nuevo = self._register(key, description)
+        if nuevo:
+            self._finish(job, result)
+        return job
+
+    def submit_fit(self, estimator, X, y=None, description="", extras=None):
+        """
+        Envía el entrenamiento de un modelo. Si ya está en el registro el trabajo se devuelve
+        completado de inmediato, y si hay uno idéntico en curso se devuelve ese mismo.
+        :param estimator: Estimador de scikit-learn sin entrenar.
+        :param X: DataFrame de características.
+        :param y: Serie objetivo (None para modelos no supervisados).
+        :param description: Texto para mostrar en la página.
+        :param extras: Objetos que se guardan junto al modelo, ver `ModelRegistry.get_or_fit`.
+        :return: Objeto `Job` cuyo resultado es la tupla (entrada del registro, entrenado).
+        """
+        fingerprint = data_fingerprint(X, y)
+        key = f"{model_key(estimator, X.columns, getattr(y, 'name', None))}-{fingerprint[:16]}"
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != ERROR:
+                return job
+        entry = registry.lookup(estimator, X, y, fingerprint=fingerprint)
+        if entry is not None:
+            return self.completed(key, (entry, False), description)
+        return self.submit(key, _run_fit_job, estimator, X, y, fingerprint, extras, description=description)
+
+    def forget(self, key):
+        """
+        Olvida un trabajo terminado para que el siguiente envío con la misma clave se ejecute de nuevo.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.done():
+                del self._jobs[key]
+
+    def _register(self, key, description):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status != ERROR:
+                return job, False
+            job = Job(key, description)
+            self._jobs[key] = job
+            self._prune()
+            return job, True
+
+    def get(self, key):
+        """
+        Devuelve un trabajo por su clave con el avance actualizado.
+        """
+        self._drain()
+        with self._lock:
+            return self._jobs.get(key)
+
+    def jobs(self):
+        """
+        Devuelve todos los trabajos conocidos con el avance actualizado.
+        """
+        self._drain()
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _drain(self):
+        if self._queue is None:
+            return
+        while True:
+            try:
+                key, progress, message = self._queue.get_nowait()
+            except Exception:
+                break
+            job = self._jobs.get(key)
+            if job is not None and not job.done():
+                job.status = EN_CURSO
+                job.progress = progress
+                job.message = message
+
+    def _on_done(self, job, future):
+        try:
+            self._finish(job, future.result())
+        except Exception as e:
+            self._fail(job, e)
+
+    def _fail(self, job, error):
+        job.status = ERROR
+        job.error = str(error)
+        job.message = f"Error: {error}"
+        job.finished_at = time.time()
+
+    def _finish(self, job, result):
+        job.result = result
+        job.progress = 1.0
+        job.message = "Completado"
+        job.status = COMPLETADO
+        job.finished_at = time.time()
+
+    def _prune(self):
+        terminados = sorted((j for j in self._jobs.values() if j.done()), key=lambda j: j.finished_at)
+        for job in terminados[:max(0, len(terminados) - self.max_finished)]:
+            del self._jobs[job.key]
+
+
+# Planificador compartido por todas las sesiones
+scheduler = JobScheduler()